@@ -1,4 +1,5 @@
-from typing import List
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional
 import typer
 import json
 import subprocess
@@ -171,34 +172,121 @@ def exit():
         typer.secho(f"An error occurred during cleanup: {e}", fg="red")
 
 
+def list_keys(server: str, bucket: str, prefix: str, page_size: int = 1000):
+    """Yield the keys under a prefix page by page, following the continuation tokens."""
+    token = None
+    while True:
+        resp = requests.post(
+            f"{server}/list_objects_v2",
+            json={
+                "bucket": bucket,
+                "prefix": prefix,
+                "max_keys": page_size,
+                "continuation_token": token,
+            },
+        )
+        resp.raise_for_status()
+        page = resp.json()
+        yield [obj["key"] for obj in page["objects"]]
+        if not page["is_truncated"]:
+            return
+        token = page["next_continuation_token"]
+
+
+def warmup_key(session: requests.Session, bucket: str, key: str, regions: List[str]):
+    return session.post(
+        "http://127.0.0.1:8002/_/warmup_object",
+        json={
+            "bucket": bucket,
+            "key": key,
+            "warmup_regions": regions,
+        },
+    )
+
+
 @app.command()
 def warmup(
     bucket: str = typer.Option(
         ..., "--bucket", help="Bucket name which contains the object to warmup"
     ),
-    key: str = typer.Option(..., "--key", help="Key of object to warmup"),
+    key: Optional[str] = typer.Option(None, "--key", help="Key of object to warmup"),
+    prefix: Optional[str] = typer.Option(
+        None, "--prefix", help="Warm up every object under this prefix"
+    ),
     regions: List[str] = typer.Option(
         ..., "--regions", help="Region to warmup objects in"
     ),
+    concurrency: int = typer.Option(
+        16, "--concurrency", help="Warmup requests in flight in prefix mode"
+    ),
+    server: str = typer.Option(
+        "http://127.0.0.1:3000",
+        "--server",
+        help="Address of the store server, used to list the prefix",
+    ),
 ):
+    if (key is None) == (prefix is None):
+        typer.secho("Pass exactly one of --key and --prefix.", fg="red")
+        raise typer.Exit(code=1)
+
+    if key is not None:
+        try:
+            resp = warmup_key(requests.Session(), bucket, key, regions)
+            if resp.status_code == 200:
+                typer.secho(
+                    f"Warmup for bucket {bucket} and key {key} was successful.",
+                    fg="green",
+                )
+            else:
+                typer.secho(f"Error during warmup: {resp.text}.", fg="red")
+        except requests.RequestException as e:
+            typer.secho(f"Request error: {e}.", fg="red")
+        return
+
+    # Prefix mode: list the keys from the store server and let the proxy copy them,
+    # keeping `concurrency` requests in flight.
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+    warmed, failed = 0, []
+    start = time.time()
     try:
-        resp = requests.post(
-            "http://127.0.0.1:8002/_/warmup_object",
-            json={
-                "bucket": bucket,
-                "key": key,
-                "warmup_regions": regions,
-            },
-        )
-        if resp.status_code == 200:
-            typer.secho(
-                f"Warmup for bucket {bucket} and key {key} was successful.",
-                fg="green",
-            )
-        else:
-            typer.secho(f"Error during warmup: {resp.text}.", fg="red")
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for keys in list_keys(server, bucket, prefix):
+                futures = {
+                    executor.submit(warmup_key, session, bucket, k, regions): k
+                    for k in keys
+                }
+                for future in as_completed(futures):
+                    try:
+                        ok = future.result().status_code == 200
+                    except requests.RequestException:
+                        ok = False
+                    if ok:
+                        warmed += 1
+                    else:
+                        failed.append(futures[future])
+                    elapsed = time.time() - start
+                    typer.echo(
+                        f"\rWarmed {warmed} objects, {len(failed)} failed, "
+                        f"{(warmed + len(failed)) / max(elapsed, 1e-6):.1f} objects/s",
+                        nl=False,
+                    )
     except requests.RequestException as e:
+        typer.echo()
         typer.secho(f"Request error: {e}.", fg="red")
+        raise typer.Exit(code=1)
+
+    typer.echo()
+    if failed:
+        typer.secho(
+            f"Warmup failed for {len(failed)} objects, e.g. {failed[:5]}.", fg="red"
+        )
+        raise typer.Exit(code=1)
+    typer.secho(
+        f"Warmup of {warmed} objects under {bucket}/{prefix} was successful "
+        f"in {time.time() - start:.1f}s.",
+        fg="green",
+    )
 
 
 def main():
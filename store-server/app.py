@@ -1,9 +1,13 @@
 import asyncio
+import os
+import time
 from datetime import datetime, timedelta
+from typing import Optional
 from dotenv import load_dotenv
-from sqlalchemy import select, update
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from sqlalchemy import or_, select, update
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.routing import APIRoute
 from operations.utils.conf import Base
 from operations.schemas.object_schemas import (
@@ -11,14 +15,42 @@ from operations.schemas.object_schemas import (
     DBPhysicalObjectLocator,
     Status,
     HealthcheckResponse,
+    LockSweepStats,
 )
 from operations.schemas.bucket_schemas import DBLogicalBucket, DBPhysicalBucketLocator
 from operations.bucket_operations import router as bucket_operations_router
 from operations.object_operations import router as object_operations_router
-from operations.utils.db import engine
+from operations.utils.db import (
+    engine,
+    add_missing_columns,
+    alter_column_collations,
+    create_missing_indexes,
+    drop_retired_indexes,
+    logger,
+)
+from operations.utils.hotness import flush_hotness, prune_hotness
+from operations.utils.eviction import (
+    REPLICA_REGION_BUDGETS,
+    REPLICA_TTL_HOURS,
+    evict_replicas,
+    flush_access_times,
+)
+from operations.utils.lifecycle import LIFECYCLE_INTERVAL_MINUTES, run_lifecycle
+from operations.utils.multipart_reaper import (
+    MULTIPART_ABORT_AFTER_HOURS,
+    reap_stale_uploads,
+)
+from operations.utils.metrics import MetricsMiddleware, record_lock_sweep
+from operations.utils.statistics import (
+    STATISTICS_FLUSH_INTERVAL_MS,
+    STATISTICS_RAW_RETENTION_HOURS,
+    expire_raw_statistics,
+    statistics_buffer,
+)
 
 
 app = FastAPI()
+app.add_middleware(MetricsMiddleware)
 
 load_dotenv()
 app.include_router(bucket_operations_router)
@@ -27,117 +59,257 @@ app.include_router(object_operations_router)
 stop_task_flag = asyncio.Event()
 background_tasks = set()
 
+LOCK_SWEEP_BATCH_SIZE = int(os.environ.get("LOCK_SWEEP_BATCH_SIZE", "1000"))
+last_lock_sweep: Optional[LockSweepStats] = None
 
-async def rm_lock_on_timeout(minutes: int = 10, test: bool = False):
-    # initial wait to prevent first check which should never run
-    if not test:
-        await asyncio.sleep(minutes)
-    while not stop_task_flag.is_set() or test:
+
+async def promote_pending(
+    parent, child, child_parent_id, batch_size: int
+) -> tuple[int, int]:
+    """Flip pending parents (logical objects / buckets) to ready once all of their physical
+    locators are ready.
+
+    Walks the pending rows in id order, one short transaction per batch, so the sweep never
+    holds the write lock for long. Returns the number of rows scanned and flipped.
+    """
+    scanned, flipped = 0, 0
+    last_id = 0
+    while True:
         async with engine.begin() as db:
-            # calculate time for which we can timeout. Anything before or equal to 10 minutes ago will timeout
-            cutoff_time = datetime.utcnow() - timedelta(minutes)
+            ids = (
+                await db.scalars(
+                    select(parent.id)
+                    .where(parent.status == Status.pending)
+                    .where(parent.id > last_id)
+                    .order_by(parent.id)
+                    .limit(batch_size)
+                )
+            ).all()
+            if not ids:
+                break
 
-            # time out Physical objects that have been running for more than 10 minutes
-            stmt_timeout_physical_objects = (
-                update(DBPhysicalObjectLocator)
-                .where(DBPhysicalObjectLocator.lock_acquired_ts <= cutoff_time)
-                .values(status=Status.ready, lock_acquired_ts=None)
+            has_locators = select(child.id).where(child_parent_id == parent.id)
+            has_pending_locators = has_locators.where(child.status != Status.ready)
+            result = await db.execute(
+                update(parent)
+                .where(parent.id.in_(ids))
+                .where(parent.status == Status.pending)
+                .where(has_locators.exists())
+                .where(~has_pending_locators.exists())
+                .values(status=Status.ready)
             )
-            await db.execute(stmt_timeout_physical_objects)
+            scanned += len(ids)
+            flipped += result.rowcount
+            last_id = ids[-1]
+
+        if len(ids) < batch_size:
+            break
 
-            # time out Physical buckets that have been running for more than 10 minutes
-            stmt_timeout_physical_buckets = (
-                update(DBPhysicalBucketLocator)
-                .where(DBPhysicalBucketLocator.lock_acquired_ts <= cutoff_time)
+    return scanned, flipped
+
+
+async def release_locks(
+    locator, cutoff_time: datetime, batch_size: int, *conditions
+) -> int:
+    """Put the locators whose lock was taken before `cutoff_time` back to ready.
+
+    Each batch is one short transaction that picks its rows with a LIMITed id subquery on the
+    lock_acquired_ts index; released rows leave the lock predicate, so the loop ends once a
+    batch comes back short. Returns the number of locks released.
+    """
+    timed_out_ids = (
+        select(locator.id)
+        .where(locator.lock_acquired_ts <= cutoff_time)
+        .where(*conditions)
+        .limit(batch_size)
+    )
+    released = 0
+    while True:
+        async with engine.begin() as db:
+            result = await db.execute(
+                update(locator)
+                .where(locator.id.in_(timed_out_ids))
                 .values(status=Status.ready, lock_acquired_ts=None)
             )
-            await db.execute(stmt_timeout_physical_buckets)
+        released += result.rowcount
+        if result.rowcount < batch_size:
+            return released
+
+
+async def sweep_locks(minutes: int, batch_size: int) -> LockSweepStats:
+    start = time.perf_counter()
+    stats = LockSweepStats()
+
+    # calculate time for which we can timeout. Anything before or equal to `minutes` ago will timeout
+    cutoff_time = datetime.utcnow() - timedelta(minutes=minutes)
+
+    # time out Physical objects that have been running for more than `minutes`
+    stats.locks_released += await release_locks(
+        DBPhysicalObjectLocator,
+        cutoff_time,
+        batch_size,
+        # multipart uploads may legitimately run longer, abandoned ones are aborted by the
+        # multipart reaper instead
+        or_(
+            DBPhysicalObjectLocator.status != Status.pending,
+            DBPhysicalObjectLocator.multipart_upload_id.is_(None),
+        ),
+    )
+
+    # time out Physical buckets that have been running for more than `minutes`
+    stats.locks_released += await release_locks(
+        DBPhysicalBucketLocator, cutoff_time, batch_size
+    )
+
+    # set logical objects status to "Ready" if all of its physical objects are "Ready"
+    stats.objects_scanned, stats.objects_flipped = await promote_pending(
+        DBLogicalObject,
+        DBPhysicalObjectLocator,
+        DBPhysicalObjectLocator.logical_object_id,
+        batch_size,
+    )
+
+    # set logical buckets status to "Ready" if all of its physical buckets are "Ready"
+    stats.buckets_scanned, stats.buckets_flipped = await promote_pending(
+        DBLogicalBucket,
+        DBPhysicalBucketLocator,
+        DBPhysicalBucketLocator.logical_bucket_id,
+        batch_size,
+    )
+
+    stats.wall_time = time.perf_counter() - start
+    stats.finished_at = datetime.utcnow()
+    return stats
 
-            # find Logical objects that are pending
-            stmt_find_pending_logical_objs = select(DBLogicalObject).where(
-                DBLogicalObject.status == Status.pending
-            )
-            pendingLogicalObjs = (
-                await db.execute(stmt_find_pending_logical_objs)
-            ).fetchall()
-
-            if pendingLogicalObjs is not None:
-                # loop through list of pending logical objects
-                for logical_obj in pendingLogicalObjs:
-                    # get all physical objects corresponding to a given logical object
-                    stmt3 = (
-                        select(DBPhysicalObjectLocator)
-                        .join(DBLogicalObject)
-                        .where(
-                            logical_obj.id == DBPhysicalObjectLocator.logical_object_id
-                        )
-                    )
-                    objects = (await db.execute(stmt3)).fetchall()
-
-                    # set logical objects status to "Ready" if all of its physical objects are "Ready"
-                    if all([Status.ready == obj.status for obj in objects]):
-                        edit_logical_obj_stmt = (
-                            update(DBLogicalObject)
-                            .where(objects[0].logical_object_id == logical_obj.id)
-                            .values(status=Status.ready)
-                        )
-                        await db.execute(edit_logical_obj_stmt)
-
-            # find Logical buckets that are pending
-            stmt_find_pending_logical_buckets = select(DBLogicalBucket).where(
-                DBLogicalBucket.status == Status.pending
-            )
-            pendingLogicalBuckets = (
-                await db.execute(stmt_find_pending_logical_buckets)
-            ).fetchall()
-
-            if pendingLogicalBuckets is not None:
-                # loop through list of pending logical buckets
-                for logical_bucket in pendingLogicalBuckets:
-                    # get all physical buckets corresponding to a given logical object
-                    stmt3 = (
-                        select(DBPhysicalBucketLocator)
-                        .join(DBLogicalBucket)
-                        .where(
-                            logical_bucket.id
-                            == DBPhysicalBucketLocator.logical_bucket_id
-                        )
-                    )
-                    buckets = (await db.execute(stmt3)).fetchall()
-
-                    # set logical buckets status to "Ready" if all of its physical buckets are "Ready"
-                    if all([Status.ready == bucket.status for bucket in buckets]):
-                        edit_logical_bucket_stmt = (
-                            update(DBLogicalBucket)
-                            .where(buckets[0].logical_bucket_id == logical_bucket.id)
-                            .values(status=Status.ready)
-                        )
-                        await db.execute(edit_logical_bucket_stmt)
-
-            await db.commit()
+
+async def rm_lock_on_timeout(minutes: int = 10, test: bool = False):
+    global last_lock_sweep
+
+    # initial wait to prevent first check which should never run
+    if not test:
+        await asyncio.sleep(minutes)
+    while not stop_task_flag.is_set() or test:
+        try:
+            last_lock_sweep = await sweep_locks(minutes, LOCK_SWEEP_BATCH_SIZE)
+            record_lock_sweep(last_lock_sweep)
+            logger.info(f"rm_lock_on_timeout: {last_lock_sweep}")
+        except Exception as e:
+            logger.error(f"rm_lock_on_timeout: {e}")
+            if test:
+                raise
 
         if test:
-            break
+            return last_lock_sweep
 
         await asyncio.sleep(minutes * 60)
 
 
+async def flush_statistics():
+    while not stop_task_flag.is_set():
+        await asyncio.sleep(STATISTICS_FLUSH_INTERVAL_MS / 1000)
+        try:
+            await statistics_buffer.flush()
+        except Exception as e:
+            logger.error(f"flush_statistics: {e}")
+
+
+async def expire_statistics(interval_minutes: int = 10):
+    while not stop_task_flag.is_set():
+        await asyncio.sleep(interval_minutes * 60)
+        try:
+            await expire_raw_statistics(STATISTICS_RAW_RETENTION_HOURS)
+        except Exception as e:
+            logger.error(f"expire_statistics: {e}")
+
+
+async def flush_access_tracking(seconds: int = 10):
+    """Write the replica access times and hotness counters collected by the read routes."""
+    while not stop_task_flag.is_set():
+        await asyncio.sleep(seconds)
+        try:
+            await flush_access_times()
+            await flush_hotness()
+        except Exception as e:
+            logger.error(f"flush_access_tracking: {e}")
+
+
+async def prune_hotness_counters(minutes: int = 60):
+    while not stop_task_flag.is_set():
+        await asyncio.sleep(minutes * 60)
+        try:
+            await prune_hotness()
+        except Exception as e:
+            logger.error(f"prune_hotness_counters: {e}")
+
+
+async def replica_eviction(minutes: int = 10):
+    if not REPLICA_TTL_HOURS and not REPLICA_REGION_BUDGETS:
+        return
+    ttl = timedelta(hours=REPLICA_TTL_HOURS) if REPLICA_TTL_HOURS else None
+    while not stop_task_flag.is_set():
+        await asyncio.sleep(minutes * 60)
+        try:
+            stats = await evict_replicas(ttl, REPLICA_REGION_BUDGETS)
+            logger.info(f"replica_eviction: {stats}")
+        except Exception as e:
+            logger.error(f"replica_eviction: {e}")
+
+
+async def multipart_reaper(minutes: int = 60):
+    if not MULTIPART_ABORT_AFTER_HOURS:
+        return
+    abort_after = timedelta(hours=MULTIPART_ABORT_AFTER_HOURS)
+    while not stop_task_flag.is_set():
+        await asyncio.sleep(minutes * 60)
+        try:
+            await reap_stale_uploads(abort_after)
+        except Exception as e:
+            logger.error(f"multipart_reaper: {e}")
+
+
+async def lifecycle_gc():
+    """Apply the bucket lifecycle rules, see operations/utils/lifecycle.py."""
+    while not stop_task_flag.is_set():
+        await asyncio.sleep(LIFECYCLE_INTERVAL_MINUTES * 60)
+        try:
+            await run_lifecycle()
+        except Exception as e:
+            logger.error(f"lifecycle_gc: {e}")
+
+
 @app.on_event("shutdown")
 async def shutdown_event():
     # Set the flag to signal the background task to stop
     stop_task_flag.set()
     background_tasks.discard
+    await statistics_buffer.flush()
+    await flush_access_times()
+    await flush_hotness()
 
 
 @app.on_event("startup")
 async def startup():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
+        await conn.run_sync(alter_column_collations)
+        await conn.run_sync(create_missing_indexes)
+        await conn.run_sync(drop_retired_indexes)
         # await conn.exec_driver_sql("pragma journal_mode=memory")
         # await conn.exec_driver_sql("pragma synchronous=OFF")
 
-    task = asyncio.create_task(rm_lock_on_timeout())
-    background_tasks.add(task)
+    for background_task in [
+        rm_lock_on_timeout,
+        flush_statistics,
+        expire_statistics,
+        flush_access_tracking,
+        replica_eviction,
+        prune_hotness_counters,
+        lifecycle_gc,
+        multipart_reaper,
+    ]:
+        task = asyncio.create_task(background_task())
+        background_tasks.add(task)
 
 
 @app.get("/healthz")
@@ -145,6 +317,20 @@ async def healthz() -> HealthcheckResponse:
     return HealthcheckResponse(status="OK")
 
 
+@app.get("/lock_sweep_stats")
+async def lock_sweep_stats() -> LockSweepStats:
+    """Return the metrics of the latest rm_lock_on_timeout pass."""
+    if last_lock_sweep is None:
+        return Response(status_code=404, content="No sweep has finished yet")
+    return last_lock_sweep
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Export the server metrics in the Prometheus text format."""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 ## Add routes above this function
 def use_route_names_as_operation_ids(app: FastAPI) -> None:
     """
@@ -0,0 +1,198 @@
+"""Measure locate_object latency as the number of objects in the store grows.
+
+The benchmark grows a standalone SQLite database step by step (10k -> 10M logical objects by
+default, each with a primary and a secondary physical locator), and after every step times
+`locate_object` for random keys through the same route function the server uses.
+
+    python -m experiment.bench_locate --sizes 10000,100000,1000000,10000000
+
+Pass `--no-indexes` to drop the composite indexes and see the full-scan behavior instead.
+"""
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import typer
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from operations.utils.conf import Base, Status  # noqa: E402
+from operations.utils.db import create_missing_indexes  # noqa: E402
+from operations.schemas.bucket_schemas import (  # noqa: E402
+    DBLogicalBucket,
+    DBPhysicalBucketLocator,
+)
+from operations.schemas.object_schemas import (  # noqa: E402
+    DBLogicalObject,
+    DBPhysicalObjectLocator,
+    LocateObjectRequest,
+)
+from operations.object_operations import locate_object  # noqa: E402
+
+app = typer.Typer()
+
+BUCKET = "bench-bucket"
+PRIMARY_REGION = "aws:us-west-1"
+SECONDARY_REGION = "aws:us-east-1"
+INSERT_CHUNK = 50_000
+
+
+def object_key(i: int) -> str:
+    return f"dataset/shard-{i % 1000:04d}/object-{i:010d}"
+
+
+async def setup_bucket(engine):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(
+            DBLogicalBucket.__table__.insert(),
+            [
+                {
+                    "id": 1,
+                    "bucket": BUCKET,
+                    "prefix": "",
+                    "status": Status.ready,
+                    "creation_date": datetime.utcnow(),
+                    "version_enabled": None,
+                }
+            ],
+        )
+        await conn.execute(
+            DBPhysicalBucketLocator.__table__.insert(),
+            [
+                {
+                    "logical_bucket_id": 1,
+                    "location_tag": tag,
+                    "cloud": tag.split(":")[0],
+                    "region": tag.split(":")[1],
+                    "bucket": f"skystore-{tag.split(':')[1]}",
+                    "prefix": "",
+                    "status": Status.ready,
+                    "is_primary": tag == PRIMARY_REGION,
+                    "need_warmup": False,
+                }
+                for tag in [PRIMARY_REGION, SECONDARY_REGION]
+            ],
+        )
+
+
+async def grow(engine, start: int, end: int):
+    """Insert logical objects [start, end) along with two physical locators each."""
+    now = datetime.utcnow()
+    for chunk_start in range(start, end, INSERT_CHUNK):
+        chunk_end = min(chunk_start + INSERT_CHUNK, end)
+        async with engine.begin() as conn:
+            await conn.execute(
+                DBLogicalObject.__table__.insert(),
+                [
+                    {
+                        "id": i + 1,
+                        "bucket": BUCKET,
+                        "key": object_key(i),
+                        "size": 1024,
+                        "last_modified": now,
+                        "etag": f"etag-{i}",
+                        "status": Status.ready,
+                        "version_suspended": False,
+                        "delete_marker": False,
+                    }
+                    for i in range(chunk_start, chunk_end)
+                ],
+            )
+            await conn.execute(
+                DBPhysicalObjectLocator.__table__.insert(),
+                [
+                    {
+                        "logical_object_id": i + 1,
+                        "location_tag": tag,
+                        "cloud": tag.split(":")[0],
+                        "region": tag.split(":")[1],
+                        "bucket": f"skystore-{tag.split(':')[1]}",
+                        "key": object_key(i),
+                        "status": Status.ready,
+                        "is_primary": tag == PRIMARY_REGION,
+                    }
+                    for i in range(chunk_start, chunk_end)
+                    for tag in [PRIMARY_REGION, SECONDARY_REGION]
+                ],
+            )
+
+
+async def measure(session_maker, num_objects: int, num_requests: int):
+    latencies = []
+    for _ in range(num_requests):
+        request = LocateObjectRequest(
+            bucket=BUCKET,
+            key=object_key(random.randrange(num_objects)),
+            client_from_region=random.choice([PRIMARY_REGION, SECONDARY_REGION]),
+        )
+        async with session_maker() as db:
+            start = time.perf_counter()
+            response = await locate_object(request, db=db)
+            latencies.append(time.perf_counter() - start)
+        assert response.key == request.key, f"unexpected response: {response}"
+
+    latencies.sort()
+    return (
+        statistics.mean(latencies) * 1000,
+        latencies[len(latencies) // 2] * 1000,
+        latencies[int(len(latencies) * 0.99)] * 1000,
+    )
+
+
+async def run(db_path: str, sizes: list[int], num_requests: int, indexes: bool):
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", future=True)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    await setup_bucket(engine)
+    async with engine.begin() as conn:
+        if indexes:
+            await conn.run_sync(create_missing_indexes)
+        else:
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    await conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+
+    typer.echo(f"{'objects':>12} {'mean (ms)':>10} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+    current = 0
+    for size in sorted(sizes):
+        await grow(engine, current, size)
+        current = size
+        async with engine.begin() as conn:
+            await conn.execute(text("ANALYZE"))
+        mean, p50, p99 = await measure(session_maker, current, num_requests)
+        typer.echo(f"{current:>12} {mean:>10.3f} {p50:>10.3f} {p99:>10.3f}")
+
+    await engine.dispose()
+
+
+@app.command()
+def main(
+    sizes: str = typer.Option(
+        "10000,100000,1000000,10000000",
+        "--sizes",
+        help="Comma separated object counts to measure at",
+    ),
+    num_requests: int = typer.Option(
+        1000, "--requests", help="Number of locate requests per measurement"
+    ),
+    db_path: str = typer.Option("bench_locate.db", "--db", help="Path to the database"),
+    indexes: bool = typer.Option(
+        True, "--indexes/--no-indexes", help="Whether to create the composite indexes"
+    ),
+):
+    asyncio.run(
+        run(db_path, [int(size) for size in sizes.split(",")], num_requests, indexes)
+    )
+
+
+if __name__ == "__main__":
+    app()
@@ -14,6 +14,9 @@ from operations.schemas.bucket_schemas import (
     HeadBucketRequest,
     BucketStatus,
     PutBucketVersioningRequest,
+    LifecycleRule,
+    PutBucketLifecycleRequest,
+    GetBucketLifecycleRequest,
 )
 from datetime import datetime
 from sqlalchemy.orm import joinedload
@@ -27,6 +30,7 @@ from operations.utils.conf import (
 from sqlalchemy.orm import Session
 from fastapi import APIRouter, Depends, status
 from operations.utils.db import get_session, logger
+from operations.utils.bucket_cache import invalidate_bucket_metadata
 from typing import List
 import os
 
@@ -99,6 +103,7 @@ async def register_buckets(
             db.add(physical_bucket_locator)
 
     await db.commit()
+    invalidate_bucket_metadata(request.bucket)
 
     return Response(
         status_code=200,
@@ -155,6 +160,7 @@ async def start_create_bucket(
 
     db.add_all(bucket_locators)
     await db.commit()
+    invalidate_bucket_metadata(request.bucket)
 
     logger.debug(f"start_create_bucket: {request} -> {bucket_locators}")
 
@@ -196,6 +202,7 @@ async def complete_create_bucket(
         )
 
     await db.commit()
+    invalidate_bucket_metadata(physical_locator.logical_bucket.bucket)
 
 
 @router.post("/start_delete_bucket")
@@ -249,6 +256,7 @@ async def start_delete_bucket(
     except Exception as e:
         logger.error(f"Error occurred while committing changes: {e}")
         return Response(status_code=500, content="Error committing changes")
+    invalidate_bucket_metadata(request.bucket)
 
     logger.debug(f"start_delete_bucket: {request} -> {logical_bucket}")
 
@@ -294,6 +302,7 @@ async def complete_delete_bucket(
     except Exception as e:
         logger.error(f"Error occurred while committing changes: {e}")
         return Response(status_code=500, content="Error committing changes")
+    invalidate_bucket_metadata(physical_locator.logical_bucket.bucket)
 
 
 @router.post(
@@ -411,10 +420,57 @@ async def put_bucket_versioning(
         )
 
     await db.commit()
+    invalidate_bucket_metadata(request.bucket)
 
     return locators_lst
 
 
+@router.post("/put_bucket_lifecycle")
+async def put_bucket_lifecycle(
+    request: PutBucketLifecycleRequest, db: Session = Depends(get_session)
+):
+    stmt = select(DBLogicalBucket).where(
+        DBLogicalBucket.bucket == request.bucket, DBLogicalBucket.status == Status.ready
+    )
+    bucket = await db.scalar(stmt)
+
+    if bucket is None:
+        return Response(status_code=404, content="Not Found")
+
+    logger.debug(f"put_bucket_lifecycle: {request} -> {bucket}")
+
+    rule = request.rule or LifecycleRule()
+    bucket.lifecycle_noncurrent_days = rule.noncurrent_days
+    bucket.lifecycle_newer_noncurrent_versions = rule.newer_noncurrent_versions
+    bucket.lifecycle_expired_object_delete_marker = rule.expired_object_delete_marker
+
+    await db.commit()
+
+
+@router.post("/get_bucket_lifecycle")
+async def get_bucket_lifecycle(
+    request: GetBucketLifecycleRequest, db: Session = Depends(get_session)
+) -> LifecycleRule:
+    stmt = select(DBLogicalBucket).where(
+        DBLogicalBucket.bucket == request.bucket, DBLogicalBucket.status == Status.ready
+    )
+    bucket = await db.scalar(stmt)
+
+    if bucket is None:
+        return Response(status_code=404, content="Not Found")
+
+    rule = LifecycleRule(
+        noncurrent_days=bucket.lifecycle_noncurrent_days,
+        newer_noncurrent_versions=bucket.lifecycle_newer_noncurrent_versions,
+        expired_object_delete_marker=bool(
+            bucket.lifecycle_expired_object_delete_marker
+        ),
+    )
+    if rule == LifecycleRule():
+        return Response(status_code=404, content="No Lifecycle Rule")
+    return rule
+
+
 @router.post("/check_version_setting")
 async def check_version_setting(
     request: HeadBucketRequest, db: Session = Depends(get_session)
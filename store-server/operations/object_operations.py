@@ -1,68 +1,176 @@
+import base64
+import hashlib
+import json
 import uuid
 from operations.schemas.object_schemas import (
     DBLogicalObject,
     DBStatisticsObject,
+    DBStatisticsRollup,
+    DBObjectHotness,
     DBPhysicalObjectLocator,
     DBLogicalMultipartUploadPart,
     DBPhysicalMultipartUploadPart,
+    DBMultipartAbort,
     ObjectResponse,
     LocateObjectRequest,
     LocateObjectResponse,
+    LocateObjectsBatchRequest,
+    ListEvictionsRequest,
+    HotObjectsRequest,
+    HotObject,
+    HotObjectsResponse,
+    ListEvictionsResponse,
+    ListLifecycleDeletionsRequest,
+    ListLifecycleDeletionsResponse,
+    LocateObjectsBatchResult,
+    LocateObjectsBatchResponse,
     DeleteObjectsRequest,
     DeleteObjectsResponse,
     DeleteObjectsIsCompleted,
+    CompleteDeleteObjectsResponse,
     ObjectStatus,
     StartUploadRequest,
     StartWarmupRequest,
     StartWarmupResponse,
+    StartWarmupBatchRequest,
+    StartWarmupBatchItem,
+    StartWarmupBatchResponse,
     StartUploadResponse,
     PatchUploadIsCompleted,
+    CompleteMultipartRequest,
+    CompleteUploadBatchRequest,
+    CompleteUploadBatchResponse,
+    PatchResult,
     PatchUploadMultipartUploadId,
     PatchUploadMultipartUploadPart,
+    AppendPartsBatchRequest,
+    AppendPartsBatchResponse,
     ContinueUploadRequest,
     ContinueUploadResponse,
     ContinueUploadPhysicalPart,
     ListObjectRequest,
+    ListObjectsV2Request,
+    ListObjectsV2Response,
+    ListObjectVersionsRequest,
+    ListObjectVersionsResponse,
+    ObjectVersionResponse,
     HeadObjectRequest,
     HeadObjectResponse,
     ListPartsRequest,
     LogicalPartResponse,
     MultipartResponse,
+    ListMultipartAbortsRequest,
+    MultipartAbort,
+    ListMultipartAbortsResponse,
+    CompleteMultipartAbortsRequest,
     DeleteMarker,
     RecordMetricsRequest,
+    RecordMetricsBatchRequest,
     ListMetricsRequest,
     ListMetricsObject,
+    ListMetricsRollupObject,
     ListMetricsResponse,
 )
 from operations.schemas.bucket_schemas import DBLogicalBucket
-from sqlalchemy.orm import selectinload, Session
+from sqlalchemy.orm import aliased, joinedload, selectinload, Session
 from itertools import zip_longest
 from sqlalchemy.sql import select
-from sqlalchemy import or_, text
+from sqlalchemy import and_, bindparam, delete, or_, tuple_, update
 from sqlalchemy import func
 from operations.utils.conf import Status
 from fastapi import APIRouter, Response, Depends, status
-from operations.utils.db import get_session, logger
-from typing import List
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from operations.utils.db import (
+    async_session,
+    get_session,
+    logger,
+    begin_write,
+    chunked,
+    lock_object_key,
+)
+from operations.utils.statistics import LatencySketch, statistics_buffer
+from operations.utils.placement import get_placement_engine
+from operations.utils.eviction import record_access
+from operations.utils.hotness import decayed_score, flush_hotness, record_hit
+from operations.utils.bucket_cache import get_bucket_metadata
+from operations.utils.parts import APPEND_PART_COALESCE_MS, part_coalescer, record_parts
+from typing import List, Optional
 from datetime import datetime
 
 
 router = APIRouter()
 
+# page size cap of list_objects_v2, same as S3
+LIST_OBJECTS_MAX_KEYS = 1000
+# S3 caps a multipart upload at 10000 parts, so a page this long lists every part
+MAX_PARTS = 10000
+
+
+def locate_stmt(bucket: str):
+    """Select the columns a `LocateObjectResponse` is built from, one row per ready physical
+    locator of the ready logical objects in `bucket`. Rows are plain tuples, no ORM objects.
+    """
+    return (
+        select(
+            DBPhysicalObjectLocator.id,
+            DBPhysicalObjectLocator.location_tag,
+            DBPhysicalObjectLocator.cloud,
+            DBPhysicalObjectLocator.bucket,
+            DBPhysicalObjectLocator.region,
+            DBPhysicalObjectLocator.key,
+            DBPhysicalObjectLocator.version_id,
+            DBLogicalObject.id.label("logical_object_id"),
+            DBLogicalObject.size,
+            DBLogicalObject.last_modified,
+            DBLogicalObject.etag,
+            DBLogicalObject.delete_marker,
+        )
+        .join(
+            DBLogicalObject,
+            DBLogicalObject.id == DBPhysicalObjectLocator.logical_object_id,
+        )
+        .where(DBLogicalObject.bucket == bucket)
+        .where(DBLogicalObject.status == Status.ready)
+        .where(DBPhysicalObjectLocator.status == Status.ready)
+    )
+
+
+def locator_preference(client_from_region: str):
+    """ORDER BY terms ranking the physical locators of one logical object: the client's own
+    region first, then the primary."""
+    return (
+        (DBPhysicalObjectLocator.location_tag == client_from_region).desc(),
+        DBPhysicalObjectLocator.is_primary.desc(),
+    )
+
+
+def locate_response(row, version_enabled: Optional[bool]) -> LocateObjectResponse:
+    return LocateObjectResponse(
+        id=row.id,
+        tag=row.location_tag,
+        cloud=row.cloud,
+        bucket=row.bucket,
+        region=row.region,
+        key=row.key,
+        size=row.size,
+        last_modified=row.last_modified,
+        etag=row.etag,
+        version_id=row.version_id,  # here must use the physical version
+        version=row.logical_object_id if version_enabled is not None else None,
+    )
+
 
 @router.post("/start_delete_objects")
 async def start_delete_objects(
     request: DeleteObjectsRequest, db: Session = Depends(get_session)
 ) -> DeleteObjectsResponse:
-    await db.execute(text("BEGIN IMMEDIATE;"))
+    await begin_write(db)
 
-    version_enabled = (
-        await db.execute(
-            select(DBLogicalBucket.version_enabled).where(
-                DBLogicalBucket.bucket == request.bucket
-            )
-        )
-    ).all()[0][0]
+    bucket_metadata = await get_bucket_metadata(db, request.bucket)
+    if bucket_metadata is None:
+        return Response(status_code=404, content="Bucket Not Found")
+    version_enabled = bucket_metadata.version_enabled
 
     specific_version = any(
         len(request.object_identifiers[key]) > 0 for key in request.object_identifiers
@@ -79,128 +187,104 @@ async def start_delete_objects(
             content="Mismatched lengths for ids and multipart_upload_ids",
         )
 
-    locator_dict = {}
-    delete_marker_dict = {}
+    keys = list(request.object_identifiers)
+    multipart_upload_ids = dict(zip(keys, request.multipart_upload_ids or []))
+    # a consistent order so that two batches sharing keys cannot deadlock
+    for key in sorted(keys):
+        await lock_object_key(db, request.bucket, key)
+
+    # One query for the candidate versions of every key: the ready versions of plain keys,
+    # and the ready or pending version of the given upload for multipart keys.
+    plain_keys = [key for key in keys if not multipart_upload_ids.get(key)]
+    multipart_keys = [
+        (key, multipart_upload_ids[key])
+        for key in keys
+        if multipart_upload_ids.get(key)
+    ]
+    # Chunked so that large batches stay within the bind parameter limits.
+    candidates = [
+        and_(
+            DBLogicalObject.key.in_(chunk),
+            DBLogicalObject.status == Status.ready,
+        )
+        for chunk in chunked(plain_keys)
+    ] + [
+        and_(
+            tuple_(DBLogicalObject.key, DBLogicalObject.multipart_upload_id).in_(chunk),
+            DBLogicalObject.status.in_([Status.ready, Status.pending]),
+        )
+        for chunk in chunked(multipart_keys)
+    ]
+    versions = {key: [] for key in keys}
+    for condition in candidates:
+        stmt = (
+            select(DBLogicalObject)
+            .options(selectinload(DBLogicalObject.physical_object_locators))
+            .where(DBLogicalObject.bucket == request.bucket)
+            .where(condition)
+            # the most recent version of a key comes first, and if there is a
+            # version-suspended marker, it will be the first one
+            .order_by(DBLogicalObject.id.desc())
+            .with_for_update(of=DBLogicalObject)
+        )
+        for logical_obj in await db.scalars(stmt):
+            versions[logical_obj.key].append(logical_obj)
+
+    if any(len(logical_objs) == 0 for logical_objs in versions.values()):
+        return Response(status_code=404, content="Objects not found")
+
+    # Follow the semantics of S3:
+    # Check it here:
+    # https://docs.aws.amazon.com/AmazonS3/latest/userguide/DeletingObjectVersions.html
+    # https://docs.aws.amazon.com/AmazonS3/latest/userguide/DeletingObjectsfromVersioningSuspendedBuckets.html
+    # https://docs.aws.amazon.com/AmazonS3/latest/userguide/DeleteMarker.html
+    # https://docs.aws.amazon.com/AmazonS3/latest/userguide/ManagingDelMarkers.html
+    # Every key is decided in memory first, nothing is written unless all of them can be
+    # deleted.
     op_type = {}
-    for key, multipart_upload_id in zip_longest(
-        request.object_identifiers, request.multipart_upload_ids or []
-    ):
-        if multipart_upload_id:
-            stmt = (
-                select(DBLogicalObject)
-                .options(selectinload(DBLogicalObject.physical_object_locators))
-                .where(DBLogicalObject.bucket == request.bucket)
-                .where(DBLogicalObject.key == key)
-                .where(
-                    or_(
-                        DBLogicalObject.status == Status.ready,
-                        DBLogicalObject.status == Status.pending,
-                    )
-                )
-                .where(DBLogicalObject.multipart_upload_id == multipart_upload_id)
-            )
+    marker_of = {}  # key -> latest version, for the keys that get a new delete marker
+    deleted_versions = {}  # key -> versions to delete (delete) or to mark (replace)
+    for key, logical_objs in versions.items():
+        version_ids = request.object_identifiers[key]
+        latest = logical_objs[0]
+        if not version_ids and (
+            version_enabled is True
+            or (version_enabled is False and latest.version_suspended is False)
+        ):
+            # under both these cases, in S3 semantics, we will add things to the DB and
+            # doesn't touch the older ones, so complete_delete_objects sets the newly created
+            # delete marker to ready rather than deleting the older versions
+            op_type[key] = "add"
+            marker_of[key] = latest
+            continue
+
+        if not version_ids and version_enabled is False and latest.version_suspended:
+            # remove the null version and replace the one with a delete marker
+            # NOTE: The obj being removed can also be a delete marker with null version
+            # We just need to update the metadata of the existing objects, also don't
+            # remove anything in the DB
+            op_type[key] = "replace"
+            deleted_versions[key] = [latest]
         else:
-            stmt = (
-                select(DBLogicalObject)
-                .options(selectinload(DBLogicalObject.physical_object_locators))
-                .where(DBLogicalObject.bucket == request.bucket)
-                .where(DBLogicalObject.key == key)
-                .where(DBLogicalObject.status == Status.ready)
-                .order_by(DBLogicalObject.id.desc())
-            )
-        # multiple versioning support
-        logical_objs = (await db.scalars(stmt)).all()
-
-        if len(logical_objs) == 0:
-            return Response(status_code=404, content="Objects not found")
-
-        version_suspended = logical_objs[0].version_suspended
-
-        locators = []
-        replaced = False
-        add_obj = False
-        pre_logical_obj = None
-        # since we have ordered the logical objects before traversing them
-        # the first one will be the most recent one
-        # and if there is a version-suspended marker, it will be the first one
-        # if it's a multipart, the upload_id is unique, so we can just delete the first one
-        for idx, logical_obj in enumerate(logical_objs):
-            # Follow the semantics of S3:
-            # Check it here:
-            # https://docs.aws.amazon.com/AmazonS3/latest/userguide/DeletingObjectVersions.html
-            # https://docs.aws.amazon.com/AmazonS3/latest/userguide/DeletingObjectsfromVersioningSuspendedBuckets.html
-            # https://docs.aws.amazon.com/AmazonS3/latest/userguide/DeleteMarker.html
-            # https://docs.aws.amazon.com/AmazonS3/latest/userguide/ManagingDelMarkers.html
-
-            # simple delete
-            if len(request.object_identifiers[key]) == 0 and idx == 0:
-                if version_enabled is True or (
-                    version_enabled is False and version_suspended is False
-                ):
-                    # under both these cases, in S3 semantics, we will add things to the DB and doesn't touch the older ones
-                    # so here, we need to add new logical object and physical object locators
-                    # This also indicates, when we returning back to the complete_delete_objects function,
-                    # The status of objects that need to be updated will be these newly created objects
-                    # rather than the older ones. So what will be included in the returned locators list
-                    # will be the newly created ones.
-                    pre_logical_obj = logical_obj
-                    # insert a delete marker
-                    logical_obj = DBLogicalObject(
-                        bucket=logical_obj.bucket,
-                        key=logical_obj.key,
-                        size=logical_obj.size,
-                        last_modified=logical_obj.last_modified,
-                        etag=logical_obj.etag,
-                        status=Status.pending,
-                        multipart_upload_id=logical_obj.multipart_upload_id,
-                        delete_marker=True,
-                        version_suspended=False if version_enabled is True else True,
-                    )
-                    db.add(logical_obj)
-                    new_physical_locators = []
-                    # need to also add new physical object locators
-                    for physical_locator in pre_logical_obj.physical_object_locators:
-                        new_physical_locators.append(
-                            DBPhysicalObjectLocator(
-                                logical_object=logical_obj,
-                                location_tag=physical_locator.location_tag,
-                                cloud=physical_locator.cloud,
-                                region=physical_locator.region,
-                                bucket=physical_locator.bucket,
-                                key=physical_locator.key,
-                                status=Status.pending,
-                                is_primary=physical_locator.is_primary,
-                                # version_id=physical_locators.version_id,
-                            )
-                        )
-                    db.add_all(new_physical_locators)
-                    add_obj = True
-                elif version_enabled is False and version_suspended is True:
-                    # remove the null version and replace the one with a delete marker
-                    # NOTE: The obj being removed can also be a delete marker with null version
-                    # We just need to update the metadata of the existing objects, also don't remove anything in the DB
-                    logical_obj.delete_marker = True
-                    replaced = True
-            # For the case adding new objs to the DB, we need to commit first
-            # in order to use them in the following traversal
-            if add_obj:
-                await db.commit()
-
-            if len(request.object_identifiers[key]) > 0 and (
-                logical_obj.id not in request.object_identifiers[key]
-            ):
-                continue  # skip if the version_id is not in the request
-
-            for physical_locator, pre_physical_locator in zip_longest(
-                logical_obj.physical_object_locators,
-                pre_logical_obj.physical_object_locators if pre_logical_obj else [],
-            ):
-                await db.refresh(physical_locator, ["logical_object"])
-
-                if (
-                    not add_obj
-                    and physical_locator.status not in Status.ready
-                    and not multipart_upload_id
+            # a specific set of versions, or every version of an unversioned key; if it's a
+            # multipart, the upload_id is unique, so there is a single version
+            op_type[key] = "delete"
+            deleted_versions[key] = [
+                logical_obj
+                for logical_obj in logical_objs
+                if not version_ids or logical_obj.id in version_ids
+            ]
+
+        if multipart_upload_ids.get(key):
+            continue
+        for logical_obj in deleted_versions[key]:
+            for physical_locator in logical_obj.physical_object_locators:
+                # a replica already marked pending_deletion by eviction is deleted along
+                # with the others, list_evictions stops returning it once its version is
+                # pending_deletion
+                if physical_locator.status not in (
+                    Status.ready,
+                    Status.pending_deletion,
                 ):
                     logger.error(
                         f"Cannot delete physical object. Current status is {physical_locator.status}"
@@ -210,60 +294,130 @@ async def start_delete_objects(
                         content="Cannot delete physical object in current state",
                     )
 
-                if not add_obj and not replaced:
-                    physical_locator.status = Status.pending_deletion
-                    physical_locator.lock_acquired_ts = datetime.utcnow()
-                locators.append(
-                    LocateObjectResponse(
-                        id=physical_locator.id,
-                        tag=physical_locator.location_tag,
-                        cloud=physical_locator.cloud,
-                        bucket=physical_locator.bucket,
-                        region=physical_locator.region,
-                        key=physical_locator.key,
-                        size=physical_locator.logical_object.size,
-                        last_modified=physical_locator.logical_object.last_modified,
-                        etag=physical_locator.logical_object.etag,
-                        multipart_upload_id=physical_locator.multipart_upload_id,
-                        # the version_id should be the one that we want the client to operate on
-                        # so when we add objects into the DB, we still want the client to cope with the previous version
-                        version_id=physical_locator.version_id
-                        if pre_physical_locator is None
-                        else pre_physical_locator.version_id,
-                        version=physical_locator.logical_object.id
-                        if version_enabled is not None
-                        else None,
-                    )
+    # a delete marker is stamped with the deletion time, the lifecycle rules count the
+    # versions it hides as noncurrent from then on
+    deleted_at = datetime.utcnow()
+
+    # insert the delete markers and their locators in bulk
+    markers = {}
+    for key, latest in marker_of.items():
+        marker = markers[key] = DBLogicalObject(
+            bucket=latest.bucket,
+            key=latest.key,
+            size=latest.size,
+            last_modified=deleted_at,
+            etag=latest.etag,
+            status=Status.pending,
+            delete_marker=True,
+            version_suspended=False if version_enabled is True else True,
+        )
+        db.add(marker)
+        db.add_all(
+            [
+                DBPhysicalObjectLocator(
+                    logical_object=marker,
+                    location_tag=physical_locator.location_tag,
+                    cloud=physical_locator.cloud,
+                    region=physical_locator.region,
+                    bucket=physical_locator.bucket,
+                    key=physical_locator.key,
+                    status=Status.pending,
+                    is_primary=physical_locator.is_primary,
                 )
+                for physical_locator in latest.physical_object_locators
+            ]
+        )
+    if markers:
+        # the response carries the ids of the new rows
+        await db.flush()
+
+    # and flip everything that is deleted with two updates
+    deleted_logical_ids, deleted_physical_ids = [], []
+    for key, logical_objs in deleted_versions.items():
+        if op_type[key] == "replace":
+            logical_objs[0].delete_marker = True
+            logical_objs[0].last_modified = deleted_at
+            continue
+        for logical_obj in logical_objs:
+            deleted_logical_ids.append(logical_obj.id)
+            deleted_physical_ids.extend(
+                physical_locator.id
+                for physical_locator in logical_obj.physical_object_locators
+            )
+    for chunk in chunked(deleted_physical_ids):
+        await db.execute(
+            update(DBPhysicalObjectLocator)
+            .where(DBPhysicalObjectLocator.id.in_(chunk))
+            .values(status=Status.pending_deletion, lock_acquired_ts=datetime.utcnow())
+        )
+    for chunk in chunked(deleted_logical_ids):
+        await db.execute(
+            update(DBLogicalObject)
+            .where(DBLogicalObject.id.in_(chunk))
+            .values(status=Status.pending_deletion)
+        )
 
-            if not add_obj and not replaced:
-                logical_obj.status = Status.pending_deletion
-
-            try:
-                await db.commit()
-            except Exception as e:
-                logger.error(f"Error occurred while committing changes: {e}")
-                return Response(status_code=500, content="Error committing changes")
-
-            logger.debug(f"start_delete_object: {request} -> {logical_obj}")
-
-            # for these cases, we only need to deal with the first logical object
-            if replaced or add_obj:
-                break
+    def locator_response(logical_obj, physical_locator, version_id):
+        return LocateObjectResponse(
+            id=physical_locator.id,
+            tag=physical_locator.location_tag,
+            cloud=physical_locator.cloud,
+            bucket=physical_locator.bucket,
+            region=physical_locator.region,
+            key=physical_locator.key,
+            size=logical_obj.size,
+            last_modified=logical_obj.last_modified,
+            etag=logical_obj.etag,
+            multipart_upload_id=physical_locator.multipart_upload_id,
+            version_id=version_id,
+            version=logical_obj.id if version_enabled is not None else None,
+        )
 
-        locator_dict[key] = locators
+    locator_dict = {}
+    delete_marker_dict = {}
+    for key in keys:
+        if key in markers:
+            marker = markers[key]
+            # the version_id should be the one that we want the client to operate on, so
+            # the client still copes with the previous version
+            locator_dict[key] = [
+                locator_response(
+                    marker, physical_locator, pre_physical_locator.version_id
+                )
+                for physical_locator, pre_physical_locator in zip(
+                    marker.physical_object_locators,
+                    marker_of[key].physical_object_locators,
+                )
+            ]
+            reported = marker
+        else:
+            locator_dict[key] = [
+                locator_response(
+                    logical_obj, physical_locator, physical_locator.version_id
+                )
+                for logical_obj in deleted_versions[key]
+                for physical_locator in logical_obj.physical_object_locators
+            ]
+            # the last version that was looked at, as the per-version loop used to report
+            reported = (
+                deleted_versions[key][0]
+                if op_type[key] == "replace"
+                else versions[key][-1]
+            )
         delete_marker_dict[key] = DeleteMarker(
-            delete_marker=logical_obj.delete_marker,
+            delete_marker=reported.delete_marker,
             version_id=None
-            if logical_obj.version_suspended or version_enabled is None
-            else logical_obj.id,
+            if reported.version_suspended or version_enabled is None
+            else reported.id,
         )
-        if add_obj:
-            op_type[key] = "add"
-        elif replaced:
-            op_type[key] = "replace"
-        else:
-            op_type[key] = "delete"
+
+    try:
+        await db.commit()
+    except Exception as e:
+        logger.error(f"Error occurred while committing changes: {e}")
+        return Response(status_code=500, content="Error committing changes")
+
+    logger.debug(f"start_delete_objects: {request} -> {op_type}")
 
     return DeleteObjectsResponse(
         locators=locator_dict,
@@ -275,14 +429,16 @@ async def start_delete_objects(
 @router.patch("/complete_delete_objects")
 async def complete_delete_objects(
     request: DeleteObjectsIsCompleted, db: Session = Depends(get_session)
-):
+) -> CompleteDeleteObjectsResponse:
     # For the version support, we need to perform different operations
     # based on the initial delete op type
     # If the op type is delete, we need to delete the physical object locators and logical objects possibly
     # If the op type is replace, we don't need to do anything
     # If the op type is add, we need to update the metadata of the existing objects from pending to ready
+    # Every id gets its own result; the valid ones are applied with bulk statements in one
+    # transaction even if others fail.
+    await begin_write(db)
 
-    # TODO: need to deal with partial failures
     if request.multipart_upload_ids and len(request.ids) != len(
         request.multipart_upload_ids
     ):
@@ -291,104 +447,121 @@ async def complete_delete_objects(
             content="Mismatched lengths for ids and multipart_upload_ids",
         )
 
-    for idx, (id, multipart_upload_id, op_type) in enumerate(
-        zip_longest(
-            request.ids,
-            request.multipart_upload_ids or [],
-            request.op_type,
-        )
+    physical_locators = {}
+    for chunk in chunked(set(request.ids)):
+        for row in await db.execute(
+            select(
+                DBPhysicalObjectLocator.id,
+                DBPhysicalObjectLocator.logical_object_id,
+                DBPhysicalObjectLocator.status,
+                DBPhysicalObjectLocator.multipart_upload_id,
+            ).where(DBPhysicalObjectLocator.id.in_(chunk))
+        ):
+            physical_locators[row.id] = row
+
+    results = []
+    deleted_ids, added_ids = set(), set()
+    deleted_logical_ids, added_logical_ids = set(), set()
+    for id, multipart_upload_id, op_type in zip_longest(
+        request.ids,
+        request.multipart_upload_ids or [],
+        request.op_type,
     ):
-        if op_type == "delete":
-            physical_locator_stmt = (
-                select(DBPhysicalObjectLocator)
-                .where(DBPhysicalObjectLocator.id == id)
-                .where(
-                    DBPhysicalObjectLocator.multipart_upload_id == multipart_upload_id
-                    if multipart_upload_id
-                    else True
-                )
+        if op_type == "replace":
+            results.append(PatchResult(id=id, status_code=200))
+            continue
+        if op_type not in ("delete", "add"):
+            logger.error(f"Invalid op_type: {op_type}")
+            results.append(
+                PatchResult(id=id, status_code=400, content="Invalid op_type")
             )
+            continue
 
-            physical_locator = await db.scalar(physical_locator_stmt)
-
-            if physical_locator is None:
-                logger.error(f"physical locator not found: {request}")
-                return Response(status_code=404, content="Physical Object Not Found")
-
-            await db.refresh(physical_locator, ["logical_object"])
-
-            logger.debug(f"complete_delete_object: {request} -> {physical_locator}")
-
-            if physical_locator.status != Status.pending_deletion:
-                return Response(
-                    status_code=409,
-                    content="Physical object is not marked for deletion",
-                )
-
-            await db.delete(physical_locator)
-
-            # only delete the logical object with same version if there is no other physical object locator if possible
-            remaining_physical_locators_stmt = select(DBPhysicalObjectLocator).where(
-                DBPhysicalObjectLocator.logical_object_id
-                == physical_locator.logical_object.id
-            )
-            remaining_physical_locators = await db.execute(
-                remaining_physical_locators_stmt
+        physical_locator = physical_locators.get(id)
+        if physical_locator is None or (
+            multipart_upload_id
+            and physical_locator.multipart_upload_id != multipart_upload_id
+        ):
+            logger.error(f"physical locator not found: {id}")
+            results.append(
+                PatchResult(id=id, status_code=404, content="Physical Object Not Found")
             )
-            if not remaining_physical_locators.all():
-                await db.delete(physical_locator.logical_object)
-
-        elif op_type == "replace":
             continue
-        elif op_type == "add":
-            physical_locator_stmt = (
-                select(DBPhysicalObjectLocator)
-                .where(DBPhysicalObjectLocator.id == id)
-                .where(
-                    DBPhysicalObjectLocator.multipart_upload_id == multipart_upload_id
-                    if multipart_upload_id
-                    else True
-                )
-            )
-
-            physical_locator = await db.scalar(physical_locator_stmt)
-
-            if physical_locator is None:
-                logger.error(f"physical locator not found: {request}")
-                return Response(status_code=404, content="Physical Object Not Found")
-
-            await db.refresh(physical_locator, ["logical_object"])
 
-            logger.debug(f"complete_delete_object: {request} -> {physical_locator}")
-
-            if physical_locator.status != Status.pending:
-                return Response(
-                    status_code=409, content="Physical object is not marked for pending"
+        if op_type == "delete":
+            if physical_locator.status != Status.pending_deletion:
+                results.append(
+                    PatchResult(
+                        id=id,
+                        status_code=409,
+                        content="Physical object is not marked for deletion",
+                    )
                 )
-
-            physical_locator.status = Status.ready
-            physical_locator.lock_acquired_ts = None
-
-            # if this is the first physical locators we cope with linked with some
-            # logical objects whose status is pending, we change the status of the logical object
-            # to ready
-
-            if idx == 0:
-                stmt = select(DBLogicalObject).where(
-                    DBLogicalObject.id == physical_locator.logical_object_id
+                continue
+            deleted_ids.add(id)
+            deleted_logical_ids.add(physical_locator.logical_object_id)
+        else:
+            if physical_locator.status != Status.pending:
+                results.append(
+                    PatchResult(
+                        id=id,
+                        status_code=409,
+                        content="Physical object is not marked for pending",
+                    )
                 )
+                continue
+            added_ids.add(id)
+            # the delete marker the locator belongs to becomes ready with it
+            added_logical_ids.add(physical_locator.logical_object_id)
+        results.append(PatchResult(id=id, status_code=200))
+
+    # chunked so that large batches stay within the bind parameter limits
+    for chunk in chunked(added_ids):
+        await db.execute(
+            update(DBPhysicalObjectLocator)
+            .where(DBPhysicalObjectLocator.id.in_(chunk))
+            .values(status=Status.ready, lock_acquired_ts=None)
+        )
+    for chunk in chunked(added_logical_ids):
+        await db.execute(
+            update(DBLogicalObject)
+            .where(DBLogicalObject.id.in_(chunk))
+            .where(DBLogicalObject.status == Status.pending)
+            .values(status=Status.ready)
+        )
 
-                logical_obj = await db.scalar(stmt)
-
-                if logical_obj is None:
-                    logger.error(f"logical object not found: {request}")
-                    return Response(status_code=404, content="Logical Object Not Found")
-
-                logical_obj.status = Status.ready
-
-        else:
-            logger.error(f"Invalid op_type: {op_type}")
-            return Response(status_code=400, content="Invalid op_type")
+    for chunk in chunked(deleted_ids):
+        # bulk DELETEs skip the ORM cascades, remove the parts explicitly
+        await db.execute(
+            delete(DBPhysicalMultipartUploadPart).where(
+                DBPhysicalMultipartUploadPart.physical_object_locator_id.in_(chunk)
+            )
+        )
+        await db.execute(
+            delete(DBPhysicalObjectLocator).where(DBPhysicalObjectLocator.id.in_(chunk))
+        )
+    # only delete the logical objects left without any physical object locator
+    has_locators = (
+        select(DBPhysicalObjectLocator.id)
+        .where(DBPhysicalObjectLocator.logical_object_id == DBLogicalObject.id)
+        .exists()
+    )
+    for chunk in chunked(deleted_logical_ids):
+        orphaned_ids = (
+            select(DBLogicalObject.id)
+            .where(DBLogicalObject.id.in_(chunk))
+            .where(~has_locators)
+        )
+        await db.execute(
+            delete(DBLogicalMultipartUploadPart).where(
+                DBLogicalMultipartUploadPart.logical_object_id.in_(orphaned_ids)
+            )
+        )
+        await db.execute(
+            delete(DBLogicalObject)
+            .where(DBLogicalObject.id.in_(chunk))
+            .where(~has_locators)
+        )
 
     try:
         await db.commit()
@@ -396,6 +569,10 @@ async def complete_delete_objects(
         logger.error(f"Error occurred while committing changes: {e}")
         return Response(status_code=500, content="Error committing changes")
 
+    logger.debug(f"complete_delete_objects: {request} -> {results}")
+
+    return CompleteDeleteObjectsResponse(results=results)
+
 
 @router.post(
     "/locate_object",
@@ -409,93 +586,261 @@ async def locate_object(
 ) -> LocateObjectResponse:
     """Given the logical object information, return one or zero physical object locators."""
 
-    version_enabled = (
-        await db.execute(
-            select(DBLogicalBucket.version_enabled).where(
-                DBLogicalBucket.bucket == request.bucket
-            )
-        )
-    ).all()[0][0]
+    bucket_metadata = await get_bucket_metadata(db, request.bucket)
+    if bucket_metadata is None:
+        return Response(status_code=404, content="Bucket Not Found")
+    version_enabled = bucket_metadata.version_enabled
 
     if version_enabled is None and request.version_id:
         return Response(status_code=400, content="Versioning is not enabled")
 
+    # Resolve the version and the preferred physical locator in a single statement
+    stmt = locate_stmt(request.bucket)
     if request.version_id is not None:
-        stmt = (
-            select(DBLogicalObject)
-            .join(DBPhysicalObjectLocator)
-            .where(DBLogicalObject.bucket == request.bucket)
-            .where(DBLogicalObject.key == request.key)
-            .where(DBLogicalObject.status == Status.ready)
-            .where(
-                DBLogicalObject.id == request.version_id
-            )  # select the one with specific version
-            .where(DBPhysicalObjectLocator.status == Status.ready)
-        )
-    else:
-        stmt = (
-            select(DBLogicalObject)
-            .join(DBPhysicalObjectLocator)
-            .where(DBLogicalObject.bucket == request.bucket)
-            .where(DBLogicalObject.key == request.key)
-            .where(DBLogicalObject.status == Status.ready)
-            .where(DBPhysicalObjectLocator.status == Status.ready)
-            .order_by(DBLogicalObject.id.desc())  # select the latest version
-            # .first()
-        )
-    locators = (await db.scalars(stmt)).first()
+        # select the one with specific version
+        stmt = stmt.where(DBLogicalObject.id == request.version_id)
+    # select the latest version, then the best locator of it
+    stmt = stmt.where(DBLogicalObject.key == request.key).order_by(
+        DBLogicalObject.id.desc(), *locator_preference(request.client_from_region)
+    )
+    chosen_locator = (await db.execute(stmt.limit(1))).first()
 
     # https://docs.aws.amazon.com/AmazonS3/latest/userguide/DeletingObjectVersions.html
-    if locators is None or (locators.delete_marker and not request.version_id):
+    if chosen_locator is None or (
+        chosen_locator.delete_marker and not request.version_id
+    ):
         return Response(status_code=404, content="Object Not Found")
 
     # https://docs.aws.amazon.com/AmazonS3/latest/userguide/DeleteMarker.html
-    if locators and locators.delete_marker and request.version_id:
+    if chosen_locator.delete_marker and request.version_id:
         return Response(status_code=405, content="Not allowed to get a delete marker")
 
-    chosen_locator = None
-    reason = ""
+    logger.debug(f"locate_object: {request} -> {chosen_locator}")
 
-    # if request.get_primary:
-    #     chosen_locator = next(locator for locator in locators if locator.is_primary)
-    #     reason = "exact match (primary)"
-    # else:
-    await db.refresh(locators, ["physical_object_locators"])
-    for physical_locator in locators.physical_object_locators:
-        if physical_locator.location_tag == request.client_from_region:
-            chosen_locator = physical_locator
-            reason = "exact match"
-            break
+    record_access(chosen_locator.id)
+    record_hit(request.bucket, request.key, request.client_from_region)
+    return locate_response(chosen_locator, version_enabled)
 
-    if chosen_locator is None:
-        # find the primary locator
-        for physical_locator in locators.physical_object_locators:
-            # always read the lastest version
-            if physical_locator.is_primary:
-                chosen_locator = physical_locator
-                reason = "primary"
-                break
 
-    logger.debug(
-        f"locate_object: chosen locator with strategy {reason} out of {len(locators.physical_object_locators)}, {request} -> {chosen_locator}"
+@router.post("/locate_objects_batch")
+async def locate_objects_batch(
+    request: LocateObjectsBatchRequest, db: Session = Depends(get_session)
+) -> LocateObjectsBatchResponse:
+    """Locate many objects of one bucket at once, with the same semantics as `locate_object`."""
+
+    bucket_metadata = await get_bucket_metadata(db, request.bucket)
+    if bucket_metadata is None:
+        return Response(status_code=404, content="Bucket Not Found")
+    version_enabled = bucket_metadata.version_enabled
+
+    version_ids = {
+        obj.version_id for obj in request.objects if obj.version_id is not None
+    }
+    if version_enabled is None and version_ids:
+        return Response(status_code=400, content="Versioning is not enabled")
+
+    latest_keys = {obj.key for obj in request.objects if obj.version_id is None}
+    latest_versions = (
+        select(func.max(DBLogicalObject.id))
+        .join(DBPhysicalObjectLocator)
+        .where(DBLogicalObject.bucket == request.bucket)
+        .where(DBLogicalObject.key.in_(latest_keys))
+        .where(DBLogicalObject.status == Status.ready)
+        .where(DBPhysicalObjectLocator.status == Status.ready)
+        .group_by(DBLogicalObject.key)
     )
 
-    await db.refresh(chosen_locator, ["logical_object"])
+    # rank the locators of every requested version and keep the preferred one of each
+    ranked = (
+        locate_stmt(request.bucket)
+        .add_columns(
+            DBLogicalObject.key.label("logical_key"),
+            func.row_number()
+            .over(
+                partition_by=DBLogicalObject.id,
+                order_by=locator_preference(request.client_from_region),
+            )
+            .label("rank"),
+        )
+        .where(
+            or_(
+                DBLogicalObject.id.in_(latest_versions),
+                and_(
+                    DBLogicalObject.id.in_(version_ids),
+                    DBLogicalObject.key.in_({obj.key for obj in request.objects}),
+                ),
+            )
+        )
+        .subquery()
+    )
+    rows = (await db.execute(select(ranked).where(ranked.c.rank == 1))).all()
+
+    by_version = {row.logical_object_id: row for row in rows}
+    # a specific version can never be newer than the latest one, so the highest id of a key
+    # is its latest version
+    by_key = {}
+    for row in sorted(rows, key=lambda row: row.logical_object_id):
+        by_key[row.logical_key] = row
+
+    results = []
+    for obj in request.objects:
+        if obj.version_id is None:
+            row = by_key.get(obj.key)
+        else:
+            row = by_version.get(obj.version_id)
+            if row is not None and row.logical_key != obj.key:
+                row = None
 
-    return LocateObjectResponse(
-        id=chosen_locator.id,
-        tag=chosen_locator.location_tag,
-        cloud=chosen_locator.cloud,
-        bucket=chosen_locator.bucket,
-        region=chosen_locator.region,
-        key=chosen_locator.key,
-        size=chosen_locator.logical_object.size,
-        last_modified=chosen_locator.logical_object.last_modified,
-        etag=chosen_locator.logical_object.etag,
-        version_id=chosen_locator.version_id,  # here must use the physical version
-        version=chosen_locator.logical_object.id
-        if version_enabled is not None
-        else None,
+        # https://docs.aws.amazon.com/AmazonS3/latest/userguide/DeletingObjectVersions.html
+        # https://docs.aws.amazon.com/AmazonS3/latest/userguide/DeleteMarker.html
+        if row is None or (row.delete_marker and obj.version_id is None):
+            status_code = 404
+        elif row.delete_marker:
+            status_code = 405
+        else:
+            status_code = 200
+            record_access(row.id)
+            record_hit(request.bucket, obj.key, request.client_from_region)
+
+        results.append(
+            LocateObjectsBatchResult(
+                key=obj.key,
+                version_id=obj.version_id,
+                status_code=status_code,
+                locator=locate_response(row, version_enabled)
+                if status_code == 200
+                else None,
+            )
+        )
+
+    logger.debug(f"locate_objects_batch: {request} -> {results}")
+
+    return LocateObjectsBatchResponse(results=results)
+
+
+@router.post("/hot_objects")
+async def hot_objects(
+    request: HotObjectsRequest, db: Session = Depends(get_session)
+) -> HotObjectsResponse:
+    """Return the K most accessed objects of a client region, by decaying access count."""
+    # make the accesses counted so far visible
+    await flush_hotness()
+
+    stmt = select(DBObjectHotness).where(
+        DBObjectHotness.client_region == request.client_region
+    )
+    if request.bucket is not None:
+        stmt = stmt.where(DBObjectHotness.bucket == request.bucket)
+    stmt = stmt.order_by(DBObjectHotness.log_score.desc()).limit(request.k)
+    rows = (await db.scalars(stmt)).all()
+
+    logger.debug(f"hot_objects: {request} -> {rows}")
+
+    now = datetime.utcnow()
+    return HotObjectsResponse(
+        objects=[
+            HotObject(
+                bucket=row.bucket,
+                key=row.key,
+                client_region=row.client_region,
+                score=decayed_score(row.log_score, now),
+                last_access=row.last_access,
+            )
+            for row in rows
+        ]
+    )
+
+
+@router.post("/list_evictions")
+async def list_evictions(
+    request: ListEvictionsRequest, db: Session = Depends(get_session)
+) -> ListEvictionsResponse:
+    """Return the secondary replicas picked by replica eviction.
+
+    The proxy polls this, deletes the physical objects and reports them back through
+    `complete_delete_objects` with op_type `delete`, which drops the locators.
+    """
+    stmt = (
+        select(DBPhysicalObjectLocator)
+        .options(selectinload(DBPhysicalObjectLocator.logical_object))
+        .join(DBLogicalObject)
+        .where(DBPhysicalObjectLocator.status == Status.pending_deletion)
+        .where(DBPhysicalObjectLocator.is_primary.is_(False))
+        # deleted objects are driven by start_delete_objects
+        .where(DBLogicalObject.status == Status.ready)
+    )
+    if request.location_tag is not None:
+        stmt = stmt.where(DBPhysicalObjectLocator.location_tag == request.location_tag)
+    if request.after_id is not None:
+        stmt = stmt.where(DBPhysicalObjectLocator.id > request.after_id)
+    stmt = stmt.order_by(DBPhysicalObjectLocator.id).limit(request.limit)
+    locators = (await db.scalars(stmt)).all()
+
+    logger.debug(f"list_evictions: {request} -> {locators}")
+
+    return ListEvictionsResponse(
+        locators=[
+            LocateObjectResponse(
+                id=locator.id,
+                tag=locator.location_tag,
+                cloud=locator.cloud,
+                bucket=locator.bucket,
+                region=locator.region,
+                key=locator.key,
+                version_id=locator.version_id,
+                version=locator.logical_object.id,
+                size=locator.logical_object.size,
+                etag=locator.logical_object.etag,
+            )
+            for locator in locators
+        ]
+    )
+
+
+@router.post("/list_lifecycle_deletions")
+async def list_lifecycle_deletions(
+    request: ListLifecycleDeletionsRequest, db: Session = Depends(get_session)
+) -> ListLifecycleDeletionsResponse:
+    """Return the physical copies of the versions and delete markers expired by the bucket
+    lifecycle rules.
+
+    Like evictions, the proxy deletes them (by version_id) and reports them back through
+    `complete_delete_objects` with op_type `delete`, which also drops the logical versions.
+    """
+    stmt = (
+        select(DBPhysicalObjectLocator)
+        .options(selectinload(DBPhysicalObjectLocator.logical_object))
+        .join(DBLogicalObject)
+        .where(DBPhysicalObjectLocator.status == Status.pending_deletion)
+        # deletions started by start_delete_objects hold a lock, lifecycle ones do not
+        .where(DBPhysicalObjectLocator.lock_acquired_ts.is_(None))
+        .where(DBLogicalObject.status == Status.pending_deletion)
+    )
+    if request.bucket is not None:
+        stmt = stmt.where(DBLogicalObject.bucket == request.bucket)
+    if request.after_id is not None:
+        stmt = stmt.where(DBPhysicalObjectLocator.id > request.after_id)
+    stmt = stmt.order_by(DBPhysicalObjectLocator.id).limit(request.limit)
+    locators = (await db.scalars(stmt)).all()
+
+    logger.debug(f"list_lifecycle_deletions: {request} -> {locators}")
+
+    return ListLifecycleDeletionsResponse(
+        locators=[
+            LocateObjectResponse(
+                id=locator.id,
+                tag=locator.location_tag,
+                cloud=locator.cloud,
+                bucket=locator.bucket,
+                region=locator.region,
+                key=locator.key,
+                version_id=locator.version_id,
+                version=locator.logical_object.id,
+                size=locator.logical_object.size,
+                etag=locator.logical_object.etag,
+            )
+            for locator in locators
+        ]
     )
 
 
@@ -504,18 +849,18 @@ async def start_warmup(
     request: StartWarmupRequest, db: Session = Depends(get_session)
 ) -> StartWarmupResponse:
     """Given the logical object information and warmup regions, return one or zero physical object locators."""
+    await begin_write(db)
 
-    version_enabled = (
-        await db.execute(
-            select(DBLogicalBucket.version_enabled).where(
-                DBLogicalBucket.bucket == request.bucket
-            )
-        )
-    ).all()[0][0]
+    bucket_metadata = await get_bucket_metadata(db, request.bucket)
+    if bucket_metadata is None:
+        return Response(status_code=404, content="Bucket Not Found")
+    version_enabled = bucket_metadata.version_enabled
 
     if version_enabled is None and request.version_id:
         return Response(status_code=400, content="Versioning is not enabled")
 
+    # serialized with start_warmup_batch, so that both never add a replica to the same region
+    await lock_object_key(db, request.bucket, request.key)
     if request.version_id is not None:
         stmt = (
             select(DBLogicalObject)
@@ -526,6 +871,7 @@ async def start_warmup(
             .where(
                 DBLogicalObject.id == request.version_id
             )  # select the one with specific version
+            .with_for_update(of=DBLogicalObject)
         )
     else:
         stmt = (
@@ -535,6 +881,7 @@ async def start_warmup(
             .where(DBLogicalObject.key == request.key)
             .where(DBLogicalObject.status == Status.ready)
             .order_by(DBLogicalObject.id.desc())  # select the latest version
+            .with_for_update(of=DBLogicalObject)
             # .first()
         )
     locators = (await db.scalars(stmt)).first()
@@ -552,27 +899,33 @@ async def start_warmup(
         logger.error("No primary locator found.")
         return Response(status_code=500, content="Internal Server Error")
 
-    # TODO: at what granularity do we want to do this? per bucket? per object?
-    logical_bucket = (
-        await db.execute(
-            select(DBLogicalBucket)
-            .options(selectinload(DBLogicalBucket.physical_bucket_locators))
-            .where(DBLogicalBucket.bucket == request.bucket)
+    warmup_regions = [
+        region for region in request.warmup_regions if region != primary_locator.region
+    ]
+    placement_engine = get_placement_engine(request.policy)
+    if placement_engine is not None:
+        # add the regions the engine would replicate to
+        placement = await placement_engine.place(
+            db, bucket_metadata, request.key, request.client_from_region
         )
-    ).scalar_one_or_none()
+        if placement is not None:
+            warmup_regions += placement.regions
+    # skip the regions already holding the object
+    existing_tags = {
+        locator.location_tag for locator in locators.physical_object_locators
+    }
+    warmup_regions = [
+        region
+        for region in dict.fromkeys(warmup_regions)
+        if region not in existing_tags
+    ]
 
+    # TODO: at what granularity do we want to do this? per bucket? per object?
     # Transfer to warmup regions
     secondary_locators = []
-    for region_tag in [
-        region for region in request.warmup_regions if region != primary_locator.region
-    ]:
-        physical_bucket_locator = next(
-            (
-                pbl
-                for pbl in logical_bucket.physical_bucket_locators
-                if pbl.location_tag == region_tag
-            ),
-            None,
+    for region_tag in warmup_regions:
+        physical_bucket_locator = bucket_metadata.physical_bucket_locators.get(
+            region_tag
         )
         if not physical_bucket_locator:
             logger.error(
@@ -631,19 +984,166 @@ async def start_warmup(
     )
 
 
+@router.post(
+    "/start_warmup_batch",
+    responses={
+        status.HTTP_200_OK: {"model": StartWarmupBatchResponse},
+        status.HTTP_400_BAD_REQUEST: {"description": "Invalid region or token"},
+        status.HTTP_404_NOT_FOUND: {"description": "Bucket not found"},
+    },
+)
+async def start_warmup_batch(
+    request: StartWarmupBatchRequest, db: Session = Depends(get_session)
+) -> StartWarmupBatchResponse:
+    """Warm up one page of objects, selected by prefix or key list, into the given regions.
+
+    The destination locators of the whole page are created in one transaction. Follow
+    `next_continuation_token` until `is_truncated` is false to cover the selection.
+    """
+    await begin_write(db)
+
+    bucket_metadata = await get_bucket_metadata(db, request.bucket)
+    if bucket_metadata is None:
+        return Response(status_code=404, content="Bucket Not Found")
+    version_enabled = bucket_metadata.version_enabled
+
+    for region_tag in request.warmup_regions:
+        if region_tag not in bucket_metadata.physical_bucket_locators:
+            return Response(
+                status_code=400,
+                content=f"No physical bucket locator found for warmup {region_tag}",
+            )
+
+    stmt = latest_objects_stmt(request.bucket)
+    if request.continuation_token is not None:
+        try:
+            last_key = decode_continuation_token(request.continuation_token)
+        except ValueError as e:
+            return Response(status_code=400, content=str(e))
+        stmt = stmt.where(DBLogicalObject.key > last_key)
+    # fetch one more row to know whether the selection is truncated
+    stmt = stmt.order_by(DBLogicalObject.key).limit(request.max_keys + 1)
+
+    if request.prefix is not None:
+        objects = (
+            await db.execute(
+                stmt.where(DBLogicalObject.key >= request.prefix).where(
+                    DBLogicalObject.key.startswith(request.prefix)
+                )
+            )
+        ).all()
+    else:
+        # Chunked so that long key lists stay within the bind parameter limits, the page is
+        # the first keys across the pages of every chunk.
+        objects = []
+        for chunk in chunked(sorted(set(request.keys))):
+            objects += (
+                await db.execute(stmt.where(DBLogicalObject.key.in_(chunk)))
+            ).all()
+        objects = sorted(objects, key=lambda obj: obj.key)[: request.max_keys + 1]
+    is_truncated = len(objects) > request.max_keys
+    objects = objects[: request.max_keys]
+
+    # Lock the page in key order before reading its locators, so that a concurrent warmup of
+    # the same objects waits and then sees the locators created here instead of adding its own.
+    for obj in objects:
+        await lock_object_key(db, request.bucket, obj.key)
+    locators_by_object = {}
+    for locator in await db.scalars(
+        select(DBPhysicalObjectLocator)
+        .join(DBPhysicalObjectLocator.logical_object)
+        .where(
+            DBPhysicalObjectLocator.logical_object_id.in_([obj.id for obj in objects])
+        )
+        .with_for_update(of=DBLogicalObject)
+    ):
+        locators_by_object.setdefault(locator.logical_object_id, []).append(locator)
+
+    warmups = []
+    for obj in objects:
+        locators = locators_by_object.get(obj.id, [])
+        primary_locator = next(
+            (
+                locator
+                for locator in locators
+                if locator.is_primary and locator.status == Status.ready
+            ),
+            None,
+        )
+        if primary_locator is None:
+            # nothing to copy from yet
+            continue
+        existing_tags = {locator.location_tag for locator in locators}
+        dst_locators = []
+        for region_tag in dict.fromkeys(request.warmup_regions):
+            if region_tag in existing_tags:
+                continue
+            physical_bucket_locator = bucket_metadata.physical_bucket_locators[
+                region_tag
+            ]
+            dst_locators.append(
+                DBPhysicalObjectLocator(
+                    logical_object_id=obj.id,
+                    location_tag=region_tag,
+                    cloud=physical_bucket_locator.cloud,
+                    region=physical_bucket_locator.region,
+                    bucket=physical_bucket_locator.bucket,
+                    key=physical_bucket_locator.prefix + obj.key,
+                    # no lock timestamp, like start_warmup: the lock sweep must not mark a
+                    # replica that was never copied ready
+                    status=Status.pending,
+                    is_primary=False,
+                    version_id=primary_locator.version_id,  # same version of the primary locator
+                )
+            )
+        db.add_all(dst_locators)
+        warmups.append((obj, primary_locator, dst_locators))
+    await db.commit()
+
+    def warmup_response(obj, locator):
+        return LocateObjectResponse(
+            id=locator.id,
+            tag=locator.location_tag,
+            cloud=locator.cloud,
+            bucket=locator.bucket,
+            region=locator.region,
+            key=locator.key,
+            version_id=locator.version_id,
+            version=obj.id if version_enabled is not None else None,
+            size=obj.size,
+            etag=obj.etag,
+        )
+
+    logger.debug(f"start_warmup_batch: {request} -> {len(warmups)} objects")
+
+    return StartWarmupBatchResponse(
+        items=[
+            StartWarmupBatchItem(
+                key=obj.key,
+                src_locator=warmup_response(obj, primary_locator),
+                dst_locators=[
+                    warmup_response(obj, locator) for locator in dst_locators
+                ],
+            )
+            for obj, primary_locator, dst_locators in warmups
+        ],
+        is_truncated=is_truncated,
+        next_continuation_token=encode_continuation_token(objects[-1].key)
+        if is_truncated
+        else None,
+    )
+
+
 @router.post("/start_upload")
 async def start_upload(
     request: StartUploadRequest, db: Session = Depends(get_session)
 ) -> StartUploadResponse:
-    await db.execute(text("BEGIN IMMEDIATE;"))
+    await begin_write(db)
 
-    version_enabled = (
-        await db.execute(
-            select(DBLogicalBucket.version_enabled).where(
-                DBLogicalBucket.bucket == request.bucket
-            )
-        )
-    ).all()[0][0]
+    bucket_metadata = await get_bucket_metadata(db, request.bucket)
+    if bucket_metadata is None:
+        return Response(status_code=404, content="Bucket Not Found")
+    version_enabled = bucket_metadata.version_enabled
 
     # we can still provide version_id when version_enalbed is False (corresponding to the `Suspended`)
     # status in S3
@@ -653,6 +1153,8 @@ async def start_upload(
             content="Versioning is NULL, make sure you enable versioning first.",
         )
 
+    await lock_object_key(db, request.bucket, request.key)
+
     # The case we will contain a version_id are:
     # 1. pull_on_read: don't create new logical objects
     # 2. copy: create new logical objects in dst locations
@@ -669,6 +1171,7 @@ async def start_upload(
                 )
             )
             .where(DBLogicalObject.id == request.version_id)
+            .with_for_update(of=DBLogicalObject)
         )
     else:
         existing_objects_stmt = (
@@ -683,6 +1186,7 @@ async def start_upload(
                 )
             )
             .order_by(DBLogicalObject.id.desc())  # select the latest version
+            .with_for_update(of=DBLogicalObject)
         )
 
     existing_object = (await db.scalars(existing_objects_stmt)).first()
@@ -804,9 +1308,8 @@ async def start_upload(
                 last_modified=existing_object.last_modified,  # this field should be the current timestamp, here we can just ignore since this will be updated in the complete upload step
                 etag=existing_object.etag,
                 status=Status.pending,
-                multipart_upload_id=existing_object.multipart_upload_id
-                if not request.is_multipart
-                else uuid.uuid4().hex,
+                # a new version never inherits the upload id of the previous one
+                multipart_upload_id=uuid.uuid4().hex if request.is_multipart else None,
             )
             db.add(logical_object)
         else:
@@ -818,23 +1321,16 @@ async def start_upload(
                     last_modified=existing_object.last_modified,  # this field should be the current timestamp, here we can just ignore since this will be updated in the complete upload step
                     etag=existing_object.etag,
                     status=Status.pending,
-                    multipart_upload_id=existing_object.multipart_upload_id
-                    if not request.is_multipart
-                    else uuid.uuid4().hex,
+                    multipart_upload_id=uuid.uuid4().hex
+                    if request.is_multipart
+                    else None,
                     version_suspended=True,
                 )
                 db.add(logical_object)
             else:
                 logical_object = existing_object
 
-    logical_bucket = (
-        await db.execute(
-            select(DBLogicalBucket)
-            .options(selectinload(DBLogicalBucket.physical_bucket_locators))
-            .where(DBLogicalBucket.bucket == request.bucket)
-        )
-    ).scalar_one_or_none()
-    physical_bucket_locators = logical_bucket.physical_bucket_locators
+    physical_bucket_locators = bucket_metadata.physical_bucket_locators.values()
 
     primary_write_region = None
 
@@ -859,8 +1355,20 @@ async def start_upload(
             primary_write_region != request.client_from_region
         ), "should not be the same region"
     else:
+        placement_engine = get_placement_engine(request.policy)
         # NOTE: Push-based: upload to primary region and broadcast to other regions marked with need_warmup
-        if request.policy == "push":
+        if placement_engine is not None:
+            # The engine picks the primary and the replica regions from recorded metrics
+            placement = await placement_engine.place(
+                db, bucket_metadata, request.key, request.client_from_region
+            )
+            if placement is None:
+                return Response(
+                    status_code=409, content="Conflict, bucket has no physical buckets"
+                )
+            upload_to_region_tags = placement.regions
+            primary_write_region = placement.primary
+        elif request.policy == "push":
             # Except this case, always set the first-write region of the OBJECT to be primary
             upload_to_region_tags = [
                 locator.location_tag
@@ -918,9 +1426,8 @@ async def start_upload(
         if region_tag in existing_tags and version_enabled is None:
             continue
 
-        physical_bucket_locator = next(
-            (pbl for pbl in physical_bucket_locators if pbl.location_tag == region_tag),
-            None,
+        physical_bucket_locator = bucket_metadata.physical_bucket_locators.get(
+            region_tag
         )
         if physical_bucket_locator is None:
             logger.error(
@@ -1004,41 +1511,244 @@ async def start_upload(
     )
 
 
-@router.patch("/complete_upload")
-async def complete_upload(
-    request: PatchUploadIsCompleted, db: Session = Depends(get_session)
-):
-    stmt = (
-        select(DBPhysicalObjectLocator)
-        .join(DBLogicalObject)
-        .options(selectinload(DBPhysicalObjectLocator.logical_object))
-        .where(DBPhysicalObjectLocator.id == request.id)
+def promotes_logical_object(policy: Optional[str], is_primary: bool) -> bool:
+    """Whether completing a physical locator under `policy` makes its logical object ready."""
+    # TODO: might need to change the if conditions for different policies
+    return (
+        ((policy == "push" or get_placement_engine(policy) is not None) and is_primary)
+        or policy == "write_local"
+        or policy == "copy_on_read"
+    )
+
+
+@router.patch("/complete_upload")
+async def complete_upload(
+    request: PatchUploadIsCompleted, db: Session = Depends(get_session)
+):
+    stmt = (
+        select(DBPhysicalObjectLocator)
+        .join(DBLogicalObject)
+        .options(selectinload(DBPhysicalObjectLocator.logical_object))
+        .where(DBPhysicalObjectLocator.id == request.id)
+    )
+    physical_locator = await db.scalar(stmt)
+    if physical_locator is None:
+        logger.error(f"physical locator not found: {request}")
+        return Response(status_code=404, content="Not Found")
+
+    logger.debug(f"complete_upload: {request} -> {physical_locator}")
+
+    physical_locator.status = Status.ready
+    physical_locator.lock_acquired_ts = None
+    physical_locator.version_id = request.version_id
+
+    if promotes_logical_object(request.policy, physical_locator.is_primary):
+        # NOTE: might not need to update the logical object for consecutive reads for copy_on_read
+        # await db.refresh(physical_locator, ["logical_object"])
+        logical_object = physical_locator.logical_object
+        logical_object.status = Status.ready
+        logical_object.size = request.size
+        logical_object.etag = request.etag
+        logical_object.last_modified = request.last_modified.replace(tzinfo=None)
+    await db.commit()
+
+
+@router.patch("/complete_upload_batch")
+async def complete_upload_batch(
+    request: CompleteUploadBatchRequest, db: Session = Depends(get_session)
+) -> CompleteUploadBatchResponse:
+    """Apply many `complete_upload` calls in one transaction with bulk UPDATEs."""
+    ids = [completion.id for completion in request.completions]
+    physical_locators = {}
+    # chunked so that large batches stay within the bind parameter limits
+    for chunk in chunked(ids):
+        for row in await db.execute(
+            select(
+                DBPhysicalObjectLocator.id,
+                DBPhysicalObjectLocator.is_primary,
+                DBPhysicalObjectLocator.logical_object_id,
+            ).where(DBPhysicalObjectLocator.id.in_(chunk))
+        ):
+            physical_locators[row.id] = row
+
+    results = []
+    physical_updates = []
+    logical_updates = {}
+    for completion in request.completions:
+        physical_locator = physical_locators.get(completion.id)
+        if physical_locator is None:
+            logger.error(f"physical locator not found: {completion}")
+            results.append(
+                PatchResult(id=completion.id, status_code=404, content="Not Found")
+            )
+            continue
+
+        physical_updates.append(
+            {
+                "id": completion.id,
+                "status": Status.ready,
+                "lock_acquired_ts": None,
+                "version_id": completion.version_id,
+            }
+        )
+        if promotes_logical_object(completion.policy, physical_locator.is_primary):
+            logical_updates[physical_locator.logical_object_id] = {
+                "id": physical_locator.logical_object_id,
+                "status": Status.ready,
+                "size": completion.size,
+                "etag": completion.etag,
+                "last_modified": completion.last_modified.replace(tzinfo=None),
+            }
+        results.append(PatchResult(id=completion.id, status_code=200))
+
+    # bulk UPDATE by primary key, executed as an executemany per table and chunk
+    for chunk in chunked(physical_updates):
+        await db.execute(update(DBPhysicalObjectLocator), chunk)
+    for chunk in chunked(list(logical_updates.values())):
+        await db.execute(update(DBLogicalObject), chunk)
+    await db.commit()
+
+    logger.debug(f"complete_upload_batch: {request} -> {results}")
+
+    return CompleteUploadBatchResponse(results=results)
+
+
+def multipart_etag(etags: List[str]) -> str:
+    """S3 etag of a multipart object: the md5 of the concatenated binary md5s of its parts,
+    followed by the number of parts."""
+    digests = hashlib.md5()
+    for etag in etags:
+        etag = etag.strip('"')
+        try:
+            digests.update(bytes.fromhex(etag))
+        except ValueError:
+            # not an md5, still give the object a stable etag
+            digests.update(hashlib.md5(etag.encode()).digest())
+    return f"{digests.hexdigest()}-{len(etags)}"
+
+
+@router.patch("/complete_multipart")
+async def complete_multipart(
+    request: CompleteMultipartRequest, db: Session = Depends(get_session)
+) -> HeadObjectResponse:
+    """Seal a multipart upload: check the client's part list against the recorded parts,
+    compute the size and etag of the object and make the upload ready, in one transaction.
+    """
+    await begin_write(db)
+
+    bucket_metadata = await get_bucket_metadata(db, request.bucket)
+    if bucket_metadata is None:
+        return Response(status_code=404, content="Bucket Not Found")
+
+    part_numbers = [part.part_number for part in request.parts]
+    if not part_numbers:
+        return Response(status_code=400, content="At least one part must be specified")
+    if any(
+        previous >= next_ for previous, next_ in zip(part_numbers, part_numbers[1:])
+    ):
+        return Response(
+            status_code=400, content="Parts must be in ascending part number order"
+        )
+
+    # Lock the upload before validating its parts, so that a concurrent append_part,
+    # delete or reaper run cannot change them before the unlisted ones are discarded.
+    await lock_object_key(db, request.bucket, request.key)
+    # the upload and the recorded parts of the list in one query
+    rows = (
+        await db.execute(
+            select(
+                DBLogicalObject.id,
+                DBLogicalMultipartUploadPart.part_number,
+                DBLogicalMultipartUploadPart.etag,
+                DBLogicalMultipartUploadPart.size,
+            )
+            .outerjoin(
+                DBLogicalMultipartUploadPart,
+                and_(
+                    DBLogicalMultipartUploadPart.logical_object_id
+                    == DBLogicalObject.id,
+                    DBLogicalMultipartUploadPart.part_number.in_(part_numbers),
+                ),
+            )
+            .where(DBLogicalObject.bucket == request.bucket)
+            .where(DBLogicalObject.key == request.key)
+            .where(DBLogicalObject.multipart_upload_id == request.multipart_upload_id)
+            .where(DBLogicalObject.status == Status.pending)
+            .with_for_update(of=DBLogicalObject)
+        )
+    ).all()
+    if not rows:
+        return Response(status_code=404, content="Object Multipart Not Found")
+
+    logical_object_id = rows[0].id
+    recorded_parts = {row.part_number: row for row in rows if row.part_number}
+    for part in request.parts:
+        recorded_part = recorded_parts.get(part.part_number)
+        if recorded_part is None or recorded_part.etag.strip('"') != part.etag.strip(
+            '"'
+        ):
+            return Response(
+                status_code=400,
+                content=f"Part {part.part_number} was not uploaded or its etag does not match",
+            )
+
+    size = sum(recorded_parts[number].size for number in part_numbers)
+    etag = multipart_etag([recorded_parts[number].etag for number in part_numbers])
+    last_modified = request.last_modified or datetime.utcnow()
+
+    # parts left out of the list are discarded, as in S3
+    await db.execute(
+        delete(DBLogicalMultipartUploadPart)
+        .where(DBLogicalMultipartUploadPart.logical_object_id == logical_object_id)
+        .where(DBLogicalMultipartUploadPart.part_number.not_in(part_numbers))
+    )
+    locator_ids = select(DBPhysicalObjectLocator.id).where(
+        DBPhysicalObjectLocator.logical_object_id == logical_object_id
+    )
+    await db.execute(
+        delete(DBPhysicalMultipartUploadPart)
+        .where(
+            DBPhysicalMultipartUploadPart.physical_object_locator_id.in_(locator_ids)
+        )
+        .where(DBPhysicalMultipartUploadPart.part_number.not_in(part_numbers))
     )
-    physical_locator = await db.scalar(stmt)
-    if physical_locator is None:
-        logger.error(f"physical locator not found: {request}")
-        return Response(status_code=404, content="Not Found")
 
-    logger.debug(f"complete_upload: {request} -> {physical_locator}")
+    await db.execute(
+        update(DBPhysicalObjectLocator)
+        .where(DBPhysicalObjectLocator.logical_object_id == logical_object_id)
+        .values(status=Status.ready, lock_acquired_ts=None)
+    )
+    if request.version_ids:
+        table = DBPhysicalObjectLocator.__table__
+        await db.execute(
+            update(table)
+            .where(table.c.id == bindparam("locator_id"))
+            .where(table.c.logical_object_id == logical_object_id)
+            .values(version_id=bindparam("physical_version_id")),
+            [
+                {"locator_id": locator_id, "physical_version_id": version_id}
+                for locator_id, version_id in request.version_ids.items()
+            ],
+        )
+    await db.execute(
+        update(DBLogicalObject)
+        .where(DBLogicalObject.id == logical_object_id)
+        .values(status=Status.ready, size=size, etag=etag, last_modified=last_modified)
+    )
+    await db.commit()
 
-    physical_locator.status = Status.ready
-    physical_locator.lock_acquired_ts = None
-    physical_locator.version_id = request.version_id
+    logger.debug(f"complete_multipart: {request} -> {etag}, {size}")
 
-    # TODO: might need to change the if conditions for different policies
-    if (
-        (request.policy == "push" and physical_locator.is_primary)
-        or request.policy == "write_local"
-        or request.policy == "copy_on_read"
-    ):
-        # NOTE: might not need to update the logical object for consecutive reads for copy_on_read
-        # await db.refresh(physical_locator, ["logical_object"])
-        logical_object = physical_locator.logical_object
-        logical_object.status = Status.ready
-        logical_object.size = request.size
-        logical_object.etag = request.etag
-        logical_object.last_modified = request.last_modified.replace(tzinfo=None)
-    await db.commit()
+    return HeadObjectResponse(
+        bucket=request.bucket,
+        key=request.key,
+        size=size,
+        etag=etag,
+        last_modified=last_modified,
+        version_id=logical_object_id
+        if bucket_metadata.version_enabled is not None
+        else None,
+    )
 
 
 @router.patch("/set_multipart_id")
@@ -1067,140 +1777,147 @@ async def set_multipart_id(
 async def append_part(
     request: PatchUploadMultipartUploadPart, db: Session = Depends(get_session)
 ):
-    stmt = (
-        select(DBPhysicalObjectLocator)
-        .join(DBLogicalObject)
-        .where(DBPhysicalObjectLocator.id == request.id)
-    )
-    physical_locator = await db.scalar(stmt)
-    if physical_locator is None:
-        logger.error(f"physical locator not found: {request}")
-        return Response(status_code=404, content="Not Found")
-    await db.refresh(physical_locator, ["logical_object"])
-
-    logger.debug(f"append_part: {request} -> {physical_locator}")
+    if APPEND_PART_COALESCE_MS:
+        result = await part_coalescer.submit(request)
+    else:
+        await begin_write(db)
+        # a single upsert per table, so that recording a part costs the same however many
+        # parts the upload already has
+        [result] = await record_parts(db, [request])
+        await db.commit()
 
-    await db.refresh(physical_locator, ["multipart_upload_parts"])
+    logger.debug(f"append_part: {request} -> {result}")
 
-    existing_physical_part = next(
-        (
-            part
-            for part in physical_locator.multipart_upload_parts
-            if part.part_number == request.part_number
-        ),
-        None,
-    )
+    if result.status_code != 200:
+        return Response(status_code=result.status_code, content=result.content)
 
-    if existing_physical_part:
-        existing_physical_part.etag = request.etag
-        existing_physical_part.size = request.size
-    else:
-        physical_locator.multipart_upload_parts.append(
-            DBPhysicalMultipartUploadPart(
-                part_number=request.part_number,
-                etag=request.etag,
-                size=request.size,
-            )
-        )
 
-    if physical_locator.is_primary:
-        await db.refresh(physical_locator.logical_object, ["multipart_upload_parts"])
-        existing_logical_part = next(
-            (
-                part
-                for part in physical_locator.logical_object.multipart_upload_parts
-                if part.part_number == request.part_number
-            ),
-            None,
-        )
+@router.patch("/append_parts_batch")
+async def append_parts_batch(
+    request: AppendPartsBatchRequest, db: Session = Depends(get_session)
+) -> AppendPartsBatchResponse:
+    """Apply many `append_part` calls, across the locators of an upload, in one transaction."""
+    await begin_write(db)
+    results = await record_parts(db, request.parts)
+    await db.commit()
 
-        if existing_logical_part:
-            existing_logical_part.etag = request.etag
-            existing_logical_part.size = request.size
-        else:
-            physical_locator.logical_object.multipart_upload_parts.append(
-                DBLogicalMultipartUploadPart(
-                    part_number=request.part_number,
-                    etag=request.etag,
-                    size=request.size,
-                )
-            )
+    logger.debug(f"append_parts_batch: {request} -> {results}")
 
-    await db.commit()
+    return AppendPartsBatchResponse(results=results)
 
 
 @router.post("/continue_upload")
 async def continue_upload(
     request: ContinueUploadRequest, db: Session = Depends(get_session)
 ) -> List[ContinueUploadResponse]:
-    version_enabled = (
-        await db.execute(
-            select(DBLogicalBucket.version_enabled).where(
-                DBLogicalBucket.bucket == request.bucket
-            )
-        )
-    ).all()[0][0]
+    bucket_metadata = await get_bucket_metadata(db, request.bucket)
+    if bucket_metadata is None:
+        return Response(status_code=404, content="Bucket Not Found")
+    version_enabled = bucket_metadata.version_enabled
 
     if version_enabled is None and request.version_id:
         return Response(status_code=400, content="Versioning is not enabled")
 
-    # the upload_id is a unique identifer
-    stmt = (
-        select(DBLogicalObject)
-        .options(selectinload(DBLogicalObject.physical_object_locators))
+    # The upload_id is a unique identifer. The locators of the upload and a page of the parts
+    # of each come in one statement: every locator carries the part number its page ends
+    # at, a LIMITed seek on the (locator, part_number) index, and the parts are joined as a
+    # range up to it, so that the read is bounded however many parts were uploaded. One more
+    # part than the page tells whether another page follows.
+    max_parts = request.max_parts or MAX_PARTS
+    after_marker = request.part_number_marker or 0
+    upload_id = (
+        select(DBLogicalObject.id)
         .where(DBLogicalObject.bucket == request.bucket)
         .where(DBLogicalObject.key == request.key)
         .where(DBLogicalObject.status == Status.pending)
         .where(DBLogicalObject.multipart_upload_id == request.multipart_upload_id)
         .order_by(DBLogicalObject.id.desc())
-        # .first()
+        .limit(1)
+        .scalar_subquery()
     )
-    locators = (await db.scalars(stmt)).first().physical_object_locators
-    if len(locators) == 0:
+    page_end = (
+        select(DBPhysicalMultipartUploadPart.part_number)
+        .where(
+            DBPhysicalMultipartUploadPart.physical_object_locator_id
+            == DBPhysicalObjectLocator.id
+        )
+        .where(DBPhysicalMultipartUploadPart.part_number > after_marker)
+        .order_by(DBPhysicalMultipartUploadPart.part_number)
+        .offset(max_parts)
+        .limit(1)
+        .scalar_subquery()
+    )
+    upload_locators = (
+        select(
+            DBPhysicalObjectLocator.id,
+            DBPhysicalObjectLocator.location_tag,
+            DBPhysicalObjectLocator.cloud,
+            DBPhysicalObjectLocator.bucket,
+            DBPhysicalObjectLocator.region,
+            DBPhysicalObjectLocator.key,
+            DBPhysicalObjectLocator.multipart_upload_id,
+            DBPhysicalObjectLocator.version_id,
+            page_end.label("page_end"),
+        )
+        .where(DBPhysicalObjectLocator.logical_object_id == upload_id)
+        .cte("upload_locators")
+    )
+    stmt = select(upload_locators).order_by(upload_locators.c.id)
+    if request.do_list_parts:
+        part = DBPhysicalMultipartUploadPart
+        stmt = (
+            select(
+                upload_locators,
+                part.part_number.label("part_number"),
+                part.etag.label("part_etag"),
+            )
+            .outerjoin(
+                part,
+                and_(
+                    part.physical_object_locator_id == upload_locators.c.id,
+                    part.part_number > after_marker,
+                    or_(
+                        upload_locators.c.page_end.is_(None),
+                        part.part_number <= upload_locators.c.page_end,
+                    ),
+                ),
+            )
+            .order_by(upload_locators.c.id, part.part_number)
+        )
+    locators, parts_of = [], {}
+    for row in await db.execute(stmt):
+        if row.id not in parts_of:
+            locators.append(row)
+            parts_of[row.id] = []
+        if request.do_list_parts and row.part_number is not None:
+            parts_of[row.id].append(
+                ContinueUploadPhysicalPart(
+                    part_number=row.part_number, etag=row.part_etag
+                )
+            )
+    if not locators:
         return Response(status_code=404, content="Not Found")
     copy_src_buckets, copy_src_keys = [], []
 
     # cope with upload_part_copy
     if request.copy_src_bucket is not None and request.copy_src_key is not None:
+        stmt = (
+            select(DBLogicalObject)
+            .options(joinedload(DBLogicalObject.physical_object_locators))
+            .where(DBLogicalObject.bucket == request.copy_src_bucket)
+            .where(DBLogicalObject.key == request.copy_src_key)
+            .where(DBLogicalObject.status == Status.ready)
+        )
         if request.version_id is None:
-            physical_src_locators = (
-                (
-                    await db.scalars(
-                        select(DBLogicalObject)
-                        .options(selectinload(DBLogicalObject.physical_object_locators))
-                        .where(DBLogicalObject.bucket == request.copy_src_bucket)
-                        .where(DBLogicalObject.key == request.copy_src_key)
-                        .where(DBLogicalObject.status == Status.ready)
-                        .order_by(
-                            DBLogicalObject.id.desc()
-                        )  # select the latest version
-                        # .first()
-                    )
-                )
-                .first()
-                .physical_object_locators
-            )
+            # select the latest version
+            stmt = stmt.order_by(DBLogicalObject.id.desc()).limit(1)
         else:
-            physical_src_locators = (
-                (
-                    await db.scalars(
-                        select(DBLogicalObject)
-                        .options(selectinload(DBLogicalObject.physical_object_locators))
-                        .where(DBLogicalObject.bucket == request.copy_src_bucket)
-                        .where(DBLogicalObject.key == request.copy_src_key)
-                        .where(DBLogicalObject.status == Status.ready)
-                        .where(
-                            DBLogicalObject.id == request.version_id
-                        )  # select the one with specific version
-                        # .first()
-                    )
-                )
-                .first()
-                .physical_object_locators
-            )
-
-        if len(physical_src_locators) == 0:
+            # select the one with specific version
+            stmt = stmt.where(DBLogicalObject.id == request.version_id)
+        src_object = (await db.scalars(stmt)).unique().first()
+        if src_object is None or len(src_object.physical_object_locators) == 0:
             return Response(status_code=404, content="Source object Not Found")
+        physical_src_locators = src_object.physical_object_locators
 
         src_tags = {locator.location_tag for locator in physical_src_locators}
         dst_tags = {locator.location_tag for locator in locators}
@@ -1217,39 +1934,43 @@ async def continue_upload(
             copy_src_buckets.append(src_map[locator.location_tag].bucket)
             copy_src_keys.append(src_map[locator.location_tag].key)
 
-    if request.do_list_parts:
-        for locator in locators:
-            await db.refresh(locator, ["multipart_upload_parts"])
+    def parts_page(locator):
+        """The listed parts of a locator, and the marker of the next page if any."""
+        parts = parts_of[locator.id]
+        if len(parts) <= max_parts:
+            return parts, None
+        parts = parts[:max_parts]
+        return parts, parts[-1].part_number
 
     logger.debug(f"continue_upload: {request} -> {locators}")
 
-    return [
-        ContinueUploadResponse(
-            id=locator.id,
-            tag=locator.location_tag,
-            cloud=locator.cloud,
-            bucket=locator.bucket,
-            region=locator.region,
-            key=locator.key,
-            multipart_upload_id=locator.multipart_upload_id,
-            # version=locator.logical_object.id if version_enabled is not None else None,
-            version_id=locator.version_id,
-            parts=[
-                ContinueUploadPhysicalPart(
-                    part_number=part.part_number,
-                    etag=part.etag,
-                )
-                for part in locator.multipart_upload_parts
-            ]
-            if request.do_list_parts
-            else None,
-            copy_src_bucket=copy_src_buckets[i]
-            if request.copy_src_bucket is not None
-            else None,
-            copy_src_key=copy_src_keys[i] if request.copy_src_key is not None else None,
+    responses = []
+    for i, locator in enumerate(locators):
+        parts, next_part_number_marker = (
+            parts_page(locator) if request.do_list_parts else (None, None)
         )
-        for i, locator in enumerate(locators)
-    ]
+        responses.append(
+            ContinueUploadResponse(
+                id=locator.id,
+                tag=locator.location_tag,
+                cloud=locator.cloud,
+                bucket=locator.bucket,
+                region=locator.region,
+                key=locator.key,
+                multipart_upload_id=locator.multipart_upload_id,
+                # version=locator.logical_object.id if version_enabled is not None else None,
+                version_id=locator.version_id,
+                parts=parts,
+                next_part_number_marker=next_part_number_marker,
+                copy_src_bucket=copy_src_buckets[i]
+                if request.copy_src_bucket is not None
+                else None,
+                copy_src_key=copy_src_keys[i]
+                if request.copy_src_key is not None
+                else None,
+            )
+        )
+    return responses
 
 
 @router.post("/list_objects")
@@ -1263,8 +1984,24 @@ async def list_objects(
     if logical_bucket is None:
         return Response(status_code=404, content="Bucket Not Found")
 
+    # id is the version, pick the latest one of each key
+    latest_versions = select(func.max(DBLogicalObject.id)).where(
+        DBLogicalObject.bucket == logical_bucket.bucket,
+        DBLogicalObject.status == Status.ready,
+    )
+
+    if request.prefix is not None:
+        latest_versions = latest_versions.where(
+            DBLogicalObject.key.startswith(request.prefix)
+        )
+    if request.start_after is not None:
+        latest_versions = latest_versions.where(
+            DBLogicalObject.key > request.start_after
+        )
+
+    # NOTE: we don't want to list delete markers
     stmt = select(
-        func.max(DBLogicalObject.id),  # id is the version
+        DBLogicalObject.id,
         DBLogicalObject.bucket,
         DBLogicalObject.key,
         DBLogicalObject.size,
@@ -1273,19 +2010,12 @@ async def list_objects(
         DBLogicalObject.status,
         DBLogicalObject.multipart_upload_id,
     ).where(
-        DBLogicalObject.bucket == logical_bucket.bucket,
-        DBLogicalObject.status == Status.ready,
-        DBLogicalObject.delete_marker
-        is not True,  # NOTE: we don't want to list delete markers
+        DBLogicalObject.id.in_(latest_versions.group_by(DBLogicalObject.key)),
+        DBLogicalObject.delete_marker.is_(False),
     )
 
-    if request.prefix is not None:
-        stmt = stmt.where(DBLogicalObject.key.startswith(request.prefix))
-    if request.start_after is not None:
-        stmt = stmt.where(DBLogicalObject.key > request.start_after)
-
     # Sort keys before return
-    stmt = stmt.group_by(DBLogicalObject.key).order_by(DBLogicalObject.key)
+    stmt = stmt.order_by(DBLogicalObject.key)
 
     # Limit the number of returned objects if specified
     if request.max_keys is not None:
@@ -1308,9 +2038,186 @@ async def list_objects(
     ]
 
 
-# NOTE: This function is only for testing currently.
-# We can consdier add a `list-object-versions` function in the proxy side
-# and call this function.
+def encode_continuation_token(last_key: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"k": last_key}).encode()).decode()
+
+
+def decode_continuation_token(token: str) -> str:
+    """Return the last key listed by the previous page, raise ValueError on a malformed token."""
+    try:
+        return json.loads(base64.urlsafe_b64decode(token.encode()))["k"]
+    except Exception as e:
+        raise ValueError(f"Invalid continuation token: {token}") from e
+
+
+def common_prefix(key: str, prefix: str, delimiter: Optional[str]) -> Optional[str]:
+    """Return the CommonPrefix `key` rolls up into, or None if it is listed on its own."""
+    if not delimiter:
+        return None
+    index = key.find(delimiter, len(prefix))
+    return key[: index + len(delimiter)] if index >= 0 else None
+
+
+def prefix_successor(prefix: str) -> str:
+    """Return the smallest string sorting after every string that starts with `prefix`.
+
+    Only holds in code point order, which is why logical_objects.key is declared with the "C"
+    collation on PostgreSQL.
+    """
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def latest_objects_stmt(bucket: str):
+    """Select the latest ready version of every key in `bucket` that is not a delete marker,
+    without grouping, so that rows come off the (bucket, key, id DESC) index in key order.
+    """
+    newer = aliased(DBLogicalObject)
+    has_newer_version = (
+        select(newer.id)
+        .where(newer.bucket == DBLogicalObject.bucket)
+        .where(newer.key == DBLogicalObject.key)
+        .where(newer.status == Status.ready)
+        .where(newer.id > DBLogicalObject.id)
+    )
+    return (
+        select(
+            DBLogicalObject.id,
+            DBLogicalObject.bucket,
+            DBLogicalObject.key,
+            DBLogicalObject.size,
+            DBLogicalObject.etag,
+            DBLogicalObject.last_modified,
+        )
+        .where(DBLogicalObject.bucket == bucket)
+        .where(DBLogicalObject.status == Status.ready)
+        .where(DBLogicalObject.delete_marker.is_(False))
+        .where(~has_newer_version.exists())
+    )
+
+
+@router.post(
+    "/list_objects_v2",
+    responses={
+        status.HTTP_200_OK: {"model": ListObjectsV2Response},
+        status.HTTP_400_BAD_REQUEST: {"description": "Invalid continuation token"},
+        status.HTTP_404_NOT_FOUND: {"description": "Bucket not found"},
+    },
+)
+async def list_objects_v2(
+    request: ListObjectsV2Request, db: Session = Depends(get_session)
+) -> ListObjectsV2Response:
+    """List one page of the latest objects, following the S3 ListObjectsV2 pagination.
+
+    Pages are found with keyset seeks (`key > last key`) rather than OFFSET, and the body is
+    streamed while rows come off the cursor, so memory per request does not grow with the bucket.
+    With a delimiter, keys are rolled up into CommonPrefixes in the database: once a prefix is
+    emitted the next query seeks past all of its keys, so a listing costs one query per prefix.
+    """
+    stmt = select(DBLogicalBucket).where(
+        DBLogicalBucket.bucket == request.bucket, DBLogicalBucket.status == Status.ready
+    )
+    logical_bucket = await db.scalar(stmt)
+    if logical_bucket is None:
+        return Response(status_code=404, content="Bucket Not Found")
+
+    prefix = request.prefix or ""
+    delimiter = request.delimiter or None
+
+    # a seek is (key, inclusive): the next listed key is `>= key` or `> key`
+    # S3 only honors start_after on the first page
+    seek = (request.start_after, False) if request.start_after is not None else None
+    if request.continuation_token is not None:
+        try:
+            last_key = decode_continuation_token(request.continuation_token)
+        except ValueError as e:
+            return Response(status_code=400, content=str(e))
+        # the previous page ended on a common prefix, skip every key under it
+        rolled_up = common_prefix(last_key, prefix, delimiter)
+        seek = (prefix_successor(rolled_up), True) if rolled_up else (last_key, False)
+
+    max_keys = min(
+        request.max_keys if request.max_keys is not None else LIST_OBJECTS_MAX_KEYS,
+        LIST_OBJECTS_MAX_KEYS,
+    )
+
+    base_stmt = latest_objects_stmt(logical_bucket.bucket)
+    if prefix:
+        # the range condition lets the database seek to the prefix on the index
+        base_stmt = base_stmt.where(DBLogicalObject.key >= prefix).where(
+            DBLogicalObject.key.startswith(prefix)
+        )
+
+    async def stream_page():
+        nonlocal seek
+        # the route's session may be closed once the handler returns, use a dedicated one
+        async with async_session() as session:
+            key_count, last_key, is_truncated = 0, None, False
+            num_objects, common_prefixes = 0, []
+            yield '{"objects":['
+            while True:
+                stmt = base_stmt
+                if seek is not None:
+                    seek_key, inclusive = seek
+                    stmt = stmt.where(
+                        DBLogicalObject.key >= seek_key
+                        if inclusive
+                        else DBLogicalObject.key > seek_key
+                    )
+                # fetch one more row to know whether the listing is truncated
+                stmt = stmt.order_by(DBLogicalObject.key).limit(
+                    max_keys - key_count + 1
+                )
+
+                result = await session.stream(stmt)
+                rolled_up = None
+                async for obj in result:
+                    if key_count == max_keys:
+                        is_truncated = True
+                        break
+                    key_count += 1
+                    rolled_up = common_prefix(obj.key, prefix, delimiter)
+                    if rolled_up is not None:
+                        common_prefixes.append(rolled_up)
+                        last_key = rolled_up
+                        break
+                    object_response = ObjectResponse(
+                        bucket=obj.bucket,
+                        key=obj.key,
+                        size=obj.size,
+                        etag=obj.etag,
+                        last_modified=obj.last_modified,
+                    )
+                    yield ("," if num_objects else "") + json.dumps(
+                        jsonable_encoder(object_response)
+                    )
+                    num_objects += 1
+                    last_key = obj.key
+                await result.close()
+
+                # running off the end of a result without rolling up means no keys are left
+                if is_truncated or rolled_up is None:
+                    break
+                # skip-scan: jump past every key under the common prefix with one seek
+                seek = (prefix_successor(rolled_up), True)
+
+            next_token = encode_continuation_token(last_key) if is_truncated else None
+            yield "],{}".format(
+                json.dumps(
+                    {
+                        "common_prefixes": common_prefixes,
+                        "key_count": key_count,
+                        "is_truncated": is_truncated,
+                        "next_continuation_token": next_token,
+                    }
+                )[1:]
+            )
+
+    logger.debug(f"list_objects_v2: {request}")
+
+    return StreamingResponse(stream_page(), media_type="application/json")
+
+
+# NOTE: This function is only for testing, see list_object_versions for the paginated listing.
 @router.post("/list_objects_versioning")
 async def list_objects_versioning(
     request: ListObjectRequest, db: Session = Depends(get_session)
@@ -1360,17 +2267,130 @@ async def list_objects_versioning(
     ]
 
 
+# The window and the page share the (bucket, key, id DESC) index order, so rows are read off
+# the index without a sort and the scan stops at the limit (checked by
+# test_object_versions_scan_stops_at_limit).
+OBJECT_VERSIONS_ORDER = (DBLogicalObject.key, DBLogicalObject.id.desc())
+
+
+def object_versions_stmt(bucket: str):
+    """The ready versions of `bucket`, ranked newest first within each key."""
+    return (
+        select(
+            DBLogicalObject.id,
+            DBLogicalObject.key,
+            DBLogicalObject.size,
+            DBLogicalObject.etag,
+            DBLogicalObject.last_modified,
+            DBLogicalObject.delete_marker,
+            func.row_number()
+            .over(partition_by=DBLogicalObject.key, order_by=DBLogicalObject.id.desc())
+            .label("rank"),
+        )
+        .where(DBLogicalObject.bucket == bucket)
+        .where(DBLogicalObject.status == Status.ready)
+    )
+
+
+@router.post(
+    "/list_object_versions",
+    responses={
+        status.HTTP_200_OK: {"model": ListObjectVersionsResponse},
+        status.HTTP_400_BAD_REQUEST: {"description": "Invalid marker"},
+        status.HTTP_404_NOT_FOUND: {"description": "Bucket not found"},
+    },
+)
+async def list_object_versions(
+    request: ListObjectVersionsRequest, db: Session = Depends(get_session)
+) -> ListObjectVersionsResponse:
+    """List one page of the ready versions and delete markers of a bucket, following the S3
+    ListObjectVersions pagination: by key, newest version first within a key.
+
+    Pages are keyset seeks on (key, id) read off the (bucket, key, id DESC) index, and
+    `is_latest` is a window over the versions of each key rather than a query per key.
+    """
+    if request.version_id_marker is not None and request.key_marker is None:
+        return Response(
+            status_code=400, content="version_id_marker requires a key_marker"
+        )
+    stmt = select(DBLogicalBucket).where(
+        DBLogicalBucket.bucket == request.bucket, DBLogicalBucket.status == Status.ready
+    )
+    logical_bucket = await db.scalar(stmt)
+    if logical_bucket is None:
+        return Response(status_code=404, content="Bucket Not Found")
+
+    max_keys = min(request.max_keys, LIST_OBJECTS_MAX_KEYS)
+
+    stmt = object_versions_stmt(logical_bucket.bucket)
+    prefix = request.prefix or ""
+    if prefix:
+        stmt = stmt.where(DBLogicalObject.key >= prefix).where(
+            DBLogicalObject.key.startswith(prefix)
+        )
+
+    marker_latest_id = None
+    if request.key_marker is not None:
+        after_marker = DBLogicalObject.key > request.key_marker
+        if request.version_id_marker is not None:
+            after_marker = or_(
+                after_marker,
+                and_(
+                    DBLogicalObject.key == request.key_marker,
+                    DBLogicalObject.id < request.version_id_marker,
+                ),
+            )
+            # the window only sees the versions after the marker, so the rest of the marker
+            # key is ranked from the wrong end; look its latest version up instead
+            marker_latest_id = await db.scalar(
+                select(func.max(DBLogicalObject.id))
+                .where(DBLogicalObject.bucket == logical_bucket.bucket)
+                .where(DBLogicalObject.key == request.key_marker)
+                .where(DBLogicalObject.status == Status.ready)
+            )
+        # the range condition lets the database seek to the marker on the index
+        stmt = stmt.where(DBLogicalObject.key >= request.key_marker).where(after_marker)
+
+    # fetch one more row to know whether the listing is truncated
+    stmt = stmt.order_by(*OBJECT_VERSIONS_ORDER).limit(max_keys + 1)
+    rows = (await db.execute(stmt)).all()
+    is_truncated = len(rows) > max_keys
+    rows = rows[:max_keys]
+
+    def is_latest(row) -> bool:
+        if request.version_id_marker is not None and row.key == request.key_marker:
+            return row.id == marker_latest_id
+        return row.rank == 1
+
+    logger.debug(f"list_object_versions: {request} -> {len(rows)} versions")
+
+    return ListObjectVersionsResponse(
+        versions=[
+            ObjectVersionResponse(
+                key=row.key,
+                version_id=row.id,
+                is_latest=is_latest(row),
+                delete_marker=row.delete_marker,
+                size=None if row.delete_marker else row.size,
+                etag=None if row.delete_marker else row.etag,
+                last_modified=row.last_modified,
+            )
+            for row in rows
+        ],
+        is_truncated=is_truncated,
+        next_key_marker=rows[-1].key if is_truncated else None,
+        next_version_id_marker=rows[-1].id if is_truncated else None,
+    )
+
+
 @router.post("/head_object")
 async def head_object(
     request: HeadObjectRequest, db: Session = Depends(get_session)
 ) -> HeadObjectResponse:
-    version_enabled = (
-        await db.execute(
-            select(DBLogicalBucket.version_enabled).where(
-                DBLogicalBucket.bucket == request.bucket
-            )
-        )
-    ).all()[0][0]
+    bucket_metadata = await get_bucket_metadata(db, request.bucket)
+    if bucket_metadata is None:
+        return Response(status_code=404, content="Bucket Not Found")
+    version_enabled = bucket_metadata.version_enabled
 
     if version_enabled is None and request.version_id:
         return Response(status_code=400, content="Versioning is not enabled")
@@ -1442,6 +2462,51 @@ async def list_multipart_uploads(
     ]
 
 
+@router.post("/list_multipart_aborts")
+async def list_multipart_aborts(
+    request: ListMultipartAbortsRequest, db: Session = Depends(get_session)
+) -> ListMultipartAbortsResponse:
+    """Return the physical multipart uploads of the uploads reaped as stale.
+
+    The proxy polls this, aborts the uploads and removes them from the queue through
+    `complete_multipart_aborts`.
+    """
+    stmt = select(DBMultipartAbort)
+    if request.location_tag is not None:
+        stmt = stmt.where(DBMultipartAbort.location_tag == request.location_tag)
+    if request.after_id is not None:
+        stmt = stmt.where(DBMultipartAbort.id > request.after_id)
+    stmt = stmt.order_by(DBMultipartAbort.id).limit(request.limit)
+    aborts = (await db.scalars(stmt)).all()
+
+    logger.debug(f"list_multipart_aborts: {request} -> {aborts}")
+
+    return ListMultipartAbortsResponse(
+        aborts=[
+            MultipartAbort(
+                id=abort.id,
+                tag=abort.location_tag,
+                cloud=abort.cloud,
+                region=abort.region,
+                bucket=abort.bucket,
+                key=abort.key,
+                multipart_upload_id=abort.multipart_upload_id,
+            )
+            for abort in aborts
+        ]
+    )
+
+
+@router.patch("/complete_multipart_aborts")
+async def complete_multipart_aborts(
+    request: CompleteMultipartAbortsRequest, db: Session = Depends(get_session)
+):
+    await begin_write(db)
+    for chunk in chunked(request.ids):
+        await db.execute(delete(DBMultipartAbort).where(DBMultipartAbort.id.in_(chunk)))
+    await db.commit()
+
+
 # TODO: consider only the latest version of the object?
 @router.post("/list_parts")
 async def list_parts(
@@ -1490,13 +2555,10 @@ async def locate_object_status(
     """Given the logical object information, return the status of the object.
     Currently only used for testing metadata cleanup."""
 
-    version_enabled = (
-        await db.execute(
-            select(DBLogicalBucket.version_enabled).where(
-                DBLogicalBucket.bucket == request.bucket
-            )
-        )
-    ).all()[0][0]
+    bucket_metadata = await get_bucket_metadata(db, request.bucket)
+    if bucket_metadata is None:
+        return Response(status_code=404, content="Bucket Not Found")
+    version_enabled = bucket_metadata.version_enabled
 
     if version_enabled is None and request.version_id:
         return Response(status_code=400, content="Versioning is not enabled")
@@ -1553,21 +2615,21 @@ async def locate_object_status(
     return object_status_lst
 
 
-@router.post("/record_metrics")
-async def record_metrics(
-    request: RecordMetricsRequest, db: Session = Depends(get_session)
-) -> Response:
-    new_statistic = DBStatisticsObject(
-        requested_region=request.requested_region,
-        client_region=request.client_region,
-        operation=request.operation,
-        latency=request.latency,
-        timestamp=request.timestamp,
-        object_size=request.object_size,
-    )
+async def flush_recorded_metrics():
+    """Write the buffered metrics. The rows are recorded once they are buffered: a failed flush
+    keeps them for the next one, so it is logged rather than failed back to the proxy, whose
+    retry would record them twice."""
+    try:
+        await statistics_buffer.flush()
+    except Exception as e:
+        logger.error(f"flush_recorded_metrics: {e}")
 
-    db.add(new_statistic)
-    await db.commit()
+
+@router.post("/record_metrics")
+async def record_metrics(request: RecordMetricsRequest) -> Response:
+    # buffered, written in bulk by `flush_statistics`
+    if statistics_buffer.add(request.dict()):
+        await flush_recorded_metrics()
 
     # Using barebones response as no special return values
     return Response(
@@ -1576,14 +2638,75 @@ async def record_metrics(
     )
 
 
+@router.post("/record_metrics_batch")
+async def record_metrics_batch(request: RecordMetricsBatchRequest) -> Response:
+    """Record the metrics a proxy collected since its last call.
+
+    The batch is written right away together with anything buffered, in one transaction with
+    a single executemany, so one call costs one commit however many metrics it carries. If
+    that write fails the batch stays buffered for the next flush.
+    """
+    statistics_buffer.extend([metric.dict() for metric in request.metrics])
+    await flush_recorded_metrics()
+
+    return Response(
+        status_code=200,
+        content=f"Recorded {len(request.metrics)} metrics successfully",
+    )
+
+
 @router.post("/list_metrics")
 async def list_metrics(
     request: ListMetricsRequest, db: Session = Depends(get_session)
 ) -> ListMetricsResponse:
+    # make the metrics recorded so far visible
+    await statistics_buffer.flush()
+
+    if request.rollup:
+        stmt = select(DBStatisticsRollup).where(
+            DBStatisticsRollup.client_region == request.client_region
+        )
+        if request.start_time is not None:
+            stmt = stmt.where(DBStatisticsRollup.minute >= request.start_time)
+        if request.end_time is not None:
+            stmt = stmt.where(DBStatisticsRollup.minute < request.end_time)
+        stmt = stmt.order_by(
+            DBStatisticsRollup.minute,
+            DBStatisticsRollup.requested_region,
+            DBStatisticsRollup.operation,
+        )
+        rollups = (await db.scalars(stmt)).all()
+
+        logger.debug(f"list_metrics: {request} -> {rollups}")
+
+        rollup_objects = []
+        for rollup in rollups:
+            sketch = LatencySketch(rollup.latency_sketch)
+            rollup_objects.append(
+                ListMetricsRollupObject(
+                    client_region=rollup.client_region,
+                    requested_region=rollup.requested_region,
+                    operation=rollup.operation,
+                    minute=rollup.minute.isoformat(sep=" "),
+                    count=rollup.count,
+                    latency_sum=rollup.latency_sum,
+                    latency_p50=sketch.quantile(0.5),
+                    latency_p99=sketch.quantile(0.99),
+                    object_size_sum=rollup.object_size_sum,
+                )
+            )
+        return ListMetricsResponse(
+            metrics=[], rollups=rollup_objects, count=len(rollup_objects)
+        )
+
     stmt = select(DBStatisticsObject).where(
         DBStatisticsObject.client_region == request.client_region
     )
-    objects = (await db.scalars(stmt)).all()
+    if request.start_time is not None:
+        stmt = stmt.where(DBStatisticsObject.timestamp >= request.start_time)
+    if request.end_time is not None:
+        stmt = stmt.where(DBStatisticsObject.timestamp < request.end_time)
+    objects = (await db.scalars(stmt.order_by(DBStatisticsObject.id))).all()
 
     logger.debug(f"list_metrics: {request} -> {objects}")
 
@@ -1593,7 +2716,7 @@ async def list_metrics(
             requested_region=metric.requested_region,
             operation=metric.operation,
             latency=metric.latency,
-            timestamp=metric.timestamp,
+            timestamp=metric.timestamp.isoformat(sep=" "),
             object_size=metric.object_size,
         )
         for metric in objects
@@ -1,16 +1,17 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 from sqlalchemy import (
     Boolean,
     Column,
     DateTime,
     Enum,
     ForeignKey,
+    Index,
     Integer,
     String,
 )
 from sqlalchemy.orm import relationship
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
 from operations.utils.conf import Base, Status, Configuration
 
 
@@ -18,7 +19,7 @@ class DBLogicalBucket(Base):
     __tablename__ = "logical_buckets"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    bucket = Column(String)
+    bucket = Column(String, unique=True)
     prefix = Column(String)
 
     # NOTE: do we need status per logical bucket?
@@ -35,6 +36,14 @@ class DBLogicalBucket(Base):
 
     version_enabled = Column(Boolean)
 
+    # Lifecycle expiration rule, applied in the background by operations/utils/lifecycle.py.
+    # Noncurrent versions expire once they have been noncurrent for this many days...
+    lifecycle_noncurrent_days = Column(Integer, nullable=True)
+    # ...and more than this many newer noncurrent versions of the key exist
+    lifecycle_newer_noncurrent_versions = Column(Integer, nullable=True)
+    # remove delete markers that are the only remaining version of their key
+    lifecycle_expired_object_delete_marker = Column(Boolean, nullable=True)
+
 
 class DBPhysicalBucketLocator(Base):
     __tablename__ = "physical_bucket_locators"
@@ -64,7 +73,21 @@ class DBPhysicalBucketLocator(Base):
 
     # Add explicit relationship to DBPhysicalObjectLocator
     physical_object_locators = relationship(
-        "DBPhysicalObjectLocator", back_populates="physical_bucket"
+        "DBPhysicalObjectLocator",
+        back_populates="physical_bucket",
+        primaryjoin=(
+            "and_(DBPhysicalBucketLocator.bucket==foreign(DBPhysicalObjectLocator.bucket), "
+            "DBPhysicalBucketLocator.location_tag==foreign(DBPhysicalObjectLocator.location_tag))"
+        ),
+        viewonly=True,
+    )
+
+    __table_args__ = (
+        Index(
+            "ix_physical_bucket_locators_logical_bucket_id_location_tag",
+            "logical_bucket_id",
+            "location_tag",
+        ),
     )
 
 
@@ -129,3 +152,44 @@ class DeleteBucketIsCompleted(BaseModel):
 class PutBucketVersioningRequest(BaseModel):
     bucket: str
     versioning: bool
+
+
+class LifecycleRule(BaseModel):
+    # Follows the NoncurrentVersionExpiration and ExpiredObjectDeleteMarker actions of S3:
+    # https://docs.aws.amazon.com/AmazonS3/latest/userguide/intro-lifecycle-rules.html
+    noncurrent_days: Optional[int] = None
+    newer_noncurrent_versions: Optional[int] = None
+    expired_object_delete_marker: bool = False
+
+    @validator("noncurrent_days", "newer_noncurrent_versions")
+    def non_negative(cls, value):
+        if value is not None and value < 0:
+            raise ValueError("must not be negative")
+        return value
+
+
+class PutBucketLifecycleRequest(BaseModel):
+    bucket: str
+    rule: Optional[LifecycleRule] = None  # None removes the rule
+
+
+class GetBucketLifecycleRequest(BaseModel):
+    bucket: str
+
+
+class PhysicalBucketMetadata(BaseModel):
+    id: int
+    location_tag: str
+    cloud: str
+    region: str
+    bucket: str
+    prefix: str
+    is_primary: bool
+    need_warmup: bool
+
+
+class BucketMetadata(BaseModel):
+    # Cached view of a logical bucket's configuration, see operations/utils/bucket_cache.py
+    bucket: str
+    version_enabled: Optional[bool] = None
+    physical_bucket_locators: Dict[str, PhysicalBucketMetadata]  # keyed by location_tag
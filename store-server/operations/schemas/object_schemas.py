@@ -1,16 +1,26 @@
-from datetime import datetime
+from datetime import datetime, timezone
 from sqlalchemy import (
     Boolean,
     Column,
     DateTime,
     Enum,
     ForeignKey,
+    Index,
     Integer,
     String,
     Float,
+    JSON,
+    UniqueConstraint,
 )
 from sqlalchemy.orm import relationship
-from pydantic import BaseModel, Field, NonNegativeInt, validator
+from pydantic import (
+    BaseModel,
+    Field,
+    NonNegativeInt,
+    PositiveInt,
+    conint,
+    validator,
+)
 from operations.utils.conf import Base, Status
 from sqlalchemy.dialects.postgresql import BIGINT
 from typing import Dict, List, Literal, Optional
@@ -25,7 +35,10 @@ class DBLogicalObject(Base):
     bucket = Column(String, ForeignKey("logical_buckets.bucket"))
     logical_bucket = relationship("DBLogicalBucket", back_populates="logical_objects")
 
-    key = Column(String)
+    # Keys sort in code point order like in S3: the keyset pagination and the prefix
+    # skip-scans of the listings depend on the database comparing them the same way. SQLite
+    # does by default, PostgreSQL would use the linguistic collation of the database.
+    key = Column(String().with_variant(String(collation="C"), "postgresql"))
 
     size = Column(BIGINT)
     last_modified = Column(DateTime)
@@ -53,6 +66,19 @@ class DBLogicalObject(Base):
         back_populates="logical_object",
     )
 
+    # when the version was created; stale multipart uploads are aborted after
+    # MULTIPART_ABORT_AFTER_HOURS, see operations/utils/multipart_reaper.py
+    created_ts = Column(DateTime, nullable=True, default=datetime.utcnow)
+
+    # Serves the (bucket, key) lookups that pick the latest version with `ORDER BY id DESC`,
+    # the key-ordered scans in list_objects, and list_object_versions, which reads the versions
+    # newest first within each key. It replaces ix_logical_objects_bucket_key_id (see
+    # RETIRED_INDEXES).
+    __table_args__ = (
+        Index("ix_logical_objects_bucket_key_id_desc", "bucket", "key", id.desc()),
+        Index("ix_logical_objects_status_created_ts", "status", "created_ts"),
+    )
+
 
 class DBPhysicalObjectLocator(Base):
     __tablename__ = "physical_object_locators"
@@ -63,23 +89,26 @@ class DBPhysicalObjectLocator(Base):
     cloud = Column(String)
     region = Column(String)
 
-    bucket = Column(
-        String, ForeignKey("physical_bucket_locators.bucket")
-    )  # added ForeignKey
+    # NOTE: physical bucket names are shared across logical buckets, so this cannot be a
+    # ForeignKey (PostgreSQL requires the referenced column to be unique)
+    bucket = Column(String)
 
     physical_bucket = relationship(
         "DBPhysicalBucketLocator",
         back_populates="physical_object_locators",
         primaryjoin=(
-            "and_(DBPhysicalObjectLocator.bucket==DBPhysicalBucketLocator.bucket, "
-            "DBPhysicalObjectLocator.location_tag==DBPhysicalBucketLocator.location_tag)"
+            "and_(foreign(DBPhysicalObjectLocator.bucket)==DBPhysicalBucketLocator.bucket, "
+            "foreign(DBPhysicalObjectLocator.location_tag)==DBPhysicalBucketLocator.location_tag)"
         ),
+        viewonly=True,
     )
 
     key = Column(String)
     lock_acquired_ts = Column(DateTime, nullable=True, default=None)
     status = Column(Enum(Status))
     is_primary = Column(Boolean, nullable=False, default=False)
+    # last time locate_object returned this replica, drives replica eviction
+    last_access_ts = Column(DateTime, nullable=True, default=datetime.utcnow)
 
     version_id = Column(String)  # mimic the type and name of the field in S3
 
@@ -101,6 +130,22 @@ class DBPhysicalObjectLocator(Base):
         foreign_keys=[logical_object_id],
     )
 
+    __table_args__ = (
+        Index(
+            "ix_physical_object_locators_object_id_tag_status",
+            "logical_object_id",
+            "location_tag",
+            "status",
+        ),
+        Index(
+            "ix_physical_object_locators_tag_last_access",
+            "location_tag",
+            "last_access_ts",
+        ),
+        # lets the lock sweep find the timed-out locks without a full scan
+        Index("ix_physical_object_locators_lock_acquired_ts", "lock_acquired_ts"),
+    )
+
 
 class DBStatisticsObject(Base):
     __tablename__ = "statistics_table"
@@ -110,9 +155,114 @@ class DBStatisticsObject(Base):
     client_region = Column(String)
     operation = Column(String)
     latency = Column(Float)
-    timestamp = Column(String)
+    timestamp = Column(DateTime, index=True)  # indexed for the retention sweep
     object_size = Column(BIGINT)
 
+    __table_args__ = (
+        Index(
+            "ix_statistics_table_client_region_timestamp", "client_region", "timestamp"
+        ),
+    )
+
+
+class DBStatisticsRollup(Base):
+    """Per-minute aggregates of statistics_table, kept after the raw rows expire."""
+
+    __tablename__ = "statistics_rollup_table"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    client_region = Column(String)
+    requested_region = Column(String)
+    operation = Column(String)
+    minute = Column(DateTime)  # start of the minute
+    count = Column(Integer)
+    latency_sum = Column(Float)
+    object_size_sum = Column(BIGINT)
+    # {bucket index: count} of a log-bucketed latency histogram, see `LatencySketch`
+    latency_sketch = Column(JSON)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "client_region",
+            "minute",
+            "requested_region",
+            "operation",
+            name="uq_statistics_rollup_region_minute",
+        ),
+    )
+
+
+class EvictionStats(BaseModel):
+    # one pass of replica eviction
+    ttl_evicted: int = 0
+    budget_evicted: int = 0
+    wall_time: float = 0  # seconds
+    finished_at: Optional[datetime] = None
+
+
+class LifecycleStats(BaseModel):
+    # one pass of the lifecycle rules over every bucket that has one
+    buckets: int = 0
+    keys_scanned: int = 0
+    versions_expired: int = 0
+    delete_markers_expired: int = 0
+    wall_time: float = 0  # seconds
+    finished_at: Optional[datetime] = None
+
+
+class ListLifecycleDeletionsRequest(BaseModel):
+    bucket: Optional[str] = None
+    # page through the deletions in id order
+    after_id: Optional[int] = None
+    limit: int = 1000
+
+
+class ListEvictionsRequest(BaseModel):
+    location_tag: Optional[str] = None
+    # page through the evictions in id order
+    after_id: Optional[int] = None
+    limit: int = 1000
+
+
+class DBObjectHotness(Base):
+    """Exponentially decaying access counter of an object per client region."""
+
+    __tablename__ = "object_hotness"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    bucket = Column(String)
+    key = Column(String)
+    client_region = Column(String)
+    # log of the counter scaled to a fixed epoch, see operations/utils/hotness.py
+    log_score = Column(Float)
+    last_access = Column(DateTime)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "bucket", "key", "client_region", name="uq_object_hotness_key_region"
+        ),
+        Index("ix_object_hotness_region_score", "client_region", "log_score"),
+        Index("ix_object_hotness_score", "log_score"),
+    )
+
+
+class HotObjectsRequest(BaseModel):
+    client_region: str
+    bucket: Optional[str] = None
+    k: int = Field(10, ge=1, le=1000)
+
+
+class HotObject(BaseModel):
+    bucket: str
+    key: str
+    client_region: str
+    score: float  # decayed number of accesses
+    last_access: datetime
+
+
+class HotObjectsResponse(BaseModel):
+    objects: List[HotObject]
+
 
 class LocateObjectRequest(BaseModel):
     bucket: str
@@ -137,6 +287,52 @@ class LocateObjectResponse(BaseModel):
     multipart_upload_id: Optional[str] = None
 
 
+class ListEvictionsResponse(BaseModel):
+    locators: List[LocateObjectResponse]
+
+
+class ListLifecycleDeletionsResponse(BaseModel):
+    locators: List[LocateObjectResponse]
+
+
+class LocateObjectsBatchItem(BaseModel):
+    key: str
+    version_id: Optional[int] = None
+
+
+class LocateObjectsBatchRequest(BaseModel):
+    bucket: str
+    client_from_region: str
+    objects: List[LocateObjectsBatchItem]
+
+
+class LocateObjectsBatchResult(BaseModel):
+    key: str
+    version_id: Optional[int] = None
+    # same status code `locate_object` would return for this key, locator is set only on 200
+    status_code: int
+    locator: Optional[LocateObjectResponse] = None
+
+
+class LocateObjectsBatchResponse(BaseModel):
+    results: List[LocateObjectsBatchResult]
+
+
+class DBMultipartAbort(Base):
+    """A physical multipart upload of a reaped upload, for the proxy to abort."""
+
+    __tablename__ = "multipart_upload_aborts"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    location_tag = Column(String)
+    cloud = Column(String)
+    region = Column(String)
+    bucket = Column(String)
+    key = Column(String)
+    multipart_upload_id = Column(String)
+    queued_ts = Column(DateTime, default=datetime.utcnow)
+
+
 class DBLogicalMultipartUploadPart(Base):
     __tablename__ = "logical_multipart_upload_parts"
 
@@ -152,6 +348,16 @@ class DBLogicalMultipartUploadPart(Base):
     etag = Column(String)
     size = Column(BIGINT)
 
+    # one row per part, re-uploading a part overwrites it (see append_part)
+    __table_args__ = (
+        Index(
+            "ux_logical_multipart_upload_parts_object_id_part_number",
+            "logical_object_id",
+            "part_number",
+            unique=True,
+        ),
+    )
+
 
 class DBPhysicalMultipartUploadPart(Base):
     __tablename__ = "physical_multipart_upload_parts"
@@ -168,6 +374,15 @@ class DBPhysicalMultipartUploadPart(Base):
     etag = Column(String)
     size = Column(Integer)
 
+    __table_args__ = (
+        Index(
+            "ux_physical_multipart_upload_parts_locator_id_part_number",
+            "physical_object_locator_id",
+            "part_number",
+            unique=True,
+        ),
+    )
+
 
 class StartUploadRequest(LocateObjectRequest):
     is_multipart: bool
@@ -177,7 +392,7 @@ class StartUploadRequest(LocateObjectRequest):
     copy_src_bucket: Optional[str] = None
     copy_src_key: Optional[str] = None
 
-    # Policy
+    # Policy: push, write_local, copy_on_read, or a registered placement engine (e.g. adaptive)
     policy: Optional[str] = "push"
 
 
@@ -190,7 +405,9 @@ class StartUploadResponse(BaseModel):
 
 
 class StartWarmupRequest(LocateObjectRequest):
-    warmup_regions: List[str]
+    warmup_regions: List[str] = []
+    # a placement engine policy adds the regions it would replicate the object to
+    policy: Optional[str] = None
 
 
 class StartWarmupResponse(BaseModel):
@@ -198,6 +415,36 @@ class StartWarmupResponse(BaseModel):
     dst_locators: List[LocateObjectResponse]
 
 
+class StartWarmupBatchRequest(BaseModel):
+    bucket: str
+    client_from_region: str
+    warmup_regions: List[str]
+    # warm up either every object under a prefix or a list of keys
+    prefix: Optional[str] = None
+    keys: Optional[List[str]] = None
+    continuation_token: Optional[str] = None
+    max_keys: int = Field(1000, ge=1, le=1000)
+
+    @validator("keys", always=True)
+    def prefix_or_keys(cls, keys, values):
+        if (keys is None) == (values.get("prefix") is None):
+            raise ValueError("Exactly one of prefix and keys must be set")
+        return keys
+
+
+class StartWarmupBatchItem(BaseModel):
+    key: str
+    src_locator: LocateObjectResponse
+    # only the locators created by this call, regions already holding the object are skipped
+    dst_locators: List[LocateObjectResponse]
+
+
+class StartWarmupBatchResponse(BaseModel):
+    items: List[StartWarmupBatchItem]
+    is_truncated: bool
+    next_continuation_token: Optional[str] = None
+
+
 class PatchUploadIsCompleted(BaseModel):
     # This is called when the PUT operation finishes or upon CompleteMultipartUpload
     id: int
@@ -208,6 +455,21 @@ class PatchUploadIsCompleted(BaseModel):
     policy: Optional[str] = "push"
 
 
+class CompleteUploadBatchRequest(BaseModel):
+    completions: List[PatchUploadIsCompleted]
+
+
+class PatchResult(BaseModel):
+    # outcome of one item of a batched PATCH, mirrors the status code and content of the single-item route
+    id: int
+    status_code: int
+    content: Optional[str] = None
+
+
+class CompleteUploadBatchResponse(BaseModel):
+    results: List[PatchResult]
+
+
 class PatchUploadMultipartUploadId(BaseModel):
     # This is called when the CreateMultipartUpload operation finishes
     id: int
@@ -222,10 +484,23 @@ class PatchUploadMultipartUploadPart(BaseModel):
     size: NonNegativeInt = Field(..., minimum=0, format="int64")
 
 
+class AppendPartsBatchRequest(BaseModel):
+    parts: List[PatchUploadMultipartUploadPart]
+
+
+class AppendPartsBatchResponse(BaseModel):
+    # one result per part, in request order
+    results: List[PatchResult]
+
+
 class ContinueUploadRequest(LocateObjectRequest):
     multipart_upload_id: str
 
     do_list_parts: bool = False
+    # page through the parts of large uploads: list at most `max_parts` parts per locator,
+    # after `part_number_marker`; all of them (S3 allows at most 10000) by default
+    part_number_marker: Optional[NonNegativeInt] = None
+    max_parts: Optional[conint(gt=0, le=10000)] = None
 
     copy_src_bucket: Optional[str] = None
     copy_src_key: Optional[str] = None
@@ -240,6 +515,8 @@ class ContinueUploadResponse(LocateObjectResponse):
     multipart_upload_id: str
 
     parts: Optional[List[ContinueUploadPhysicalPart]] = None
+    # set when the locator has more parts than `max_parts` after the marker
+    next_part_number_marker: Optional[int] = None
 
     copy_src_bucket: Optional[str] = None
     copy_src_key: Optional[str] = None
@@ -252,6 +529,14 @@ class ListObjectRequest(BaseModel):
     max_keys: Optional[int] = None
 
 
+class ListObjectsV2Request(ListObjectRequest):
+    # opaque token returned as `next_continuation_token` by the previous page
+    continuation_token: Optional[str] = None
+    max_keys: Optional[int] = 1000
+    # keys containing the delimiter after the prefix are rolled up into `common_prefixes`
+    delimiter: Optional[str] = None
+
+
 class ObjectResponse(BaseModel):
     bucket: str
     key: str
@@ -261,6 +546,43 @@ class ObjectResponse(BaseModel):
     version_id: Optional[int] = None  # logical object version
 
 
+class ListObjectsV2Response(BaseModel):
+    objects: List[ObjectResponse]
+    common_prefixes: List[str] = []
+    key_count: int
+    is_truncated: bool
+    next_continuation_token: Optional[str] = None
+
+
+class ListObjectVersionsRequest(BaseModel):
+    bucket: str
+    prefix: Optional[str] = None
+    # S3 ListObjectVersions markers: the page starts after version `version_id_marker` of
+    # `key_marker`, or after every version of `key_marker` without a version id
+    key_marker: Optional[str] = None
+    version_id_marker: Optional[int] = None
+    max_keys: PositiveInt = 1000
+
+
+class ObjectVersionResponse(BaseModel):
+    key: str
+    version_id: int  # logical object version
+    is_latest: bool
+    delete_marker: bool
+    # not set for delete markers
+    size: Optional[NonNegativeInt] = Field(None, minimum=0, format="int64")
+    etag: Optional[str] = None
+    last_modified: Optional[datetime] = None
+
+
+class ListObjectVersionsResponse(BaseModel):
+    # newest version first within a key, delete markers included
+    versions: List[ObjectVersionResponse]
+    is_truncated: bool
+    next_key_marker: Optional[str] = None
+    next_version_id_marker: Optional[int] = None
+
+
 class ObjectStatus(BaseModel):
     status: Status
 
@@ -280,12 +602,73 @@ class HeadObjectResponse(BaseModel):
     version_id: Optional[int] = None
 
 
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Store and compare timestamps as naive UTC, the proxy sends them with an offset."""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class CompletedPart(BaseModel):
+    part_number: int
+    etag: str
+
+
+class CompleteMultipartRequest(BaseModel):
+    # This is called once the CompleteMultipartUpload of every physical location finished,
+    # with the part list the client sent
+    bucket: str
+    key: str
+    multipart_upload_id: str
+    parts: List[CompletedPart]
+    last_modified: Optional[datetime] = None  # now if not given
+    # version id of the completed physical object, keyed by physical locator id
+    version_ids: Dict[int, Optional[str]] = {}
+
+    _last_modified_utc = validator("last_modified", allow_reuse=True)(naive_utc)
+
+
 class MultipartResponse(BaseModel):
     bucket: str
     key: str
     upload_id: str
 
 
+class MultipartReaperStats(BaseModel):
+    # one pass of the stale multipart upload reaper
+    uploads_reaped: int = 0
+    parts_deleted: int = 0
+    aborts_queued: int = 0
+    wall_time: float = 0  # seconds
+    finished_at: Optional[datetime] = None
+
+
+class ListMultipartAbortsRequest(BaseModel):
+    location_tag: Optional[str] = None
+    # page through the queue in id order
+    after_id: Optional[int] = None
+    limit: int = 1000
+
+
+class MultipartAbort(BaseModel):
+    id: int
+    tag: str
+    cloud: str
+    region: str
+    bucket: str
+    key: str
+    multipart_upload_id: str
+
+
+class ListMultipartAbortsResponse(BaseModel):
+    aborts: List[MultipartAbort]
+
+
+class CompleteMultipartAbortsRequest(BaseModel):
+    # queue entries whose physical upload the proxy aborted
+    ids: List[int]
+
+
 class ListPartsRequest(BaseModel):
     bucket: str
     key: str
@@ -305,6 +688,17 @@ class HealthcheckResponse(BaseModel):
     status: Literal["OK"]
 
 
+class LockSweepStats(BaseModel):
+    # one pass of the rm_lock_on_timeout reconciler
+    locks_released: int = 0
+    objects_scanned: int = 0
+    objects_flipped: int = 0
+    buckets_scanned: int = 0
+    buckets_flipped: int = 0
+    wall_time: float = 0  # seconds
+    finished_at: Optional[datetime] = None
+
+
 class DeleteObjectsRequest(BaseModel):
     bucket: str
     object_identifiers: Dict[str, set[int]]
@@ -330,13 +724,18 @@ class DeleteObjectsIsCompleted(BaseModel):
     op_type: List[str]  # {'replace', 'delete', 'add'}
 
 
+class CompleteDeleteObjectsResponse(BaseModel):
+    # one result per id, in request order
+    results: List[PatchResult]
+
+
 class RecordMetricsRequest(BaseModel):
     client_region: str
     requested_region: str
     # read or write
     operation: str
     latency: float
-    timestamp: str
+    timestamp: datetime
     object_size: NonNegativeInt = Field(..., minimum=0, format="int64")
 
     @validator("operation")
@@ -347,9 +746,22 @@ class RecordMetricsRequest(BaseModel):
             )
         return value
 
+    _timestamp_utc = validator("timestamp", allow_reuse=True)(naive_utc)
+
+
+class RecordMetricsBatchRequest(BaseModel):
+    metrics: List[RecordMetricsRequest]
+
 
 class ListMetricsRequest(BaseModel):
     client_region: str
+    # half-open range [start_time, end_time) on the metric timestamp
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    # return per-minute aggregates instead of the raw metrics
+    rollup: bool = False
+
+    _range_utc = validator("start_time", "end_time", allow_reuse=True)(naive_utc)
 
 
 class ListMetricsObject(BaseModel):
@@ -361,6 +773,19 @@ class ListMetricsObject(BaseModel):
     object_size: NonNegativeInt = Field(..., minimum=0, format="int64")
 
 
+class ListMetricsRollupObject(BaseModel):
+    client_region: str
+    requested_region: str
+    operation: str
+    minute: str
+    count: int
+    latency_sum: float
+    latency_p50: float
+    latency_p99: float
+    object_size_sum: NonNegativeInt = Field(..., minimum=0, format="int64")
+
+
 class ListMetricsResponse(BaseModel):
     metrics: List[ListMetricsObject]
     count: int
+    rollups: List[ListMetricsRollupObject] = []
@@ -0,0 +1,77 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload, Session
+from operations.schemas.bucket_schemas import (
+    DBLogicalBucket,
+    BucketMetadata,
+    PhysicalBucketMetadata,
+)
+
+# Bucket configuration (versioning state and physical locations) is read by nearly every
+# object route but changes rarely, so keep it in process. Routes that modify a bucket must
+# call `invalidate_bucket_metadata`, which makes the change visible to the next request of
+# the same process. Other server processes only see it once their entry expires: for up to
+# BUCKET_CACHE_TTL seconds they may still version (or not) new writes by the old setting and
+# hand out locators of a deleted physical bucket. Keep the TTL short when running more than
+# one process, 0 disables the cache.
+BUCKET_CACHE_SIZE = int(os.environ.get("BUCKET_CACHE_SIZE", "1024"))
+BUCKET_CACHE_TTL = float(os.environ.get("BUCKET_CACHE_TTL", "5"))
+
+_cache: "OrderedDict[str, tuple[float, BucketMetadata]]" = OrderedDict()
+# bumped on every invalidation so that a load racing with a bucket update is not cached
+_generation = 0
+
+
+async def get_bucket_metadata(db: Session, bucket: str) -> Optional[BucketMetadata]:
+    """Return the cached metadata of a logical bucket, or None if the bucket does not exist."""
+    entry = _cache.get(bucket)
+    if entry is not None and time.monotonic() - entry[0] < BUCKET_CACHE_TTL:
+        _cache.move_to_end(bucket)
+        return entry[1]
+
+    generation = _generation
+    logical_bucket = await db.scalar(
+        select(DBLogicalBucket)
+        .options(selectinload(DBLogicalBucket.physical_bucket_locators))
+        .where(DBLogicalBucket.bucket == bucket)
+    )
+    if logical_bucket is None:
+        return None
+
+    metadata = BucketMetadata(
+        bucket=logical_bucket.bucket,
+        version_enabled=logical_bucket.version_enabled,
+        physical_bucket_locators={
+            locator.location_tag: PhysicalBucketMetadata(
+                id=locator.id,
+                location_tag=locator.location_tag,
+                cloud=locator.cloud,
+                region=locator.region,
+                bucket=locator.bucket,
+                prefix=locator.prefix or "",
+                is_primary=locator.is_primary,
+                need_warmup=locator.need_warmup,
+            )
+            for locator in logical_bucket.physical_bucket_locators
+        },
+    )
+
+    if generation == _generation:
+        _cache[bucket] = (time.monotonic(), metadata)
+        _cache.move_to_end(bucket)
+        while len(_cache) > BUCKET_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return metadata
+
+
+def invalidate_bucket_metadata(bucket: Optional[str] = None):
+    """Drop the cached metadata of `bucket`, or of every bucket if None."""
+    global _generation
+    _generation += 1
+    if bucket is None:
+        _cache.clear()
+    else:
+        _cache.pop(bucket, None)
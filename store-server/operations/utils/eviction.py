@@ -0,0 +1,206 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import aliased
+from operations.schemas.object_schemas import (
+    DBLogicalObject,
+    DBPhysicalObjectLocator,
+    EvictionStats,
+    Status,
+)
+from operations.utils.db import async_session, begin_write, logger
+
+# Secondary replicas (copy_on_read, warmup) are evicted once they are unused for this long,
+# 0 disables the TTL.
+REPLICA_TTL_HOURS = float(os.environ.get("REPLICA_TTL_HOURS", "0"))
+# JSON object of location tag -> bytes of secondary replicas a region may hold, evicted in
+# least recently used order, e.g. {"aws:us-east-1": 1000000000000}
+REPLICA_REGION_BUDGETS: Dict[str, int] = json.loads(
+    os.environ.get("REPLICA_REGION_BUDGETS", "{}")
+)
+REPLICA_EVICTION_BATCH_SIZE = int(os.environ.get("REPLICA_EVICTION_BATCH_SIZE", "1000"))
+
+# Reads only touch this map, the last-access times are written in bulk by
+# `flush_access_times` so that locate_object stays a read-only query.
+_last_access: Dict[int, datetime] = {}
+
+
+def record_access(locator_id: int):
+    _last_access[locator_id] = datetime.utcnow()
+
+
+async def flush_access_times() -> int:
+    global _last_access
+
+    accesses, _last_access = _last_access, {}
+    if not accesses:
+        return 0
+
+    table = DBPhysicalObjectLocator.__table__
+    # plain executemany rather than an ORM bulk update, a locator deleted since its read is
+    # simply skipped
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("locator_id"))
+        .values(last_access_ts=bindparam("accessed_at"))
+    )
+    async with async_session() as db:
+        await begin_write(db)
+        await db.execute(
+            stmt,
+            [
+                {"locator_id": locator_id, "accessed_at": accessed_at}
+                for locator_id, accessed_at in accesses.items()
+            ],
+        )
+        await db.commit()
+    return len(accesses)
+
+
+def evictable_replicas():
+    """Ready secondary replicas of ready objects whose primary copy is ready, so that an
+    eviction never removes the last readable copy."""
+    primary = aliased(DBPhysicalObjectLocator)
+    has_ready_primary = (
+        select(primary.id)
+        .where(primary.logical_object_id == DBPhysicalObjectLocator.logical_object_id)
+        .where(primary.is_primary.is_(True))
+        .where(primary.status == Status.ready)
+    )
+    return (
+        select(DBPhysicalObjectLocator.id)
+        .join(DBLogicalObject)
+        .where(DBPhysicalObjectLocator.is_primary.is_(False))
+        .where(DBPhysicalObjectLocator.status == Status.ready)
+        .where(DBLogicalObject.status == Status.ready)
+        .where(has_ready_primary.exists())
+    )
+
+
+async def mark_evicted(ids: List[int]) -> int:
+    """Hand replicas over to the proxy for deletion, in short transactions."""
+    evicted = 0
+    for start in range(0, len(ids), REPLICA_EVICTION_BATCH_SIZE):
+        async with async_session() as db:
+            await begin_write(db)
+            result = await db.execute(
+                update(DBPhysicalObjectLocator)
+                .where(
+                    DBPhysicalObjectLocator.id.in_(
+                        ids[start : start + REPLICA_EVICTION_BATCH_SIZE]
+                    )
+                )
+                # re-check, the replica may have changed since it was picked
+                .where(DBPhysicalObjectLocator.status == Status.ready)
+                .where(DBPhysicalObjectLocator.is_primary.is_(False))
+                # no lock timestamp: the lock sweep must not put evictions back to ready
+                .values(status=Status.pending_deletion, lock_acquired_ts=None)
+            )
+            await db.commit()
+        evicted += result.rowcount
+    return evicted
+
+
+async def stamp_unknown_access_times() -> int:
+    """Count replicas with no last access (e.g. created before the column existed) as used
+    now, so that the TTL starts running for them instead of never matching."""
+    table = DBPhysicalObjectLocator.__table__
+    unknown_ids = (
+        select(table.c.id)
+        .where(table.c.last_access_ts.is_(None))
+        .limit(REPLICA_EVICTION_BATCH_SIZE)
+    )
+    stamped = 0
+    while True:
+        async with async_session() as db:
+            await begin_write(db)
+            result = await db.execute(
+                update(table)
+                .where(table.c.id.in_(unknown_ids))
+                .values(last_access_ts=datetime.utcnow())
+            )
+            await db.commit()
+        stamped += result.rowcount
+        if result.rowcount < REPLICA_EVICTION_BATCH_SIZE:
+            return stamped
+
+
+async def evict_expired(ttl: timedelta) -> int:
+    """Evict the replicas unused since `ttl` ago, paging through them in id order."""
+    cutoff = datetime.utcnow() - ttl
+    evicted, last_id = 0, 0
+    while True:
+        async with async_session() as db:
+            ids = (
+                await db.scalars(
+                    evictable_replicas()
+                    .where(DBPhysicalObjectLocator.last_access_ts < cutoff)
+                    .where(DBPhysicalObjectLocator.id > last_id)
+                    .order_by(DBPhysicalObjectLocator.id)
+                    .limit(REPLICA_EVICTION_BATCH_SIZE)
+                )
+            ).all()
+        evicted += await mark_evicted(ids)
+        if len(ids) < REPLICA_EVICTION_BATCH_SIZE:
+            return evicted
+        last_id = ids[-1]
+
+
+async def evict_over_budget(location_tag: str, budget: int) -> int:
+    """Evict the least recently used replicas of a region until it fits in its budget."""
+    async with async_session() as db:
+        usage = await db.scalar(
+            select(func.coalesce(func.sum(DBLogicalObject.size), 0))
+            .select_from(DBPhysicalObjectLocator)
+            .join(DBLogicalObject)
+            .where(DBPhysicalObjectLocator.location_tag == location_tag)
+            .where(DBPhysicalObjectLocator.is_primary.is_(False))
+            .where(DBPhysicalObjectLocator.status == Status.ready)
+        )
+        if usage <= budget:
+            return 0
+
+        ids, freed = [], 0
+        result = await db.stream(
+            evictable_replicas()
+            .add_columns(DBLogicalObject.size)
+            .where(DBPhysicalObjectLocator.location_tag == location_tag)
+            .order_by(
+                DBPhysicalObjectLocator.last_access_ts.nulls_first(),
+                DBPhysicalObjectLocator.id,
+            )
+        )
+        async for locator_id, size in result:
+            if usage - freed <= budget:
+                break
+            ids.append(locator_id)
+            freed += size or 0
+        await result.close()
+
+    logger.info(
+        f"evict_over_budget: {location_tag} holds {usage} bytes of replicas, "
+        f"budget {budget}, evicting {len(ids)} replicas ({freed} bytes)"
+    )
+    return await mark_evicted(ids)
+
+
+async def evict_replicas(
+    ttl: Optional[timedelta], budgets: Dict[str, int]
+) -> EvictionStats:
+    start = time.perf_counter()
+    stats = EvictionStats()
+
+    # evict on up to date access times
+    await flush_access_times()
+    await stamp_unknown_access_times()
+    if ttl is not None:
+        stats.ttl_evicted = await evict_expired(ttl)
+    for location_tag, budget in budgets.items():
+        stats.budget_evicted += await evict_over_budget(location_tag, budget)
+
+    stats.wall_time = time.perf_counter() - start
+    stats.finished_at = datetime.utcnow()
+    return stats
@@ -0,0 +1,127 @@
+import math
+import os
+from datetime import datetime
+from typing import Dict, Tuple
+from sqlalchemy import delete, func
+from operations.schemas.object_schemas import DBObjectHotness
+from operations.utils.db import IS_SQLITE, async_session, begin_write, logger, upsert
+
+# Every access adds 1 to a counter that halves every HOTNESS_HALF_LIFE_MINUTES.
+HOTNESS_HALF_LIFE_MINUTES = float(os.environ.get("HOTNESS_HALF_LIFE_MINUTES", "60"))
+# cap on the (bucket, key, region) counters kept between flushes, new keys are dropped
+# once it is reached
+HOTNESS_MAX_PENDING = int(os.environ.get("HOTNESS_MAX_PENDING", "100000"))
+# rows whose decayed score fell below this are deleted by `prune_hotness`
+HOTNESS_MIN_SCORE = float(os.environ.get("HOTNESS_MIN_SCORE", "0.01"))
+HOTNESS_FLUSH_BATCH_SIZE = 500
+
+DECAY_RATE = math.log(2) / (HOTNESS_HALF_LIFE_MINUTES * 60)  # per second
+# Scores are stored as log(sum(exp(DECAY_RATE * (t_access - EPOCH)))): the decay of every
+# counter is the same factor, so rows stay comparable without being rewritten as time passes
+# and the top-K is an index scan on log_score. The log keeps the values finite.
+EPOCH = datetime(2024, 1, 1)
+
+HotnessKey = Tuple[str, str, str]  # (bucket, key, client region)
+
+# (log score, time of the last access) accumulated since the last flush
+_pending: Dict[HotnessKey, Tuple[float, datetime]] = {}
+dropped_accesses = 0
+
+
+def log_weight(at: datetime) -> float:
+    return DECAY_RATE * (at - EPOCH).total_seconds()
+
+
+def log_add(a: float, b: float) -> float:
+    """log(exp(a) + exp(b)) without overflowing."""
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def decayed_score(log_score: float, now: datetime) -> float:
+    """The counter value at `now`."""
+    return math.exp(log_score - log_weight(now))
+
+
+def record_hit(bucket: str, key: str, client_region: str):
+    """Count an access. Only touches memory, `flush_hotness` writes the counters."""
+    global dropped_accesses
+
+    hotness_key = (bucket, key, client_region)
+    now = datetime.utcnow()
+    weight = log_weight(now)
+    entry = _pending.get(hotness_key)
+    if entry is not None:
+        _pending[hotness_key] = (log_add(entry[0], weight), now)
+    elif len(_pending) < HOTNESS_MAX_PENDING:
+        _pending[hotness_key] = (weight, now)
+    else:
+        dropped_accesses += 1
+
+
+def sql_log_add(a, b):
+    """`log_add` as a SQL expression."""
+    high = (func.max if IS_SQLITE else func.greatest)(a, b)
+    low = (func.min if IS_SQLITE else func.least)(a, b)
+    return high + func.ln(1 + func.exp(low - high))
+
+
+# merging in the database keeps concurrent flushes of the same new counter from conflicting
+hotness_upsert = upsert(
+    DBObjectHotness.__table__,
+    ["bucket", "key", "client_region"],
+    ["last_access"],
+    merge={"log_score": sql_log_add},
+)
+
+
+async def flush_hotness() -> int:
+    """Merge the pending counters into object_hotness, return the number of counters."""
+    global _pending
+
+    pending, _pending = _pending, {}
+    if not pending:
+        return 0
+
+    rows = [
+        {
+            "bucket": bucket,
+            "key": key,
+            "client_region": client_region,
+            "log_score": log_score,
+            "last_access": accessed_at,
+        }
+        for (bucket, key, client_region), (log_score, accessed_at) in pending.items()
+    ]
+    try:
+        async with async_session() as db:
+            await begin_write(db)
+            for start in range(0, len(rows), HOTNESS_FLUSH_BATCH_SIZE):
+                await db.execute(
+                    hotness_upsert, rows[start : start + HOTNESS_FLUSH_BATCH_SIZE]
+                )
+            await db.commit()
+    except Exception:
+        # put the counters back, merged with the accesses recorded since the swap
+        for hotness_key, (log_score, accessed_at) in pending.items():
+            entry = _pending.get(hotness_key)
+            _pending[hotness_key] = (
+                (log_score, accessed_at)
+                if entry is None
+                else (log_add(entry[0], log_score), entry[1])
+            )
+        raise
+    return len(pending)
+
+
+async def prune_hotness() -> int:
+    """Delete the counters that decayed below HOTNESS_MIN_SCORE."""
+    cutoff = log_weight(datetime.utcnow()) + math.log(HOTNESS_MIN_SCORE)
+    async with async_session() as db:
+        await begin_write(db)
+        result = await db.execute(
+            delete(DBObjectHotness).where(DBObjectHotness.log_score < cutoff)
+        )
+        await db.commit()
+    logger.info(f"prune_hotness: deleted {result.rowcount} counters")
+    return result.rowcount
@@ -0,0 +1,174 @@
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import func, or_, select, update
+from operations.schemas.bucket_schemas import DBLogicalBucket
+from operations.schemas.object_schemas import (
+    DBLogicalObject,
+    DBPhysicalObjectLocator,
+    LifecycleStats,
+    Status,
+)
+from operations.utils.db import async_session, begin_write, logger
+
+# How often the bucket lifecycle rules are applied, and how many keys one transaction looks
+# at. Each batch is its own short write transaction, so a pass over a large bucket never
+# holds the write lock for long.
+LIFECYCLE_INTERVAL_MINUTES = float(os.environ.get("LIFECYCLE_INTERVAL_MINUTES", "60"))
+LIFECYCLE_BATCH_SIZE = int(os.environ.get("LIFECYCLE_BATCH_SIZE", "500"))
+
+
+def is_expired(bucket, version, now: datetime) -> bool:
+    """Whether a ready version is expired by the rule of its bucket.
+
+    `version.rank` is its position among the ready versions of its key (1 is the current
+    one), and `version.noncurrent_since` is when the next newer version or delete marker was
+    written.
+    """
+    if version.rank == 1:
+        return bool(
+            bucket.lifecycle_expired_object_delete_marker
+            and version.delete_marker
+            and version.versions == 1
+        )
+
+    days = bucket.lifecycle_noncurrent_days
+    newer_versions = bucket.lifecycle_newer_noncurrent_versions
+    if days is None and newer_versions is None:
+        return False
+    if newer_versions is not None and version.rank - 1 <= newer_versions:
+        return False
+    if days is not None and (
+        version.noncurrent_since is None
+        or version.noncurrent_since > now - timedelta(days=days)
+    ):
+        return False
+    return True
+
+
+async def expire_keys(
+    bucket, after_key: Optional[str], now: datetime, stats: LifecycleStats
+) -> Optional[str]:
+    """Apply the rule of `bucket` to the next batch of keys after `after_key`.
+
+    Expired versions and delete markers are marked pending_deletion, with their locators, for
+    the proxy to delete the physical copies (see `list_lifecycle_deletions`). Returns the last
+    key looked at, or None at the end of the bucket.
+    """
+    async with async_session() as db:
+        await begin_write(db)
+        keys_stmt = (
+            select(DBLogicalObject.key)
+            .where(DBLogicalObject.bucket == bucket.bucket)
+            .distinct()
+            .order_by(DBLogicalObject.key)
+            .limit(LIFECYCLE_BATCH_SIZE)
+        )
+        if after_key is not None:
+            keys_stmt = keys_stmt.where(DBLogicalObject.key > after_key)
+        keys = (await db.scalars(keys_stmt)).all()
+        if not keys:
+            return None
+
+        newest_first = dict(
+            partition_by=DBLogicalObject.key, order_by=DBLogicalObject.id.desc()
+        )
+        versions = await db.execute(
+            select(
+                DBLogicalObject.id,
+                DBLogicalObject.delete_marker,
+                func.row_number().over(**newest_first).label("rank"),
+                func.lag(
+                    DBLogicalObject.last_modified,
+                    type_=DBLogicalObject.last_modified.type,
+                )
+                .over(**newest_first)
+                .label("noncurrent_since"),
+                func.count().over(partition_by=DBLogicalObject.key).label("versions"),
+            )
+            .where(DBLogicalObject.bucket == bucket.bucket)
+            .where(DBLogicalObject.key.in_(keys))
+            .where(DBLogicalObject.status == Status.ready)
+        )
+        expired = [version for version in versions if is_expired(bucket, version, now)]
+        if expired:
+            # versions with a copy still being written (e.g. a warmup) are left for a later
+            # run, the proxy must not delete them under the writer
+            busy_ids = set(
+                await db.scalars(
+                    select(DBPhysicalObjectLocator.logical_object_id)
+                    .where(
+                        DBPhysicalObjectLocator.logical_object_id.in_(
+                            [version.id for version in expired]
+                        )
+                    )
+                    .where(DBPhysicalObjectLocator.status == Status.pending)
+                )
+            )
+            expired = [version for version in expired if version.id not in busy_ids]
+        expired_ids = [version.id for version in expired]
+        if expired_ids:
+            # no lock timestamp: the lock sweep must not put the deletions back to ready
+            await db.execute(
+                update(DBPhysicalObjectLocator)
+                .where(DBPhysicalObjectLocator.logical_object_id.in_(expired_ids))
+                .values(status=Status.pending_deletion, lock_acquired_ts=None)
+            )
+            await db.execute(
+                update(DBLogicalObject)
+                .where(DBLogicalObject.id.in_(expired_ids))
+                .values(status=Status.pending_deletion)
+            )
+        await db.commit()
+
+    stats.keys_scanned += len(keys)
+    stats.versions_expired += sum(not version.delete_marker for version in expired)
+    stats.delete_markers_expired += sum(version.delete_marker for version in expired)
+    if len(keys) < LIFECYCLE_BATCH_SIZE:
+        return None
+    return keys[-1]
+
+
+async def run_lifecycle(now: Optional[datetime] = None) -> LifecycleStats:
+    """One pass of the lifecycle rules over every bucket that has one."""
+    start = time.perf_counter()
+    now = now or datetime.utcnow()
+    stats = LifecycleStats()
+
+    async with async_session() as db:
+        buckets = (
+            await db.execute(
+                select(
+                    DBLogicalBucket.bucket,
+                    DBLogicalBucket.lifecycle_noncurrent_days,
+                    DBLogicalBucket.lifecycle_newer_noncurrent_versions,
+                    DBLogicalBucket.lifecycle_expired_object_delete_marker,
+                )
+                .where(DBLogicalBucket.status == Status.ready)
+                .where(
+                    or_(
+                        DBLogicalBucket.lifecycle_noncurrent_days.is_not(None),
+                        DBLogicalBucket.lifecycle_newer_noncurrent_versions.is_not(
+                            None
+                        ),
+                        DBLogicalBucket.lifecycle_expired_object_delete_marker.is_(
+                            True
+                        ),
+                    )
+                )
+            )
+        ).all()
+
+    for bucket in buckets:
+        stats.buckets += 1
+        after_key = None
+        while True:
+            after_key = await expire_keys(bucket, after_key, now, stats)
+            if after_key is None:
+                break
+
+    stats.wall_time = time.perf_counter() - start
+    stats.finished_at = datetime.utcnow()
+    logger.info(f"run_lifecycle: {stats}")
+    return stats
@@ -0,0 +1,159 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import Engine, event
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+REQUESTS = Counter(
+    "skystore_requests_total",
+    "Requests handled by the metadata server",
+    ["route", "method", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "skystore_request_duration_seconds",
+    "Time from receiving a request to sending the end of its response",
+    ["route", "method"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "skystore_requests_in_flight",
+    "Requests currently being handled",
+    ["route", "method"],
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "skystore_db_queries_per_request",
+    "SQL statements executed while handling one request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 500),
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "skystore_db_time_per_request_seconds",
+    "Time spent executing SQL statements while handling one request",
+    ["route"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+DB_QUERIES = Counter(
+    "skystore_db_queries_total", "SQL statements executed, including background tasks"
+)
+DB_QUERY_TIME = Counter(
+    "skystore_db_query_seconds_total",
+    "Time spent executing SQL statements, including background tasks",
+)
+SQLITE_LOCK_WAIT = Histogram(
+    "skystore_sqlite_lock_wait_seconds",
+    "Time spent waiting for the SQLite write lock in BEGIN IMMEDIATE",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10),
+)
+LOCK_SWEEPS = Counter(
+    "skystore_lock_sweeps_total", "Finished rm_lock_on_timeout passes"
+)
+LOCK_SWEEP_DURATION = Histogram(
+    "skystore_lock_sweep_duration_seconds",
+    "Wall time of a rm_lock_on_timeout pass",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300),
+)
+LOCK_SWEEP_LOCKS_RELEASED = Counter(
+    "skystore_lock_sweep_locks_released_total",
+    "Physical locators whose lock was released after timing out",
+)
+LOCK_SWEEP_OBJECTS_FLIPPED = Counter(
+    "skystore_lock_sweep_objects_flipped_total",
+    "Pending logical objects set to ready by the sweep",
+)
+LOCK_SWEEP_BUCKETS_FLIPPED = Counter(
+    "skystore_lock_sweep_buckets_flipped_total",
+    "Pending logical buckets set to ready by the sweep",
+)
+
+
+class QueryStats:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+# SQL statements executed by the request being handled in the current task
+request_query_stats: ContextVar[Optional[QueryStats]] = ContextVar(
+    "request_query_stats", default=None
+)
+
+
+def instrument_engine(engine: Engine):
+    """Count and time every statement run on `engine` (the `sync_engine` of an async engine)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        DB_QUERIES.inc()
+        DB_QUERY_TIME.inc(elapsed)
+        stats = request_query_stats.get()
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += elapsed
+
+
+def record_lock_sweep(stats):
+    """Export a finished `LockSweepStats`."""
+    LOCK_SWEEPS.inc()
+    LOCK_SWEEP_DURATION.observe(stats.wall_time)
+    LOCK_SWEEP_LOCKS_RELEASED.inc(stats.locks_released)
+    LOCK_SWEEP_OBJECTS_FLIPPED.inc(stats.objects_flipped)
+    LOCK_SWEEP_BUCKETS_FLIPPED.inc(stats.buckets_flipped)
+
+
+def route_template(scope: Scope) -> str:
+    """Label requests by route path rather than raw URL to keep the label set bounded."""
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Record per-route request metrics.
+
+    A plain ASGI middleware rather than `BaseHTTPMiddleware`, so that the latency covers
+    streamed response bodies and the route runs in the task that owns `request_query_stats`.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route, method = route_template(scope), scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = QueryStats()
+        token = request_query_stats.set(stats)
+        in_flight = REQUESTS_IN_FLIGHT.labels(route, method)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_LATENCY.labels(route, method).observe(time.perf_counter() - start)
+            in_flight.dec()
+            request_query_stats.reset(token)
+            REQUESTS.labels(route, method, str(status_code)).inc()
+            DB_QUERIES_PER_REQUEST.labels(route).observe(stats.count)
+            DB_TIME_PER_REQUEST.labels(route).observe(stats.seconds)
@@ -0,0 +1,110 @@
+import os
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert, select
+from operations.schemas.object_schemas import (
+    DBLogicalMultipartUploadPart,
+    DBLogicalObject,
+    DBMultipartAbort,
+    DBPhysicalMultipartUploadPart,
+    DBPhysicalObjectLocator,
+    MultipartReaperStats,
+    Status,
+)
+from operations.utils.db import async_session, begin_write, logger
+
+# Multipart uploads still pending this long after they were started are aborted, including
+# slow ones that are still running, so set it well above the longest expected upload. 0 (the
+# default) disables the reaper.
+MULTIPART_ABORT_AFTER_HOURS = float(os.environ.get("MULTIPART_ABORT_AFTER_HOURS", "0"))
+MULTIPART_REAPER_BATCH_SIZE = int(os.environ.get("MULTIPART_REAPER_BATCH_SIZE", "500"))
+
+
+def stale_uploads(cutoff: datetime):
+    return (
+        select(DBLogicalObject.id)
+        .where(DBLogicalObject.status == Status.pending)
+        .where(DBLogicalObject.multipart_upload_id.is_not(None))
+        # rows without a creation time are never taken for stale
+        .where(DBLogicalObject.created_ts < cutoff)
+    )
+
+
+async def reap_batch(cutoff: datetime, stats: MultipartReaperStats) -> int:
+    """Remove one batch of stale uploads with their parts and locators, and queue the aborts
+    of their physical multipart uploads, in one short transaction."""
+    async with async_session() as db:
+        await begin_write(db)
+        ids = (
+            await db.scalars(
+                stale_uploads(cutoff)
+                .order_by(DBLogicalObject.id)
+                .limit(MULTIPART_REAPER_BATCH_SIZE)
+                # uploads being completed right now are left to the next run
+                .with_for_update(of=DBLogicalObject, skip_locked=True)
+            )
+        ).all()
+        if not ids:
+            return 0
+
+        locators = (
+            await db.execute(
+                select(
+                    DBPhysicalObjectLocator.location_tag,
+                    DBPhysicalObjectLocator.cloud,
+                    DBPhysicalObjectLocator.region,
+                    DBPhysicalObjectLocator.bucket,
+                    DBPhysicalObjectLocator.key,
+                    DBPhysicalObjectLocator.multipart_upload_id,
+                ).where(DBPhysicalObjectLocator.logical_object_id.in_(ids))
+                # a locator gets its id once the proxy created the physical upload
+                .where(DBPhysicalObjectLocator.multipart_upload_id.is_not(None))
+            )
+        ).all()
+        if locators:
+            await db.execute(
+                insert(DBMultipartAbort),
+                [dict(locator._mapping) for locator in locators],
+            )
+
+        locator_ids = select(DBPhysicalObjectLocator.id).where(
+            DBPhysicalObjectLocator.logical_object_id.in_(ids)
+        )
+        physical_parts = await db.execute(
+            delete(DBPhysicalMultipartUploadPart).where(
+                DBPhysicalMultipartUploadPart.physical_object_locator_id.in_(
+                    locator_ids
+                )
+            )
+        )
+        logical_parts = await db.execute(
+            delete(DBLogicalMultipartUploadPart).where(
+                DBLogicalMultipartUploadPart.logical_object_id.in_(ids)
+            )
+        )
+        await db.execute(
+            delete(DBPhysicalObjectLocator).where(
+                DBPhysicalObjectLocator.logical_object_id.in_(ids)
+            )
+        )
+        await db.execute(delete(DBLogicalObject).where(DBLogicalObject.id.in_(ids)))
+        await db.commit()
+
+    stats.uploads_reaped += len(ids)
+    stats.parts_deleted += physical_parts.rowcount + logical_parts.rowcount
+    stats.aborts_queued += len(locators)
+    return len(ids)
+
+
+async def reap_stale_uploads(abort_after: timedelta) -> MultipartReaperStats:
+    start = time.perf_counter()
+    stats = MultipartReaperStats()
+
+    cutoff = datetime.utcnow() - abort_after
+    while await reap_batch(cutoff, stats) == MULTIPART_REAPER_BATCH_SIZE:
+        pass
+
+    stats.wall_time = time.perf_counter() - start
+    stats.finished_at = datetime.utcnow()
+    logger.info(f"reap_stale_uploads: {stats}")
+    return stats
@@ -0,0 +1,126 @@
+import asyncio
+import os
+from typing import List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from operations.schemas.object_schemas import (
+    DBLogicalMultipartUploadPart,
+    DBLogicalObject,
+    DBPhysicalMultipartUploadPart,
+    DBPhysicalObjectLocator,
+    PatchResult,
+    PatchUploadMultipartUploadPart,
+)
+from operations.utils.db import async_session, begin_write, logger, upsert
+
+# Clients upload the parts of a multipart upload in parallel and report each one with
+# /append_part. When set, the calls arriving within this many milliseconds are recorded in
+# one write transaction instead of queueing for the SQLite write lock one by one.
+APPEND_PART_COALESCE_MS = float(os.environ.get("APPEND_PART_COALESCE_MS", "0"))
+
+physical_part_upsert = upsert(
+    DBPhysicalMultipartUploadPart.__table__,
+    ["physical_object_locator_id", "part_number"],
+    ["etag", "size"],
+)
+logical_part_upsert = upsert(
+    DBLogicalMultipartUploadPart.__table__,
+    ["logical_object_id", "part_number"],
+    ["etag", "size"],
+)
+
+
+async def record_parts(
+    db: Session, parts: List[PatchUploadMultipartUploadPart]
+) -> List[PatchResult]:
+    """Record the parts of many append_part calls with one upsert per part table. Runs in
+    the caller's write transaction, returns one result per part."""
+    physical_locators = {
+        row.id: row
+        for row in await db.execute(
+            select(
+                DBPhysicalObjectLocator.id,
+                DBPhysicalObjectLocator.is_primary,
+                DBPhysicalObjectLocator.logical_object_id,
+            )
+            .join(DBPhysicalObjectLocator.logical_object)
+            .where(DBPhysicalObjectLocator.id.in_({part.id for part in parts}))
+            # serialized with complete_multipart, in a consistent order
+            .order_by(DBPhysicalObjectLocator.logical_object_id)
+            .with_for_update(of=DBLogicalObject)
+        )
+    }
+
+    results = []
+    # keyed by the conflict target: a statement may not update the same row twice, and the
+    # last report of a part wins as with consecutive append_part calls
+    physical_parts, logical_parts = {}, {}
+    for part in parts:
+        physical_locator = physical_locators.get(part.id)
+        if physical_locator is None:
+            logger.error(f"physical locator not found: {part}")
+            results.append(
+                PatchResult(id=part.id, status_code=404, content="Not Found")
+            )
+            continue
+
+        values = dict(part_number=part.part_number, etag=part.etag, size=part.size)
+        physical_parts[part.id, part.part_number] = dict(
+            physical_object_locator_id=part.id, **values
+        )
+        if physical_locator.is_primary:
+            logical_parts[physical_locator.logical_object_id, part.part_number] = dict(
+                logical_object_id=physical_locator.logical_object_id, **values
+            )
+        results.append(PatchResult(id=part.id, status_code=200))
+
+    if physical_parts:
+        await db.execute(physical_part_upsert, list(physical_parts.values()))
+    if logical_parts:
+        await db.execute(logical_part_upsert, list(logical_parts.values()))
+    return results
+
+
+class PartCoalescer:
+    """Groups the append_part calls arriving within `window` seconds into one transaction.
+
+    The first call of a window schedules the flush, every call waits for its own result.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._pending: List[Tuple[PatchUploadMultipartUploadPart, asyncio.Future]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def submit(self, part: PatchUploadMultipartUploadPart) -> PatchResult:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((part, future))
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_after_window())
+        return await future
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(self.window)
+        pending, self._pending = self._pending, []
+        self._flush_task = None
+
+        try:
+            async with async_session() as db:
+                await begin_write(db)
+                results = await record_parts(db, [part for part, _ in pending])
+                await db.commit()
+        except Exception as e:
+            logger.error(f"PartCoalescer: {e}")
+            results = [e] * len(pending)
+
+        for (_, future), result in zip(pending, results):
+            # the request may have been cancelled in the meantime
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+part_coalescer = PartCoalescer(APPEND_PART_COALESCE_MS / 1000)
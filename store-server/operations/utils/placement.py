@@ -0,0 +1,277 @@
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from operations.schemas.bucket_schemas import BucketMetadata
+from operations.schemas.object_schemas import DBObjectHotness, DBStatisticsRollup
+from operations.utils.hotness import log_weight
+
+# How much recorded traffic the engine looks at, and how long a computed view is reused.
+# Placement runs on every upload, so the aggregate query is amortized over many requests.
+PLACEMENT_LOOKBACK_MINUTES = int(os.environ.get("PLACEMENT_LOOKBACK_MINUTES", "60"))
+PLACEMENT_STATS_TTL = float(os.environ.get("PLACEMENT_STATS_TTL", "30"))
+# number of (bucket, prefix) read estimates kept between refreshes
+PLACEMENT_PREFIX_CACHE_SIZE = 10000
+# a replica has to pay for itself within this many months
+PLACEMENT_HORIZON_MONTHS = float(os.environ.get("PLACEMENT_HORIZON_MONTHS", "1"))
+# dollars a client is willing to pay to shave one second off one read
+PLACEMENT_LATENCY_VALUE = float(os.environ.get("PLACEMENT_LATENCY_VALUE", "0.0001"))
+
+# USD, per GB. Override with a JSON file of the same shape in PLACEMENT_COST_TABLE.
+DEFAULT_COST_TABLE = {
+    "storage_per_gb_month": {"aws": 0.023, "gcp": 0.020, "azure": 0.018},
+    "egress_per_gb": {"intra_cloud": 0.02, "inter_cloud": 0.09},
+}
+
+
+def load_cost_table() -> dict:
+    cost_table = {key: dict(value) for key, value in DEFAULT_COST_TABLE.items()}
+    path = os.environ.get("PLACEMENT_COST_TABLE")
+    if path:
+        with open(path) as f:
+            for key, value in json.load(f).items():
+                cost_table.setdefault(key, {}).update(value)
+    return cost_table
+
+
+@dataclass
+class RegionTraffic:
+    """Recorded traffic of the clients in one region."""
+
+    reads: int = 0
+    read_bytes: int = 0
+    writes: int = 0
+    write_bytes: int = 0
+    # mean read latency, by whether the region read from its own replica
+    local_read_latency: Optional[float] = None
+    remote_read_latency: Optional[float] = None
+
+
+@dataclass
+class Placement:
+    primary: str
+    regions: List[str] = field(default_factory=list)  # includes the primary
+
+
+class PlacementEngine(ABC):
+    """Chooses the regions a new object (or a warmed up one) is stored in.
+
+    Engines are registered under a policy name with `register_placement_engine` and are used
+    by `start_upload` and `start_warmup` when a request asks for that policy. The logical
+    object is made ready by its primary locator, like the `push` policy.
+    """
+
+    @abstractmethod
+    async def place(
+        self, db: Session, bucket: BucketMetadata, key: str, client_from_region: str
+    ) -> Optional[Placement]:
+        """Returns None when the bucket has no physical bucket to place the object in."""
+
+
+class CostAwarePlacement(PlacementEngine):
+    """Write to the client's region and replicate to every region whose expected reads save
+    more egress and latency than the replica costs to copy and store.
+
+    Every write is placed on its own, so a replica costs one copy and its storage per write.
+    The expected reads of an object from a region come from the access counters of the
+    objects under the same prefix (the key up to its last "/") in object_hotness. A prefix
+    without counters yet falls back to the region-level read/write ratio of the metrics, which
+    carry no object key. Object size and read latencies always come from the metrics.
+    """
+
+    def __init__(self, cost_table: Optional[dict] = None):
+        self.cost_table = cost_table or load_cost_table()
+        self._traffic: Dict[str, RegionTraffic] = {}
+        self._traffic_loaded_at = float("-inf")
+        # (bucket, prefix) -> (loaded at, reads per object by client region)
+        self._prefix_reads: Dict[Tuple[str, str], Tuple[float, Dict[str, float]]] = {}
+
+    def egress_cost(self, src: str, dst: str) -> float:
+        """Per GB cost of moving data between two location tags."""
+        if src == dst:
+            return 0.0
+        egress = self.cost_table["egress_per_gb"]
+        src_cloud, dst_cloud = src.split(":")[0], dst.split(":")[0]
+        pair_cost = egress.get(f"{src_cloud}:{dst_cloud}")
+        if pair_cost is not None:
+            return pair_cost
+        return egress["intra_cloud" if src_cloud == dst_cloud else "inter_cloud"]
+
+    def storage_cost(self, tag: str) -> float:
+        """Per GB-month cost of storing data at a location tag."""
+        storage = self.cost_table["storage_per_gb_month"]
+        return storage.get(tag, storage.get(tag.split(":")[0], 0.0))
+
+    async def traffic(self, db: Session) -> Dict[str, RegionTraffic]:
+        if time.monotonic() - self._traffic_loaded_at < PLACEMENT_STATS_TTL:
+            return self._traffic
+
+        since = datetime.utcnow() - timedelta(minutes=PLACEMENT_LOOKBACK_MINUTES)
+        rows = await db.execute(
+            select(
+                DBStatisticsRollup.client_region,
+                DBStatisticsRollup.requested_region,
+                DBStatisticsRollup.operation,
+                func.sum(DBStatisticsRollup.count).label("count"),
+                func.sum(DBStatisticsRollup.latency_sum).label("latency_sum"),
+                func.sum(DBStatisticsRollup.object_size_sum).label("object_size_sum"),
+            )
+            .where(DBStatisticsRollup.minute >= since)
+            .group_by(
+                DBStatisticsRollup.client_region,
+                DBStatisticsRollup.requested_region,
+                DBStatisticsRollup.operation,
+            )
+        )
+
+        traffic: Dict[str, RegionTraffic] = {}
+        latency = {}  # (client region, is local) -> [count, latency sum]
+        for row in rows:
+            region = traffic.setdefault(row.client_region, RegionTraffic())
+            if row.operation == "write":
+                region.writes += row.count
+                region.write_bytes += row.object_size_sum
+                continue
+            region.reads += row.count
+            region.read_bytes += row.object_size_sum
+            # the proxy reports the requested region either as a tag or as a bare region
+            is_local = row.requested_region in (
+                row.client_region,
+                row.client_region.split(":")[-1],
+            )
+            entry = latency.setdefault((row.client_region, is_local), [0, 0.0])
+            entry[0] += row.count
+            entry[1] += row.latency_sum
+        for (client_region, is_local), (count, latency_sum) in latency.items():
+            if is_local:
+                traffic[client_region].local_read_latency = latency_sum / count
+            else:
+                traffic[client_region].remote_read_latency = latency_sum / count
+
+        self._traffic, self._traffic_loaded_at = traffic, time.monotonic()
+        return traffic
+
+    async def prefix_reads(
+        self, db: Session, bucket: str, key: str
+    ) -> Optional[Dict[str, float]]:
+        """Decayed reads per object of the objects under the prefix of `key`, by client
+        region, or None if none of them has been read yet."""
+        prefix = key[: key.rfind("/") + 1]
+        cached = self._prefix_reads.get((bucket, prefix))
+        if cached is not None and time.monotonic() - cached[0] < PLACEMENT_STATS_TTL:
+            return cached[1] or None
+
+        under_prefix = (
+            (DBObjectHotness.bucket == bucket)
+            & (DBObjectHotness.key >= prefix)
+            & DBObjectHotness.key.startswith(prefix)
+        )
+        num_objects = (
+            select(func.count(func.distinct(DBObjectHotness.key)))
+            .where(under_prefix)
+            .scalar_subquery()
+        )
+        rows = await db.execute(
+            select(
+                DBObjectHotness.client_region,
+                func.sum(
+                    func.exp(DBObjectHotness.log_score - log_weight(datetime.utcnow()))
+                ).label("reads"),
+                num_objects.label("num_objects"),
+            )
+            .where(under_prefix)
+            .group_by(DBObjectHotness.client_region)
+        )
+        reads = {row.client_region: row.reads / row.num_objects for row in rows}
+
+        if len(self._prefix_reads) >= PLACEMENT_PREFIX_CACHE_SIZE:
+            self._prefix_reads.clear()
+        self._prefix_reads[bucket, prefix] = (time.monotonic(), reads)
+        return reads or None
+
+    def replica_value(
+        self,
+        src: str,
+        dst: str,
+        traffic: Dict[str, RegionTraffic],
+        prefix_reads: Optional[Dict[str, float]] = None,
+    ) -> float:
+        """Expected dollars saved minus spent, per object, by replicating from src to dst."""
+        region = traffic.get(dst)
+        total_writes = sum(t.writes for t in traffic.values())
+        total_write_bytes = sum(t.write_bytes for t in traffic.values())
+        if prefix_reads is not None:
+            reads_per_object = prefix_reads.get(dst, 0.0)
+        elif region is not None:
+            reads_per_object = region.reads / max(total_writes, 1)
+        else:
+            reads_per_object = 0.0
+        if reads_per_object == 0:
+            return float("-inf")
+
+        if total_writes:
+            object_gb = total_write_bytes / total_writes / 1e9
+        elif region is not None and region.reads:
+            object_gb = region.read_bytes / region.reads / 1e9
+        else:
+            # nothing to size the object by
+            return float("-inf")
+
+        saved = reads_per_object * object_gb * self.egress_cost(src, dst)
+        if (
+            region is not None
+            and region.remote_read_latency is not None
+            and region.local_read_latency is not None
+        ):
+            latency_saved = max(
+                region.remote_read_latency - region.local_read_latency, 0.0
+            )
+            saved += reads_per_object * latency_saved * PLACEMENT_LATENCY_VALUE
+        cost = object_gb * (
+            self.storage_cost(dst) * PLACEMENT_HORIZON_MONTHS
+            + self.egress_cost(src, dst)
+        )
+        return saved - cost
+
+    async def place(
+        self, db: Session, bucket: BucketMetadata, key: str, client_from_region: str
+    ) -> Optional[Placement]:
+        locators = bucket.physical_bucket_locators
+        if not locators:
+            return None
+        if client_from_region in locators:
+            primary = client_from_region
+        else:
+            primary = next(
+                (tag for tag, loc in locators.items() if loc.is_primary),
+                next(iter(locators)),
+            )
+
+        traffic = await self.traffic(db)
+        prefix_reads = await self.prefix_reads(db, bucket.bucket, key)
+        regions = [primary] + [
+            tag
+            for tag in locators
+            if tag != primary
+            and self.replica_value(primary, tag, traffic, prefix_reads) > 0
+        ]
+        return Placement(primary=primary, regions=regions)
+
+
+placement_engines: Dict[str, PlacementEngine] = {}
+
+
+def register_placement_engine(policy: str, engine: PlacementEngine):
+    placement_engines[policy] = engine
+
+
+def get_placement_engine(policy: Optional[str]) -> Optional[PlacementEngine]:
+    return placement_engines.get(policy)
+
+
+register_placement_engine("adaptive", CostAwarePlacement())
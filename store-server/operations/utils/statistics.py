@@ -0,0 +1,189 @@
+import asyncio
+import math
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+from operations.schemas.object_schemas import DBStatisticsObject, DBStatisticsRollup
+from operations.utils.db import async_session, begin_write, logger
+
+# Proxies report one metric per request, so writes are buffered in process and flushed in
+# bulk: one transaction inserts the raw rows and folds them into the per-minute rollups.
+STATISTICS_FLUSH_INTERVAL_MS = int(
+    os.environ.get("STATISTICS_FLUSH_INTERVAL_MS", "1000")
+)
+# flush inline once this many metrics are waiting, bounding the memory of the buffer
+STATISTICS_BUFFER_MAX_ROWS = int(os.environ.get("STATISTICS_BUFFER_MAX_ROWS", "10000"))
+# raw rows older than this are deleted, the rollups are kept
+STATISTICS_RAW_RETENTION_HOURS = float(
+    os.environ.get("STATISTICS_RAW_RETENTION_HOURS", "24")
+)
+STATISTICS_RETENTION_BATCH_SIZE = 10000
+
+
+class LatencySketch:
+    """Log-bucketed latency histogram.
+
+    Bucket i counts the latencies in (GAMMA^(i-1), GAMMA^i], so any quantile is off by at most
+    RELATIVE_ERROR and two sketches merge by adding their counts.
+    """
+
+    RELATIVE_ERROR = 0.01
+    GAMMA = (1 + RELATIVE_ERROR) / (1 - RELATIVE_ERROR)
+    # latencies below this (including zero) share the lowest bucket
+    MIN_LATENCY = 1e-6
+
+    def __init__(self, buckets: Optional[Dict[str, int]] = None):
+        # JSON object keys are strings
+        self.buckets = {int(index): count for index, count in (buckets or {}).items()}
+
+    def add(self, latency: float, count: int = 1):
+        index = math.ceil(math.log(max(latency, self.MIN_LATENCY), self.GAMMA))
+        self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def merge(self, other: "LatencySketch"):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def quantile(self, q: float) -> float:
+        total = sum(self.buckets.values())
+        if total == 0:
+            return 0.0
+        # nearest rank
+        rank = max(math.ceil(q * total), 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                break
+        # the midpoint of the bucket in relative terms
+        return 2 * self.GAMMA**index / (self.GAMMA + 1)
+
+    def to_json(self) -> Dict[str, int]:
+        return {str(index): count for index, count in self.buckets.items()}
+
+
+def minute_of(timestamp: datetime) -> datetime:
+    return timestamp.replace(second=0, microsecond=0)
+
+
+async def merge_rollups(db: Session, rows: List[dict]):
+    """Fold raw metric rows into the per-(client region, requested region, operation, minute)
+    aggregates. Must run inside the write transaction that inserts the rows."""
+    groups = {}
+    for row in rows:
+        group_key = (
+            row["client_region"],
+            row["requested_region"],
+            row["operation"],
+            minute_of(row["timestamp"]),
+        )
+        group = groups.get(group_key)
+        if group is None:
+            group = groups[group_key] = [0, 0.0, 0, LatencySketch()]
+        group[0] += 1
+        group[1] += row["latency"]
+        group[2] += row["object_size"]
+        group[3].add(row["latency"])
+
+    # superset of the touched rollups, narrowed down in Python below
+    existing = (
+        await db.scalars(
+            select(DBStatisticsRollup)
+            .where(
+                DBStatisticsRollup.client_region.in_({key[0] for key in groups}),
+                DBStatisticsRollup.minute.in_({key[3] for key in groups}),
+            )
+            .with_for_update()
+        )
+    ).all()
+    rollups = {
+        (r.client_region, r.requested_region, r.operation, r.minute): r
+        for r in existing
+    }
+
+    for group_key, (count, latency_sum, object_size_sum, sketch) in groups.items():
+        rollup = rollups.get(group_key)
+        if rollup is None:
+            client_region, requested_region, operation, minute = group_key
+            db.add(
+                DBStatisticsRollup(
+                    client_region=client_region,
+                    requested_region=requested_region,
+                    operation=operation,
+                    minute=minute,
+                    count=count,
+                    latency_sum=latency_sum,
+                    object_size_sum=object_size_sum,
+                    latency_sketch=sketch.to_json(),
+                )
+            )
+        else:
+            rollup.count += count
+            rollup.latency_sum += latency_sum
+            rollup.object_size_sum += object_size_sum
+            sketch.merge(LatencySketch(rollup.latency_sketch))
+            # assign a new object, in-place changes of a JSON column are not tracked
+            rollup.latency_sketch = sketch.to_json()
+
+
+class StatisticsBuffer:
+    def __init__(self):
+        self._rows: List[dict] = []
+        self._lock = asyncio.Lock()
+
+    def add(self, row: dict) -> bool:
+        """Queue a raw metric row, return whether the buffer is full and should be flushed."""
+        return self.extend([row])
+
+    def extend(self, rows: List[dict]) -> bool:
+        self._rows.extend(rows)
+        return len(self._rows) >= STATISTICS_BUFFER_MAX_ROWS
+
+    async def flush(self) -> int:
+        """Write the queued rows and their rollups in one transaction, return the row count."""
+        async with self._lock:
+            rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+            try:
+                async with async_session() as db:
+                    await begin_write(db)
+                    await db.execute(insert(DBStatisticsObject), rows)
+                    await merge_rollups(db, rows)
+                    await db.commit()
+            except Exception:
+                # retry with the next flush, dropping the oldest rows past the buffer size
+                self._rows = (rows + self._rows)[-STATISTICS_BUFFER_MAX_ROWS:]
+                raise
+            return len(rows)
+
+
+statistics_buffer = StatisticsBuffer()
+
+
+async def expire_raw_statistics(retention_hours: float) -> int:
+    """Delete raw metrics older than the retention window in short batches."""
+    cutoff = datetime.utcnow() - timedelta(hours=retention_hours)
+    deleted = 0
+    while True:
+        async with async_session() as db:
+            await begin_write(db)
+            expired_ids = (
+                select(DBStatisticsObject.id)
+                .where(DBStatisticsObject.timestamp < cutoff)
+                .limit(STATISTICS_RETENTION_BATCH_SIZE)
+            )
+            result = await db.execute(
+                delete(DBStatisticsObject).where(
+                    DBStatisticsObject.id.in_(expired_ids.scalar_subquery())
+                )
+            )
+            await db.commit()
+        deleted += result.rowcount
+        if result.rowcount < STATISTICS_RETENTION_BATCH_SIZE:
+            break
+
+    logger.info(f"expire_raw_statistics: deleted {deleted} rows before {cutoff}")
+    return deleted
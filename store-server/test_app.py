@@ -1,6 +1,39 @@
+import asyncio
+import hashlib
 import pytest
+from datetime import datetime, timedelta
 from starlette.testclient import TestClient
-from app import app, rm_lock_on_timeout
+from app import app, rm_lock_on_timeout, sweep_locks
+from operations.object_operations import (
+    locate_stmt,
+    locator_preference,
+    start_warmup,
+    start_warmup_batch,
+)
+from operations.utils.eviction import evict_replicas
+from operations.utils.hotness import flush_hotness, record_hit
+from operations.utils.multipart_reaper import reap_stale_uploads
+from operations.utils.parts import PartCoalescer
+from operations.utils.placement import PlacementEngine
+from operations.schemas.bucket_schemas import DBLogicalBucket
+from operations.schemas.object_schemas import (
+    DBLogicalObject,
+    DBPhysicalObjectLocator,
+    PatchUploadMultipartUploadPart,
+    StartWarmupBatchRequest,
+    StartWarmupRequest,
+    Status,
+)
+from operations.utils.conf import Base
+from operations.utils.db import (
+    add_missing_columns,
+    async_session,
+    create_missing_indexes,
+    engine as server_engine,
+)
+from sqlalchemy import create_engine, event, insert, select, text, update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
 import subprocess as sp
 
 
@@ -98,6 +131,118 @@ def test_delete_object(client):
     assert resp.json() == []
 
 
+def test_delete_objects_batch(client, monkeypatch):
+    """Test that `start_delete_objects` deletes many keys at once, and none if one is missing."""
+    # spread the keys and the locators over several IN lists
+    monkeypatch.setattr("operations.utils.db.IN_CHUNK_SIZE", 7)
+
+    resp = client.post(
+        "/start_create_bucket",
+        json={
+            "bucket": "my-delete-objects-batch-bucket",
+            "client_from_region": "aws:us-west-1",
+            "warmup_regions": ["gcp:us-west1"],
+        },
+    )
+    resp.raise_for_status()
+
+    for physical_bucket in resp.json()["locators"]:
+        client.patch(
+            "/complete_create_bucket",
+            json={
+                "id": physical_bucket["id"],
+                "creation_date": "2020-01-01T00:00:00",
+            },
+        ).raise_for_status()
+
+    keys = [f"key-{i}" for i in range(20)]
+    for key in keys:
+        resp = client.post(
+            "/start_upload",
+            json={
+                "bucket": "my-delete-objects-batch-bucket",
+                "key": key,
+                "client_from_region": "aws:us-west-1",
+                "is_multipart": False,
+                "policy": "push",
+            },
+        )
+        resp.raise_for_status()
+        client.patch(
+            "/complete_upload_batch",
+            json={
+                "completions": [
+                    {
+                        "id": physical_object["id"],
+                        "size": 100,
+                        "etag": "123",
+                        "last_modified": "2020-01-01T00:00:00",
+                    }
+                    for physical_object in resp.json()["locators"]
+                ]
+            },
+        ).raise_for_status()
+
+    # a missing key fails the whole request without deleting anything
+    resp = client.post(
+        "/start_delete_objects",
+        json={
+            "bucket": "my-delete-objects-batch-bucket",
+            "object_identifiers": {key: [] for key in keys + ["missing-key"]},
+        },
+    )
+    assert resp.status_code == 404
+    resp = client.post(
+        "/list_objects", json={"bucket": "my-delete-objects-batch-bucket"}
+    )
+    assert len(resp.json()) == 20
+
+    resp = client.post(
+        "/start_delete_objects",
+        json={
+            "bucket": "my-delete-objects-batch-bucket",
+            "object_identifiers": {key: [] for key in keys},
+        },
+    )
+    resp.raise_for_status()
+    assert resp.json()["op_type"] == {key: "delete" for key in keys}
+    assert all(len(resp.json()["locators"][key]) == 2 for key in keys)
+    assert not any(
+        marker["delete_marker"] for marker in resp.json()["delete_markers"].values()
+    )
+
+    ids = [
+        physical_object["id"]
+        for physical_objects in resp.json()["locators"].values()
+        for physical_object in physical_objects
+    ]
+    # keys whose deletion is in progress are no longer found
+    resp = client.post(
+        "/start_delete_objects",
+        json={
+            "bucket": "my-delete-objects-batch-bucket",
+            "object_identifiers": {key: [] for key in keys},
+        },
+    )
+    assert resp.status_code == 404
+
+    # failures are reported per id and do not stop the rest of the batch
+    resp = client.patch(
+        "/complete_delete_objects",
+        json={
+            "ids": [-1] + ids + [ids[0]],
+            "op_type": ["delete"] * (len(ids) + 1) + ["unknown"],
+        },
+    )
+    resp.raise_for_status()
+    status_codes = [result["status_code"] for result in resp.json()["results"]]
+    assert status_codes == [404] + [200] * len(ids) + [400]
+    resp = client.post(
+        "/list_objects", json={"bucket": "my-delete-objects-batch-bucket"}
+    )
+    assert resp.json() == []
+
+
 def test_create_bucket(client):
     """Test that the `create_bucket` endpoint works."""
     resp = client.post(
@@ -332,6 +477,90 @@ def test_delete_bucket(client):
     )
 
 
+def test_bucket_changes_visible_immediately(client, monkeypatch):
+    # only invalidation, never expiry, may make the changes below visible
+    monkeypatch.setattr("operations.utils.bucket_cache.BUCKET_CACHE_TTL", 3600)
+
+    def locate_version():
+        return client.post(
+            "/locate_object",
+            json={
+                "bucket": "my-cached-bucket",
+                "key": "my-key",
+                "client_from_region": "aws:us-west-1",
+                "version_id": 1,
+            },
+        )
+
+    def start_upload():
+        return client.post(
+            "/start_upload",
+            json={
+                "bucket": "my-cached-bucket",
+                "key": "my-key",
+                "client_from_region": "aws:us-west-1",
+                "is_multipart": False,
+                "policy": "push",
+            },
+        )
+
+    resp = client.post(
+        "/start_create_bucket",
+        json={"bucket": "my-cached-bucket", "client_from_region": "aws:us-west-1"},
+    )
+    resp.raise_for_status()
+    physical_buckets = resp.json()["locators"]
+    for physical_bucket in physical_buckets:
+        client.patch(
+            "/complete_create_bucket",
+            json={"id": physical_bucket["id"], "creation_date": "2020-01-01T00:00:00"},
+        ).raise_for_status()
+    assert locate_version().status_code == 400
+
+    client.post(
+        "/put_bucket_versioning",
+        json={"bucket": "my-cached-bucket", "versioning": True},
+    ).raise_for_status()
+    resp = locate_version()
+    assert resp.status_code == 404
+    assert resp.text == "Object Not Found"
+
+    client.post(
+        "/start_delete_bucket", json={"bucket": "my-cached-bucket"}
+    ).raise_for_status()
+    for physical_bucket in physical_buckets:
+        client.patch(
+            "/complete_delete_bucket", json={"id": physical_bucket["id"]}
+        ).raise_for_status()
+    resp = start_upload()
+    assert resp.status_code == 404
+    assert resp.text == "Bucket Not Found"
+    assert locate_version().text == "Bucket Not Found"
+
+    client.post(
+        "/register_buckets",
+        json={
+            "bucket": "my-cached-bucket",
+            "config": {
+                "physical_locations": [
+                    {
+                        "name": "aws:eu-west-1",
+                        "cloud": "aws",
+                        "region": "eu-west-1",
+                        "bucket": "my-registered-bucket",
+                        "is_primary": True,
+                        "need_warmup": False,
+                    },
+                ]
+            },
+        },
+    ).raise_for_status()
+    resp = start_upload()
+    resp.raise_for_status()
+    assert [locator["tag"] for locator in resp.json()["locators"]] == ["aws:eu-west-1"]
+    assert locate_version().status_code == 400
+
+
 def test_get_object(client):
     """Test that the `get_object` endpoint returns the correct object."""
 
@@ -440,6 +669,241 @@ def test_get_object(client):
     assert location in {"us-west-1", "us-west1"}
 
 
+def test_locate_object_single_statement(client):
+    resp = client.post(
+        "/start_create_bucket",
+        json={
+            "bucket": "my-locate-bucket",
+            "client_from_region": "aws:us-west-1",
+            "warmup_regions": ["gcp:us-west1"],
+        },
+    )
+    resp.raise_for_status()
+    for physical_bucket in resp.json()["locators"]:
+        client.patch(
+            "/complete_create_bucket",
+            json={"id": physical_bucket["id"], "creation_date": "2020-01-01T00:00:00"},
+        ).raise_for_status()
+
+    resp = client.post(
+        "/start_upload",
+        json={
+            "bucket": "my-locate-bucket",
+            "key": "my-key",
+            "client_from_region": "aws:us-west-1",
+            "is_multipart": False,
+            "policy": "push",
+        },
+    )
+    resp.raise_for_status()
+    locators = {locator["tag"]: locator for locator in resp.json()["locators"]}
+    assert set(locators) == {"aws:us-west-1", "gcp:us-west1"}
+
+    def complete(tag):
+        client.patch(
+            "/complete_upload",
+            json={
+                "id": locators[tag]["id"],
+                "size": 100,
+                "etag": "123",
+                "last_modified": "2020-01-01T00:00:00",
+            },
+        ).raise_for_status()
+
+    statements = []
+
+    def count_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    def locate():
+        statements.clear()
+        event.listen(
+            server_engine.sync_engine, "before_cursor_execute", count_statement
+        )
+        try:
+            resp = client.post(
+                "/locate_object",
+                json={
+                    "bucket": "my-locate-bucket",
+                    "key": "my-key",
+                    "client_from_region": "gcp:us-west1",
+                },
+            )
+        finally:
+            event.remove(
+                server_engine.sync_engine, "before_cursor_execute", count_statement
+            )
+        resp.raise_for_status()
+        return resp.json()
+
+    # the replica in the client's region is still being written, so the primary is read
+    complete("aws:us-west-1")
+    assert locate()["tag"] == "aws:us-west-1"
+    assert len(statements) == 1
+
+    complete("gcp:us-west1")
+    assert locate()["tag"] == "gcp:us-west1"
+    assert len(statements) == 1
+
+
+def test_locate_objects_batch(client):
+    """Test that the `locate_objects_batch` endpoint locates many keys at once."""
+
+    resp = client.post(
+        "/start_create_bucket",
+        json={
+            "bucket": "my-batch-get-bucket",
+            "client_from_region": "aws:us-west-1",
+            "warmup_regions": ["gcp:us-west1"],
+        },
+    )
+    resp.raise_for_status()
+
+    for physical_bucket in resp.json()["locators"]:
+        client.patch(
+            "/complete_create_bucket",
+            json={
+                "id": physical_bucket["id"],
+                "creation_date": "2020-01-01T00:00:00",
+            },
+        ).raise_for_status()
+
+    for key in ["key-1", "key-2"]:
+        resp = client.post(
+            "/start_upload",
+            json={
+                "bucket": "my-batch-get-bucket",
+                "key": key,
+                "client_from_region": "aws:us-west-1",
+                "is_multipart": False,
+                "policy": "push",
+            },
+        )
+        resp.raise_for_status()
+
+        for physical_object in resp.json()["locators"]:
+            client.patch(
+                "/complete_upload",
+                json={
+                    "id": physical_object["id"],
+                    "size": 100,
+                    "etag": key,
+                    "last_modified": "2020-01-01T00:00:00",
+                },
+            ).raise_for_status()
+
+    resp = client.post(
+        "/locate_objects_batch",
+        json={
+            "bucket": "my-batch-get-bucket",
+            "client_from_region": "gcp:us-west1",
+            "objects": [{"key": "key-1"}, {"key": "missing"}, {"key": "key-2"}],
+        },
+    )
+    resp.raise_for_status()
+    results = resp.json()["results"]
+    assert [result["key"] for result in results] == ["key-1", "missing", "key-2"]
+    assert [result["status_code"] for result in results] == [200, 404, 200]
+    assert results[1]["locator"] is None
+    for result in [results[0], results[2]]:
+        assert result["locator"]["tag"] == "gcp:us-west1"
+        assert result["locator"]["etag"] == result["key"]
+
+    # same answer as the single-key route, including the primary fallback
+    single = client.post(
+        "/locate_object",
+        json={
+            "bucket": "my-batch-get-bucket",
+            "key": "key-2",
+            "client_from_region": "aws:eu-west-1",
+        },
+    ).json()
+    resp = client.post(
+        "/locate_objects_batch",
+        json={
+            "bucket": "my-batch-get-bucket",
+            "client_from_region": "aws:eu-west-1",
+            "objects": [{"key": "key-2"}],
+        },
+    )
+    resp.raise_for_status()
+    assert resp.json()["results"][0]["locator"] == single
+    assert single["tag"] == "aws:us-west-1"
+
+
+def test_complete_upload_batch(client, monkeypatch):
+    """Test that `complete_upload_batch` completes all physical locators of an upload at once."""
+    # every lookup and update is split into chunks
+    monkeypatch.setattr("operations.utils.db.IN_CHUNK_SIZE", 1)
+
+    resp = client.post(
+        "/start_create_bucket",
+        json={
+            "bucket": "my-batch-complete-bucket",
+            "client_from_region": "aws:us-west-1",
+            "warmup_regions": ["gcp:us-west1"],
+        },
+    )
+    resp.raise_for_status()
+
+    for physical_bucket in resp.json()["locators"]:
+        client.patch(
+            "/complete_create_bucket",
+            json={
+                "id": physical_bucket["id"],
+                "creation_date": "2020-01-01T00:00:00",
+            },
+        ).raise_for_status()
+
+    resp = client.post(
+        "/start_upload",
+        json={
+            "bucket": "my-batch-complete-bucket",
+            "key": "my-key",
+            "client_from_region": "aws:us-west-1",
+            "is_multipart": False,
+            "policy": "push",
+        },
+    )
+    resp.raise_for_status()
+    ids = [physical_object["id"] for physical_object in resp.json()["locators"]]
+    assert len(ids) == 2
+
+    resp = client.patch(
+        "/complete_upload_batch",
+        json={
+            "completions": [
+                {
+                    "id": id,
+                    "size": 100,
+                    "etag": "123",
+                    "last_modified": "2020-01-01T00:00:00",
+                }
+                for id in ids + [-1]
+            ]
+        },
+    )
+    resp.raise_for_status()
+    assert [result["status_code"] for result in resp.json()["results"]] == [
+        200,
+        200,
+        404,
+    ]
+
+    for region in ["aws:us-west-1", "gcp:us-west1"]:
+        resp = client.post(
+            "/locate_object",
+            json={
+                "bucket": "my-batch-complete-bucket",
+                "key": "my-key",
+                "client_from_region": region,
+            },
+        )
+        resp.raise_for_status()
+        assert resp.json()["tag"] == region
+        assert resp.json()["size"] == 100
+
+
 def test_get_object_pull_logic(client):
     """Test that the `get_object` endpoint works using write_local logic."""
 
@@ -588,100 +1052,600 @@ def test_warmup(client):
     assert resp.json()["region"] == "us-west-1"
 
 
-def test_write_back(client):
+@pytest.mark.asyncio
+async def test_adaptive_placement(client):
     resp = client.post(
         "/start_create_bucket",
-        json={"bucket": "my-writeback-bucket", "client_from_region": "aws:us-east-2"},
+        json={"bucket": "my-adaptive-bucket", "client_from_region": "aws:us-west-1"},
     )
     resp.raise_for_status()
-
-    # patch
     for physical_bucket in resp.json()["locators"]:
-        resp = client.patch(
+        client.patch(
             "/complete_create_bucket",
             json={
                 "id": physical_bucket["id"],
                 "creation_date": "2020-01-01T00:00:00",
             },
-        )
-        resp.raise_for_status()
+        ).raise_for_status()
+
+    # 1GB objects written in aws:us-west-1 are read 20 times each from aws:eu-central-1
+    now = datetime.utcnow().isoformat()
+    metric = {
+        "requested_region": "us-west-1",
+        "latency": 2.0,
+        "timestamp": now,
+        "object_size": 1_000_000_000,
+    }
+    resp = client.post(
+        "/record_metrics_batch",
+        json={
+            "metrics": [
+                dict(metric, client_region="aws:us-west-1", operation="write"),
+            ]
+            + [dict(metric, client_region="aws:eu-central-1", operation="read")] * 20
+        },
+    )
+    resp.raise_for_status()
 
     resp = client.post(
         "/start_upload",
         json={
-            "bucket": "my-writeback-bucket",
-            "key": "my-key-write-back",
-            "client_from_region": "aws:us-east-2",
+            "bucket": "my-adaptive-bucket",
+            "key": "my-key",
+            "client_from_region": "aws:us-west-1",
             "is_multipart": False,
-            "policy": "push",
+            "policy": "adaptive",
         },
     )
-    for locator in resp.json()["locators"]:
-        client.patch(
-            "/complete_upload",
+    resp.raise_for_status()
+    locators = resp.json()["locators"]
+    assert {locator["tag"] for locator in locators} == {
+        "aws:us-west-1",
+        "aws:eu-central-1",
+    }
+
+    # the object is ready once the primary in the writer's region completes
+    primary = next(loc for loc in locators if loc["tag"] == "aws:us-west-1")
+    client.patch(
+        "/complete_upload",
+        json={
+            "id": primary["id"],
+            "size": 100,
+            "etag": "123",
+            "last_modified": "2020-01-01T00:00:00.000Z",
+            "policy": "adaptive",
+        },
+    ).raise_for_status()
+    resp = client.post(
+        "/head_object",
+        json={"bucket": "my-adaptive-bucket", "key": "my-key"},
+    )
+    resp.raise_for_status()
+
+    # every region the engine wants already holds the object
+    resp = client.post(
+        "/start_warmup",
+        json={
+            "bucket": "my-adaptive-bucket",
+            "key": "my-key",
+            "client_from_region": "aws:us-west-1",
+            "policy": "adaptive",
+        },
+    )
+    resp.raise_for_status()
+    assert resp.json()["src_locator"]["tag"] == "aws:us-west-1"
+    assert resp.json()["dst_locators"] == []
+
+    # once objects under a prefix have been read, their reads decide instead of the region
+    # level traffic
+    for _ in range(20):
+        record_hit("my-adaptive-bucket", "hot/1", "aws:eu-central-1")
+    record_hit("my-adaptive-bucket", "cold/1", "aws:us-west-1")
+    await flush_hotness()
+    for key, tags in [
+        ("hot/2", {"aws:us-west-1", "aws:eu-central-1"}),
+        ("cold/2", {"aws:us-west-1"}),
+    ]:
+        resp = client.post(
+            "/start_upload",
             json={
-                "id": locator["id"],
-                "size": 100,
-                "etag": "123",
-                "last_modified": "2020-01-01T00:00:00.000Z",
+                "bucket": "my-adaptive-bucket",
+                "key": key,
+                "client_from_region": "aws:us-west-1",
+                "is_multipart": False,
+                "policy": "adaptive",
+            },
+        )
+        resp.raise_for_status()
+        assert {locator["tag"] for locator in resp.json()["locators"]} == tags
+
+
+@pytest.mark.asyncio
+async def test_adaptive_placement_without_physical_buckets(client):
+    with pytest.raises(TypeError):
+        PlacementEngine()
+
+    # a logical bucket whose physical buckets are not created yet
+    async with async_session() as db:
+        db.add(
+            DBLogicalBucket(
+                bucket="my-adaptive-empty-bucket",
+                prefix="",
+                status=Status.pending,
+                creation_date=datetime.utcnow(),
+            )
+        )
+        await db.commit()
+
+    resp = client.post(
+        "/start_upload",
+        json={
+            "bucket": "my-adaptive-empty-bucket",
+            "key": "my-key",
+            "client_from_region": "aws:us-west-1",
+            "is_multipart": False,
+            "policy": "adaptive",
+        },
+    )
+    assert resp.status_code == 409
+
+
+@pytest.mark.asyncio
+async def test_replica_eviction(client, monkeypatch):
+    resp = client.post(
+        "/start_create_bucket",
+        json={"bucket": "my-evict-bucket", "client_from_region": "aws:us-west-1"},
+    )
+    resp.raise_for_status()
+    for physical_bucket in resp.json()["locators"]:
+        client.patch(
+            "/complete_create_bucket",
+            json={
+                "id": physical_bucket["id"],
+                "creation_date": "2020-01-01T00:00:00",
             },
         ).raise_for_status()
 
-    # we should be able to get it from us-east-2 (Pull-based Policy)
+    # a primary in aws:us-west-1 and a replica in aws:eu-north-1 for each key
+    for key in ["my-key-1", "my-key-2"]:
+        resp = client.post(
+            "/start_upload",
+            json={
+                "bucket": "my-evict-bucket",
+                "key": key,
+                "client_from_region": "aws:us-west-1",
+                "is_multipart": False,
+            },
+        )
+        resp.raise_for_status()
+        for locator in resp.json()["locators"]:
+            client.patch(
+                "/complete_upload",
+                json={
+                    "id": locator["id"],
+                    "size": 100,
+                    "etag": "123",
+                    "last_modified": "2020-01-01T00:00:00.000Z",
+                },
+            ).raise_for_status()
+        resp = client.post(
+            "/start_warmup",
+            json={
+                "bucket": "my-evict-bucket",
+                "key": key,
+                "client_from_region": "aws:us-west-1",
+                "warmup_regions": ["aws:eu-north-1"],
+            },
+        )
+        resp.raise_for_status()
+        for locator in resp.json()["dst_locators"]:
+            client.patch(
+                "/complete_upload",
+                json={
+                    "id": locator["id"],
+                    "size": 100,
+                    "etag": "123",
+                    "last_modified": "2020-01-01T00:00:00.000Z",
+                },
+            ).raise_for_status()
+
+    # my-key-1 is read from its replica, so my-key-2 is the least recently used one
     resp = client.post(
         "/locate_object",
         json={
-            "bucket": "my-writeback-bucket",
-            "key": "my-key-write-back",
-            "client_from_region": "aws:us-west-1",
+            "bucket": "my-evict-bucket",
+            "key": "my-key-1",
+            "client_from_region": "aws:eu-north-1",
         },
     )
-    assert resp.json()["region"] == "us-east-2"
+    assert resp.json()["tag"] == "aws:eu-north-1"
 
-    # Now write it to local store
+    stats = await evict_replicas(None, {"aws:eu-north-1": 150})
+    assert stats.budget_evicted == 1
+
+    resp = client.post("/list_evictions", json={"location_tag": "aws:eu-north-1"})
+    resp.raise_for_status()
+    evictions = resp.json()["locators"]
+    assert [locator["key"] for locator in evictions] == ["my-key-2"]
+
+    # reads fall back to the primary as soon as the replica is picked
     resp = client.post(
-        "/start_upload",
+        "/locate_object",
         json={
-            "bucket": "my-writeback-bucket",
-            "key": "my-key-write-back",
+            "bucket": "my-evict-bucket",
+            "key": "my-key-2",
+            "client_from_region": "aws:eu-north-1",
+        },
+    )
+    assert resp.json()["tag"] == "aws:us-west-1"
+
+    client.patch(
+        "/complete_delete_objects",
+        json={"ids": [evictions[0]["id"]], "op_type": ["delete"]},
+    ).raise_for_status()
+    resp = client.post("/list_evictions", json={"location_tag": "aws:eu-north-1"})
+    assert resp.json()["locators"] == []
+
+    # within budget, the remaining replica is only evicted by the TTL
+    stats = await evict_replicas(None, {"aws:eu-north-1": 150})
+    assert stats.budget_evicted == 0
+
+    # a replica from before last_access_ts existed counts as used at the next sweep, rather
+    # than never expiring
+    async with async_session() as db:
+        await db.execute(
+            update(DBPhysicalObjectLocator)
+            .where(DBPhysicalObjectLocator.location_tag == "aws:eu-north-1")
+            .values(last_access_ts=None)
+        )
+        await db.commit()
+    monkeypatch.setattr("operations.utils.eviction.REPLICA_EVICTION_BATCH_SIZE", 1)
+    stats = await evict_replicas(timedelta(hours=1), {})
+    assert stats.ttl_evicted == 0
+    stats = await evict_replicas(timedelta(0), {})
+    assert stats.ttl_evicted >= 1
+    resp = client.post("/list_evictions", json={"location_tag": "aws:eu-north-1"})
+    assert [locator["key"] for locator in resp.json()["locators"]] == ["my-key-1"]
+
+    # deleting the key does not conflict with the pending eviction, the evicted replica is
+    # deleted with the primary
+    resp = client.post(
+        "/start_delete_objects",
+        json={"bucket": "my-evict-bucket", "object_identifiers": {"my-key-1": []}},
+    )
+    resp.raise_for_status()
+    ids = [locator["id"] for locator in resp.json()["locators"]["my-key-1"]]
+    assert len(ids) == 2
+    resp = client.post("/list_evictions", json={"location_tag": "aws:eu-north-1"})
+    assert resp.json()["locators"] == []
+    resp = client.patch(
+        "/complete_delete_objects",
+        json={"ids": ids, "op_type": ["delete"] * len(ids)},
+    )
+    resp.raise_for_status()
+    assert [result["status_code"] for result in resp.json()["results"]] == [200, 200]
+
+
+def test_hot_objects(client):
+    resp = client.post(
+        "/start_create_bucket",
+        json={"bucket": "my-hot-bucket", "client_from_region": "aws:us-west-1"},
+    )
+    resp.raise_for_status()
+    for physical_bucket in resp.json()["locators"]:
+        client.patch(
+            "/complete_create_bucket",
+            json={
+                "id": physical_bucket["id"],
+                "creation_date": "2020-01-01T00:00:00",
+            },
+        ).raise_for_status()
+
+    for key in ["cold", "warm", "hot"]:
+        resp = client.post(
+            "/start_upload",
+            json={
+                "bucket": "my-hot-bucket",
+                "key": key,
+                "client_from_region": "aws:us-west-1",
+                "is_multipart": False,
+            },
+        )
+        resp.raise_for_status()
+        for locator in resp.json()["locators"]:
+            client.patch(
+                "/complete_upload",
+                json={
+                    "id": locator["id"],
+                    "size": 100,
+                    "etag": "123",
+                    "last_modified": "2020-01-01T00:00:00.000Z",
+                },
+            ).raise_for_status()
+
+    def read(key, times, client_from_region="aws:us-west-1"):
+        for _ in range(times):
+            client.post(
+                "/locate_object",
+                json={
+                    "bucket": "my-hot-bucket",
+                    "key": key,
+                    "client_from_region": client_from_region,
+                },
+            ).raise_for_status()
+
+    read("cold", 1)
+    read("hot", 3)
+    read("warm", 2)
+    # counters merge across flushes
+    resp = client.post(
+        "/hot_objects",
+        json={"client_region": "aws:us-west-1", "bucket": "my-hot-bucket"},
+    )
+    resp.raise_for_status()
+    read("hot", 2)
+    read("cold", 4, client_from_region="aws:us-east-1")
+
+    resp = client.post(
+        "/hot_objects",
+        json={"client_region": "aws:us-west-1", "bucket": "my-hot-bucket", "k": 2},
+    )
+    resp.raise_for_status()
+    objects = resp.json()["objects"]
+    assert [obj["key"] for obj in objects] == ["hot", "warm"]
+    assert objects[0]["score"] == pytest.approx(5, rel=0.01)
+    assert objects[1]["score"] == pytest.approx(2, rel=0.01)
+
+    resp = client.post(
+        "/hot_objects",
+        json={"client_region": "aws:us-east-1", "bucket": "my-hot-bucket"},
+    )
+    assert [obj["key"] for obj in resp.json()["objects"]] == ["cold"]
+
+
+@pytest.mark.asyncio
+async def test_failed_hotness_flush_keeps_counters(client, monkeypatch):
+    record_hit("my-hot-bucket", "retried", "aws:us-west-1")
+
+    def broken_session():
+        raise ConnectionError("database unavailable")
+
+    monkeypatch.setattr("operations.utils.hotness.async_session", broken_session)
+    with pytest.raises(ConnectionError):
+        await flush_hotness()
+    record_hit("my-hot-bucket", "retried", "aws:us-west-1")
+    monkeypatch.undo()
+
+    assert await flush_hotness() == 1
+    resp = client.post(
+        "/hot_objects",
+        json={"client_region": "aws:us-west-1", "bucket": "my-hot-bucket"},
+    )
+    scores = {obj["key"]: obj["score"] for obj in resp.json()["objects"]}
+    assert scores["retried"] == pytest.approx(2, rel=0.01)
+
+
+@pytest.mark.asyncio
+async def test_start_warmup_batch(client, monkeypatch):
+    resp = client.post(
+        "/start_create_bucket",
+        json={
+            "bucket": "my-warmup-batch-bucket",
             "client_from_region": "aws:us-west-1",
-            "is_multipart": False,
-            "policy": "copy_on_read",
         },
     )
     resp.raise_for_status()
-    for locator in resp.json()["locators"]:
+    for physical_bucket in resp.json()["locators"]:
+        client.patch(
+            "/complete_create_bucket",
+            json={
+                "id": physical_bucket["id"],
+                "creation_date": "2020-01-01T00:00:00",
+            },
+        ).raise_for_status()
+
+    for key in ["data/1", "data/2", "data/3", "other/1"]:
+        resp = client.post(
+            "/start_upload",
+            json={
+                "bucket": "my-warmup-batch-bucket",
+                "key": key,
+                "client_from_region": "aws:us-west-1",
+                "is_multipart": False,
+            },
+        )
+        resp.raise_for_status()
+        for locator in resp.json()["locators"]:
+            client.patch(
+                "/complete_upload",
+                json={
+                    "id": locator["id"],
+                    "size": 100,
+                    "etag": "123",
+                    "last_modified": "2020-01-01T00:00:00.000Z",
+                },
+            ).raise_for_status()
+
+    # page through a prefix
+    items, token = [], None
+    while True:
+        resp = client.post(
+            "/start_warmup_batch",
+            json={
+                "bucket": "my-warmup-batch-bucket",
+                "client_from_region": "aws:us-west-1",
+                "warmup_regions": ["aws:us-east-1"],
+                "prefix": "data/",
+                "max_keys": 2,
+                "continuation_token": token,
+            },
+        )
+        resp.raise_for_status()
+        items.extend(resp.json()["items"])
+        if not resp.json()["is_truncated"]:
+            break
+        token = resp.json()["next_continuation_token"]
+    assert [item["key"] for item in items] == ["data/1", "data/2", "data/3"]
+    for item in items:
+        assert item["src_locator"]["tag"] == "aws:us-west-1"
+        assert [locator["tag"] for locator in item["dst_locators"]] == ["aws:us-east-1"]
         client.patch(
             "/complete_upload",
             json={
-                "id": locator["id"],
+                "id": item["dst_locators"][0]["id"],
                 "size": 100,
                 "etag": "123",
                 "last_modified": "2020-01-01T00:00:00.000Z",
             },
         ).raise_for_status()
 
-    # we should get able to get it from us-west-1, now.
     resp = client.post(
         "/locate_object",
         json={
-            "bucket": "my-writeback-bucket",
-            "key": "my-key-write-back",
+            "bucket": "my-warmup-batch-bucket",
+            "key": "data/2",
+            "client_from_region": "aws:us-east-1",
+        },
+    )
+    assert resp.json()["tag"] == "aws:us-east-1"
+
+    # regions already holding an object are skipped, missing keys are ignored, and the key
+    # list is looked up in chunks
+    monkeypatch.setattr("operations.utils.db.IN_CHUNK_SIZE", 1)
+    resp = client.post(
+        "/start_warmup_batch",
+        json={
+            "bucket": "my-warmup-batch-bucket",
             "client_from_region": "aws:us-west-1",
+            "warmup_regions": ["aws:us-east-1"],
+            "keys": ["other/1", "missing", "data/1"],
+            "max_keys": 1,
         },
     )
-    assert resp.json()["region"] == "us-west-1"
+    resp.raise_for_status()
+    assert resp.json()["is_truncated"]
+    assert [item["key"] for item in resp.json()["items"]] == ["data/1"]
+    assert resp.json()["items"][0]["dst_locators"] == []
+    resp = client.post(
+        "/start_warmup_batch",
+        json={
+            "bucket": "my-warmup-batch-bucket",
+            "client_from_region": "aws:us-west-1",
+            "warmup_regions": ["aws:us-east-1"],
+            "keys": ["other/1", "missing", "data/1"],
+            "max_keys": 1,
+            "continuation_token": resp.json()["next_continuation_token"],
+        },
+    )
+    resp.raise_for_status()
+    assert not resp.json()["is_truncated"]
+    assert {
+        item["key"]: [locator["tag"] for locator in item["dst_locators"]]
+        for item in resp.json()["items"]
+    } == {"other/1": ["aws:us-east-1"]}
+
+    # a copy that is never completed is not made ready by the lock sweep
+    await sweep_locks(0, batch_size=100)
+    resp = client.post(
+        "/locate_object",
+        json={
+            "bucket": "my-warmup-batch-bucket",
+            "key": "other/1",
+            "client_from_region": "aws:us-east-1",
+        },
+    )
+    assert resp.json()["tag"] == "aws:us-west-1"
 
+    resp = client.post(
+        "/start_warmup_batch",
+        json={
+            "bucket": "my-warmup-batch-bucket",
+            "client_from_region": "aws:us-west-1",
+            "warmup_regions": ["aws:us-east-1"],
+        },
+    )
+    assert resp.status_code == 422
 
-def test_list_objects(client):
     resp = client.post(
-        "/start_create_bucket",
+        "/start_warmup_batch",
         json={
-            "bucket": "my-list-bucket",
+            "bucket": "my-warmup-batch-bucket",
+            "client_from_region": "aws:us-west-1",
+            "warmup_regions": ["aws:nowhere-1"],
+            "prefix": "",
+        },
+    )
+    assert resp.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_concurrent_warmups(client):
+    resp = client.post(
+        "/start_upload",
+        json={
+            "bucket": "my-warmup-batch-bucket",
+            "key": "race/1",
             "client_from_region": "aws:us-west-1",
+            "is_multipart": False,
         },
     )
     resp.raise_for_status()
+    for locator in resp.json()["locators"]:
+        client.patch(
+            "/complete_upload",
+            json={
+                "id": locator["id"],
+                "size": 100,
+                "etag": "123",
+                "last_modified": "2020-01-01T00:00:00.000Z",
+            },
+        ).raise_for_status()
+
+    async def warmup_batch():
+        async with async_session() as db:
+            resp = await start_warmup_batch(
+                StartWarmupBatchRequest(
+                    bucket="my-warmup-batch-bucket",
+                    client_from_region="aws:us-west-1",
+                    warmup_regions=["aws:us-east-1"],
+                    keys=["race/1"],
+                ),
+                db,
+            )
+            return [loc for item in resp.items for loc in item.dst_locators]
+
+    async def warmup():
+        async with async_session() as db:
+            resp = await start_warmup(
+                StartWarmupRequest(
+                    bucket="my-warmup-batch-bucket",
+                    key="race/1",
+                    client_from_region="aws:us-west-1",
+                    warmup_regions=["aws:us-east-1"],
+                ),
+                db,
+            )
+            return resp.dst_locators
+
+    # whichever runs first adds the replica, the others see it
+    results = await asyncio.gather(warmup_batch(), warmup_batch(), warmup())
+    assert sum(len(dst_locators) for dst_locators in results) == 1
+    async with async_session() as db:
+        tags = await db.scalars(
+            select(DBPhysicalObjectLocator.location_tag)
+            .join(DBPhysicalObjectLocator.logical_object)
+            .where(DBLogicalObject.bucket == "my-warmup-batch-bucket")
+            .where(DBLogicalObject.key == "race/1")
+        )
+        assert sorted(tags) == ["aws:us-east-1", "aws:us-west-1"]
+
+
+def test_write_back(client):
+    resp = client.post(
+        "/start_create_bucket",
+        json={"bucket": "my-writeback-bucket", "client_from_region": "aws:us-east-2"},
+    )
+    resp.raise_for_status()
 
     # patch
     for physical_bucket in resp.json()["locators"]:
@@ -697,9 +1661,9 @@ def test_list_objects(client):
     resp = client.post(
         "/start_upload",
         json={
-            "bucket": "my-list-bucket",
-            "key": "my-key-1",
-            "client_from_region": "aws:us-west-1",
+            "bucket": "my-writeback-bucket",
+            "key": "my-key-write-back",
+            "client_from_region": "aws:us-east-2",
             "is_multipart": False,
             "policy": "push",
         },
@@ -709,83 +1673,854 @@ def test_list_objects(client):
             "/complete_upload",
             json={
                 "id": locator["id"],
-                "size": 100,
-                "etag": "123",
-                "last_modified": "2020-01-01T00:00:00.000Z",
+                "size": 100,
+                "etag": "123",
+                "last_modified": "2020-01-01T00:00:00.000Z",
+            },
+        ).raise_for_status()
+
+    # we should be able to get it from us-east-2 (Pull-based Policy)
+    resp = client.post(
+        "/locate_object",
+        json={
+            "bucket": "my-writeback-bucket",
+            "key": "my-key-write-back",
+            "client_from_region": "aws:us-west-1",
+        },
+    )
+    assert resp.json()["region"] == "us-east-2"
+
+    # Now write it to local store
+    resp = client.post(
+        "/start_upload",
+        json={
+            "bucket": "my-writeback-bucket",
+            "key": "my-key-write-back",
+            "client_from_region": "aws:us-west-1",
+            "is_multipart": False,
+            "policy": "copy_on_read",
+        },
+    )
+    resp.raise_for_status()
+    for locator in resp.json()["locators"]:
+        client.patch(
+            "/complete_upload",
+            json={
+                "id": locator["id"],
+                "size": 100,
+                "etag": "123",
+                "last_modified": "2020-01-01T00:00:00.000Z",
+            },
+        ).raise_for_status()
+
+    # we should get able to get it from us-west-1, now.
+    resp = client.post(
+        "/locate_object",
+        json={
+            "bucket": "my-writeback-bucket",
+            "key": "my-key-write-back",
+            "client_from_region": "aws:us-west-1",
+        },
+    )
+    assert resp.json()["region"] == "us-west-1"
+
+
+def test_list_objects(client):
+    resp = client.post(
+        "/start_create_bucket",
+        json={
+            "bucket": "my-list-bucket",
+            "client_from_region": "aws:us-west-1",
+        },
+    )
+    resp.raise_for_status()
+
+    # patch
+    for physical_bucket in resp.json()["locators"]:
+        resp = client.patch(
+            "/complete_create_bucket",
+            json={
+                "id": physical_bucket["id"],
+                "creation_date": "2020-01-01T00:00:00",
+            },
+        )
+        resp.raise_for_status()
+
+    resp = client.post(
+        "/start_upload",
+        json={
+            "bucket": "my-list-bucket",
+            "key": "my-key-1",
+            "client_from_region": "aws:us-west-1",
+            "is_multipart": False,
+            "policy": "push",
+        },
+    )
+    for locator in resp.json()["locators"]:
+        client.patch(
+            "/complete_upload",
+            json={
+                "id": locator["id"],
+                "size": 100,
+                "etag": "123",
+                "last_modified": "2020-01-01T00:00:00.000Z",
+            },
+        ).raise_for_status()
+
+    resp = client.post(
+        "/list_objects",
+        json={
+            "bucket": "my-list-bucket",
+            "prefix": "my-prefix-1/",
+        },
+    )
+    assert resp.json() == []
+
+    resp = client.post(
+        "/list_objects",
+        json={
+            "bucket": "my-list-bucket",
+            "prefix": "my-key",
+        },
+    )
+    assert resp.json() == [
+        {
+            "bucket": "my-list-bucket",
+            "key": "my-key-1",
+            "size": 100,
+            "etag": "123",
+            "last_modified": "2020-01-01T00:00:00",
+            "version_id": None,
+        }
+    ]
+
+
+def test_list_objects_v2(client):
+    resp = client.post(
+        "/start_create_bucket",
+        json={
+            "bucket": "my-list-v2-bucket",
+            "client_from_region": "aws:us-west-1",
+        },
+    )
+    resp.raise_for_status()
+
+    for physical_bucket in resp.json()["locators"]:
+        client.patch(
+            "/complete_create_bucket",
+            json={
+                "id": physical_bucket["id"],
+                "creation_date": "2020-01-01T00:00:00",
+            },
+        ).raise_for_status()
+
+    for key in ["a/1", "a/2", "a/3", "a/4", "a/5", "b/1"]:
+        resp = client.post(
+            "/start_upload",
+            json={
+                "bucket": "my-list-v2-bucket",
+                "key": key,
+                "client_from_region": "aws:us-west-1",
+                "is_multipart": False,
+            },
+        )
+        resp.raise_for_status()
+        for locator in resp.json()["locators"]:
+            client.patch(
+                "/complete_upload",
+                json={
+                    "id": locator["id"],
+                    "size": 100,
+                    "etag": "123",
+                    "last_modified": "2020-01-01T00:00:00.000Z",
+                },
+            ).raise_for_status()
+
+    # page through the prefix with the continuation tokens
+    keys, token, pages = [], None, 0
+    while True:
+        resp = client.post(
+            "/list_objects_v2",
+            json={
+                "bucket": "my-list-v2-bucket",
+                "prefix": "a/",
+                "max_keys": 2,
+                "continuation_token": token,
+            },
+        )
+        resp.raise_for_status()
+        page = resp.json()
+        pages += 1
+        assert page["key_count"] == len(page["objects"])
+        keys.extend(obj["key"] for obj in page["objects"])
+        if not page["is_truncated"]:
+            assert page["next_continuation_token"] is None
+            break
+        token = page["next_continuation_token"]
+    assert keys == ["a/1", "a/2", "a/3", "a/4", "a/5"]
+    assert pages == 3
+
+    resp = client.post(
+        "/list_objects_v2",
+        json={"bucket": "my-list-v2-bucket", "start_after": "a/4"},
+    )
+    assert [obj["key"] for obj in resp.json()["objects"]] == ["a/5", "b/1"]
+    assert resp.json()["is_truncated"] is False
+
+    resp = client.post(
+        "/list_objects_v2",
+        json={"bucket": "my-list-v2-bucket", "continuation_token": "not-a-token"},
+    )
+    assert resp.status_code == 400
+
+    # roll up the "directories" under the bucket root
+    resp = client.post(
+        "/list_objects_v2",
+        json={"bucket": "my-list-v2-bucket", "delimiter": "/"},
+    )
+    assert resp.json()["objects"] == []
+    assert resp.json()["common_prefixes"] == ["a/", "b/"]
+
+    resp = client.post(
+        "/list_objects_v2",
+        json={"bucket": "my-list-v2-bucket", "delimiter": "/", "max_keys": 1},
+    )
+    assert resp.json()["common_prefixes"] == ["a/"]
+    assert resp.json()["is_truncated"] is True
+    resp = client.post(
+        "/list_objects_v2",
+        json={
+            "bucket": "my-list-v2-bucket",
+            "delimiter": "/",
+            "max_keys": 1,
+            "continuation_token": resp.json()["next_continuation_token"],
+        },
+    )
+    assert resp.json()["common_prefixes"] == ["b/"]
+    assert resp.json()["is_truncated"] is False
+
+    resp = client.post(
+        "/list_objects_v2",
+        json={"bucket": "my-list-v2-bucket", "prefix": "a/", "delimiter": "/"},
+    )
+    assert [obj["key"] for obj in resp.json()["objects"]] == [
+        "a/1",
+        "a/2",
+        "a/3",
+        "a/4",
+        "a/5",
+    ]
+    assert resp.json()["common_prefixes"] == []
+
+    resp = client.post("/list_objects_v2", json={"bucket": "no-such-bucket"})
+    assert resp.status_code == 404
+
+
+def test_list_objects_v2_binary_order(client):
+    """Keys whose order differs under a linguistic collation page in code point order"""
+    resp = client.post(
+        "/start_create_bucket",
+        json={
+            "bucket": "my-list-order-bucket",
+            "client_from_region": "aws:us-west-1",
+        },
+    )
+    resp.raise_for_status()
+    for physical_bucket in resp.json()["locators"]:
+        client.patch(
+            "/complete_create_bucket",
+            json={
+                "id": physical_bucket["id"],
+                "creation_date": "2020-01-01T00:00:00",
+            },
+        ).raise_for_status()
+
+    keys = ["a_b", "aB", "a/b/c", "a.b", "b", "a-b", "Ab", "a b", "a/1"]
+    for key in keys:
+        resp = client.post(
+            "/start_upload",
+            json={
+                "bucket": "my-list-order-bucket",
+                "key": key,
+                "client_from_region": "aws:us-west-1",
+                "is_multipart": False,
+            },
+        )
+        resp.raise_for_status()
+        for locator in resp.json()["locators"]:
+            client.patch(
+                "/complete_upload",
+                json={
+                    "id": locator["id"],
+                    "size": 100,
+                    "etag": "123",
+                    "last_modified": "2020-01-01T00:00:00.000Z",
+                },
+            ).raise_for_status()
+
+    def list_all(**kwargs):
+        entries, token = [], None
+        while True:
+            resp = client.post(
+                "/list_objects_v2",
+                json={
+                    "bucket": "my-list-order-bucket",
+                    "max_keys": 1,
+                    "continuation_token": token,
+                    **kwargs,
+                },
+            )
+            resp.raise_for_status()
+            page = resp.json()
+            entries.extend(obj["key"] for obj in page["objects"])
+            entries.extend(page["common_prefixes"])
+            if not page["is_truncated"]:
+                return entries
+            token = page["next_continuation_token"]
+
+    assert list_all() == sorted(keys)
+    assert list_all(delimiter="/") == [
+        "Ab",
+        "a b",
+        "a-b",
+        "a.b",
+        "a/",
+        "aB",
+        "a_b",
+        "b",
+    ]
+
+
+def test_object_keys_collate_in_code_point_order():
+    # PostgreSQL must not compare keys with the linguistic collation of the database
+    ddl = str(
+        CreateTable(DBLogicalObject.__table__).compile(dialect=postgresql.dialect())
+    )
+    assert 'key VARCHAR COLLATE "C"' in ddl
+
+
+def test_postgresql_schema_constraints():
+    # logical_buckets.bucket is a foreign key target, which PostgreSQL requires to be unique
+    ddl = str(
+        CreateTable(DBLogicalBucket.__table__).compile(dialect=postgresql.dialect())
+    )
+    assert "UNIQUE (bucket)" in ddl
+
+    # physical bucket names repeat across logical buckets, so they cannot be referenced
+    ddl = str(
+        CreateTable(DBPhysicalObjectLocator.__table__).compile(
+            dialect=postgresql.dialect()
+        )
+    )
+    assert "REFERENCES physical_bucket_locators" not in ddl
+    assert "REFERENCES logical_objects (id)" in ddl
+
+    # identifiers longer than 63 characters are truncated by PostgreSQL
+    index_names = {
+        index.name for table in Base.metadata.sorted_tables for index in table.indexes
+    }
+    assert "ix_physical_object_locators_object_id_tag_status" in index_names
+    assert max(len(name) for name in index_names) <= 63
+
+
+def test_multipart_flow(client):
+    """Test the a workflow for multipart upload works."""
+
+    # Simulate CreateMultipartUpload. We create an multipart, get a logical id, return it to the client.
+    # Also crated the actual multipart id and stuck them in database.
+    resp = client.post(
+        "/start_create_bucket",
+        json={
+            "bucket": "my-multipart-bucket",
+            "client_from_region": "aws:us-west-1",
+            "warmup_regions": ["gcp:us-west1"],
+        },
+    )
+    resp.raise_for_status()
+
+    # patch
+    for physical_bucket in resp.json()["locators"]:
+        resp = client.patch(
+            "/complete_create_bucket",
+            json={
+                "id": physical_bucket["id"],
+                "creation_date": "2020-01-01T00:00:00",
+            },
+        )
+        resp.raise_for_status()
+
+    resp = client.post(
+        "/start_upload",
+        json={
+            "bucket": "my-multipart-bucket",
+            "key": "my-key-multipart",
+            "client_from_region": "aws:us-west-1",
+            "is_multipart": True,
+            "policy": "push",
+        },
+    )
+    resp.raise_for_status()
+    resp_data = resp.json()
+    multipart_upload_id = resp_data["multipart_upload_id"]
+    assert multipart_upload_id is not None
+
+    # generate the id
+    for locator in resp_data["locators"]:
+        client.patch(
+            "/set_multipart_id",
+            json={
+                "id": locator["id"],
+                "multipart_upload_id": f"{locator['tag']}-{multipart_upload_id}",
+            },
+        ).raise_for_status()
+    ###
+
+    # Simulate ListMultipartUploads
+    resp = client.post(
+        "/list_multipart_uploads",
+        json={
+            "bucket": "my-multipart-bucket",
+            "prefix": "my-key-multi",
+        },
+    )
+    resp.raise_for_status()
+    resp_data = resp.json()
+    assert resp_data == [
+        {
+            "bucket": "my-multipart-bucket",
+            "key": "my-key-multipart",
+            "upload_id": multipart_upload_id,
+        }
+    ]
+
+    # Simulate UploadPart. We get the logical id, and upload the part to the actual location.
+    resp = client.post(
+        "/continue_upload",
+        json={
+            "bucket": "my-multipart-bucket",
+            "key": "my-key-multipart",
+            "client_from_region": "aws:us-west-1",
+            "multipart_upload_id": multipart_upload_id,
+        },
+    )
+    resp.raise_for_status()
+    resp_data = resp.json()
+    for locator in resp_data:
+        assert (
+            locator["multipart_upload_id"] == locator["tag"] + "-" + multipart_upload_id
+        )
+
+        client.patch(
+            "/append_part",
+            json={
+                "id": locator["id"],
+                "part_number": 1,
+                "etag": "123",
+                "size": 100,
+            },
+        ).raise_for_status()
+
+    # Simulate ListParts
+    resp = client.post(
+        "/list_parts",
+        json={
+            "bucket": "my-multipart-bucket",
+            "key": "my-key-multipart",
+            "upload_id": multipart_upload_id,
+        },
+    )
+    resp.raise_for_status()
+    assert resp.json() == [
+        {
+            "part_number": 1,
+            "etag": "123",
+            "size": 100,
+        }
+    ]
+
+    # Simulate a retried UploadPart, the part is overwritten rather than added
+    for locator in resp_data:
+        client.patch(
+            "/append_part",
+            json={
+                "id": locator["id"],
+                "part_number": 1,
+                "etag": "456",
+                "size": 200,
+            },
+        ).raise_for_status()
+    resp = client.post(
+        "/list_parts",
+        json={
+            "bucket": "my-multipart-bucket",
+            "key": "my-key-multipart",
+            "upload_id": multipart_upload_id,
+        },
+    )
+    resp.raise_for_status()
+    assert resp.json() == [
+        {
+            "part_number": 1,
+            "etag": "456",
+            "size": 200,
+        }
+    ]
+
+    # Simulate CompleteMultipartUpload. We want to "sealed" it.
+    for locator in resp_data:
+        client.patch(
+            "/complete_upload",
+            json={
+                "id": locator["id"],
+                "size": 100,
+                "etag": "123",
+                "last_modified": "2020-01-01T00:00:00.000Z",
+            },
+        ).raise_for_status()
+
+    # Now we should be able to locate it.
+    resp = client.post(
+        "/locate_object",
+        json={
+            "bucket": "my-multipart-bucket",
+            "key": "my-key-multipart",
+            "client_from_region": "aws:us-west-1",
+        },
+    )
+    resp.raise_for_status()
+    resp_data = resp.json()
+    assert resp_data["region"] == "us-west-1"
+
+
+@pytest.mark.asyncio
+async def test_append_parts_batch(client):
+    resp = client.post(
+        "/start_create_bucket",
+        json={
+            "bucket": "my-parts-batch-bucket",
+            "client_from_region": "aws:us-west-1",
+            "warmup_regions": ["gcp:us-west1"],
+        },
+    )
+    resp.raise_for_status()
+    for physical_bucket in resp.json()["locators"]:
+        client.patch(
+            "/complete_create_bucket",
+            json={
+                "id": physical_bucket["id"],
+                "creation_date": "2020-01-01T00:00:00",
+            },
+        ).raise_for_status()
+
+    resp = client.post(
+        "/start_upload",
+        json={
+            "bucket": "my-parts-batch-bucket",
+            "key": "my-key",
+            "client_from_region": "aws:us-west-1",
+            "is_multipart": True,
+            "policy": "push",
+        },
+    )
+    resp.raise_for_status()
+    multipart_upload_id = resp.json()["multipart_upload_id"]
+    ids = [locator["id"] for locator in resp.json()["locators"]]
+
+    def list_parts():
+        resp = client.post(
+            "/list_parts",
+            json={
+                "bucket": "my-parts-batch-bucket",
+                "key": "my-key",
+                "upload_id": multipart_upload_id,
+            },
+        )
+        resp.raise_for_status()
+        return sorted((part["part_number"], part["etag"]) for part in resp.json())
+
+    # parts 1-50 of every locator, with a retried part 1 and an unknown locator
+    parts = [
+        {
+            "id": id,
+            "part_number": part_number,
+            "etag": f"etag-{part_number}",
+            "size": 10,
+        }
+        for part_number in range(1, 51)
+        for id in ids
+    ]
+    parts += [{"id": id, "part_number": 1, "etag": "retried", "size": 10} for id in ids]
+    parts.append({"id": -1, "part_number": 1, "etag": "etag-1", "size": 10})
+    resp = client.patch("/append_parts_batch", json={"parts": parts})
+    resp.raise_for_status()
+    assert [result["status_code"] for result in resp.json()["results"]] == [200] * (
+        len(parts) - 1
+    ) + [404]
+    assert list_parts() == [(1, "retried")] + [
+        (part_number, f"etag-{part_number}") for part_number in range(2, 51)
+    ]
+
+    # concurrent calls within the window are recorded together
+    coalescer = PartCoalescer(0.01)
+    results = await asyncio.gather(
+        *(
+            coalescer.submit(
+                PatchUploadMultipartUploadPart(
+                    id=id, part_number=part_number, etag="coalesced", size=10
+                )
+            )
+            for part_number in range(51, 61)
+            for id in ids + [-1]
+        )
+    )
+    assert [result.status_code for result in results] == [200, 200, 404] * 10
+    assert list_parts()[50:] == [
+        (part_number, "coalesced") for part_number in range(51, 61)
+    ]
+
+
+def test_complete_multipart(client):
+    resp = client.post(
+        "/start_create_bucket",
+        json={
+            "bucket": "my-complete-multipart-bucket",
+            "client_from_region": "aws:us-west-1",
+            "warmup_regions": ["gcp:us-west1"],
+        },
+    )
+    resp.raise_for_status()
+    for physical_bucket in resp.json()["locators"]:
+        client.patch(
+            "/complete_create_bucket",
+            json={
+                "id": physical_bucket["id"],
+                "creation_date": "2020-01-01T00:00:00",
+            },
+        ).raise_for_status()
+
+    resp = client.post(
+        "/start_upload",
+        json={
+            "bucket": "my-complete-multipart-bucket",
+            "key": "my-key",
+            "client_from_region": "aws:us-west-1",
+            "is_multipart": True,
+            "policy": "push",
+        },
+    )
+    resp.raise_for_status()
+    multipart_upload_id = resp.json()["multipart_upload_id"]
+    ids = [locator["id"] for locator in resp.json()["locators"]]
+
+    etags = {
+        part_number: hashlib.md5(f"part-{part_number}".encode()).hexdigest()
+        for part_number in [1, 2, 3]
+    }
+    client.patch(
+        "/append_parts_batch",
+        json={
+            "parts": [
+                {"id": id, "part_number": part_number, "etag": etag, "size": 100}
+                for part_number, etag in etags.items()
+                for id in ids
+            ]
+        },
+    ).raise_for_status()
+
+    def complete(parts):
+        return client.patch(
+            "/complete_multipart",
+            json={
+                "bucket": "my-complete-multipart-bucket",
+                "key": "my-key",
+                "multipart_upload_id": multipart_upload_id,
+                "parts": [
+                    {"part_number": part_number, "etag": etag}
+                    for part_number, etag in parts
+                ],
+                "last_modified": "2020-01-01T00:00:00.000Z",
+                "version_ids": {str(id): f"version-{id}" for id in ids},
+            },
+        )
+
+    assert complete([(3, etags[3]), (1, etags[1])]).status_code == 400
+    assert complete([(1, etags[1]), (3, etags[2])]).status_code == 400
+    assert complete([(1, etags[1]), (4, etags[1])]).status_code == 400
+
+    # part 2 is left out of the object
+    resp = complete([(1, f'"{etags[1]}"'), (3, etags[3])])
+    resp.raise_for_status()
+    expected_etag = hashlib.md5(
+        bytes.fromhex(etags[1]) + bytes.fromhex(etags[3])
+    ).hexdigest()
+    assert resp.json()["etag"] == f"{expected_etag}-2"
+    assert resp.json()["size"] == 200
+
+    # the upload is no longer in progress
+    assert complete([(1, etags[1])]).status_code == 404
+
+    for region in ["aws:us-west-1", "gcp:us-west1"]:
+        resp = client.post(
+            "/locate_object",
+            json={
+                "bucket": "my-complete-multipart-bucket",
+                "key": "my-key",
+                "client_from_region": region,
+            },
+        )
+        resp.raise_for_status()
+        assert resp.json()["tag"] == region
+        assert resp.json()["etag"] == f"{expected_etag}-2"
+        assert resp.json()["size"] == 200
+        assert resp.json()["version_id"] == f"version-{resp.json()['id']}"
+
+
+def test_continue_upload_parts(client):
+    resp = client.post(
+        "/start_create_bucket",
+        json={
+            "bucket": "my-continue-upload-bucket",
+            "client_from_region": "aws:us-west-1",
+            "warmup_regions": ["gcp:us-west1"],
+        },
+    )
+    resp.raise_for_status()
+    for physical_bucket in resp.json()["locators"]:
+        client.patch(
+            "/complete_create_bucket",
+            json={
+                "id": physical_bucket["id"],
+                "creation_date": "2020-01-01T00:00:00",
+            },
+        ).raise_for_status()
+
+    resp = client.post(
+        "/start_upload",
+        json={
+            "bucket": "my-continue-upload-bucket",
+            "key": "my-key",
+            "client_from_region": "aws:us-west-1",
+            "is_multipart": True,
+            "policy": "push",
+        },
+    )
+    resp.raise_for_status()
+    multipart_upload_id = resp.json()["multipart_upload_id"]
+    ids = [locator["id"] for locator in resp.json()["locators"]]
+    for locator in resp.json()["locators"]:
+        client.patch(
+            "/set_multipart_id",
+            json={
+                "id": locator["id"],
+                "multipart_upload_id": f"{locator['tag']}-{multipart_upload_id}",
             },
         ).raise_for_status()
-
-    resp = client.post(
-        "/list_objects",
+    client.patch(
+        "/append_parts_batch",
         json={
-            "bucket": "my-list-bucket",
-            "prefix": "my-prefix-1/",
+            "parts": [
+                {"id": id, "part_number": part_number, "etag": "123", "size": 100}
+                for part_number in range(1, 6)
+                for id in ids
+            ]
         },
+    ).raise_for_status()
+
+    def continue_upload(**kwargs):
+        return client.post(
+            "/continue_upload",
+            json={
+                "bucket": "my-continue-upload-bucket",
+                "key": "my-key",
+                "client_from_region": "aws:us-west-1",
+                "multipart_upload_id": multipart_upload_id,
+                **kwargs,
+            },
+        )
+
+    resp = continue_upload()
+    resp.raise_for_status()
+    assert sorted(locator["id"] for locator in resp.json()) == sorted(ids)
+    assert all(locator["parts"] is None for locator in resp.json())
+
+    resp = continue_upload(do_list_parts=True)
+    resp.raise_for_status()
+    for locator in resp.json():
+        assert [part["part_number"] for part in locator["parts"]] == [1, 2, 3, 4, 5]
+        assert locator["next_part_number_marker"] is None
+
+    resp = continue_upload(do_list_parts=True, max_parts=2)
+    resp.raise_for_status()
+    for locator in resp.json():
+        assert [part["part_number"] for part in locator["parts"]] == [1, 2]
+        assert locator["next_part_number_marker"] == 2
+
+    resp = continue_upload(do_list_parts=True, max_parts=2, part_number_marker=4)
+    resp.raise_for_status()
+    for locator in resp.json():
+        assert [part["part_number"] for part in locator["parts"]] == [5]
+        assert locator["next_part_number_marker"] is None
+
+    assert continue_upload(do_list_parts=True, max_parts=0).status_code == 422
+    assert continue_upload(do_list_parts=True, max_parts=10001).status_code == 422
+
+    # missing uploads and copy sources are reported rather than crashing
+    assert continue_upload(multipart_upload_id="missing").status_code == 404
+    resp = continue_upload(
+        copy_src_bucket="my-continue-upload-bucket", copy_src_key="missing-key"
     )
-    assert resp.json() == []
+    assert resp.status_code == 404
 
-    resp = client.post(
-        "/list_objects",
+    client.patch(
+        "/complete_multipart",
         json={
-            "bucket": "my-list-bucket",
-            "prefix": "my-key",
+            "bucket": "my-continue-upload-bucket",
+            "key": "my-key",
+            "multipart_upload_id": multipart_upload_id,
+            "parts": [
+                {"part_number": part_number, "etag": "123"}
+                for part_number in range(1, 6)
+            ],
+            "last_modified": "2020-01-01T00:00:00.000Z",
+            "version_ids": {},
         },
-    )
-    assert resp.json() == [
-        {
-            "bucket": "my-list-bucket",
-            "key": "my-key-1",
-            "size": 100,
-            "etag": "123",
-            "last_modified": "2020-01-01T00:00:00",
-            "version_id": None,
-        }
-    ]
+    ).raise_for_status()
 
 
-def test_multipart_flow(client):
-    """Test the a workflow for multipart upload works."""
-
-    # Simulate CreateMultipartUpload. We create an multipart, get a logical id, return it to the client.
-    # Also crated the actual multipart id and stuck them in database.
+@pytest.mark.asyncio
+async def test_multipart_reaper(client, monkeypatch):
     resp = client.post(
         "/start_create_bucket",
         json={
-            "bucket": "my-multipart-bucket",
+            "bucket": "my-reaper-bucket",
             "client_from_region": "aws:us-west-1",
             "warmup_regions": ["gcp:us-west1"],
         },
     )
     resp.raise_for_status()
-
-    # patch
     for physical_bucket in resp.json()["locators"]:
-        resp = client.patch(
+        client.patch(
             "/complete_create_bucket",
             json={
                 "id": physical_bucket["id"],
                 "creation_date": "2020-01-01T00:00:00",
             },
-        )
-        resp.raise_for_status()
+        ).raise_for_status()
 
     resp = client.post(
         "/start_upload",
         json={
-            "bucket": "my-multipart-bucket",
-            "key": "my-key-multipart",
+            "bucket": "my-reaper-bucket",
+            "key": "my-abandoned-key",
             "client_from_region": "aws:us-west-1",
             "is_multipart": True,
             "policy": "push",
         },
     )
     resp.raise_for_status()
-    resp_data = resp.json()
-    multipart_upload_id = resp_data["multipart_upload_id"]
-    assert multipart_upload_id is not None
-
-    # generate the id
-    for locator in resp_data["locators"]:
+    multipart_upload_id = resp.json()["multipart_upload_id"]
+    locators = resp.json()["locators"]
+    for locator in locators:
         client.patch(
             "/set_multipart_id",
             json={
@@ -793,95 +2528,198 @@ def test_multipart_flow(client):
                 "multipart_upload_id": f"{locator['tag']}-{multipart_upload_id}",
             },
         ).raise_for_status()
-    ###
+        client.patch(
+            "/append_part",
+            json={"id": locator["id"], "part_number": 1, "etag": "123", "size": 100},
+        ).raise_for_status()
 
-    # Simulate ListMultipartUploads
+    # the lock sweep leaves multipart uploads in progress alone
+    await rm_lock_on_timeout(0, test=True)
     resp = client.post(
         "/list_multipart_uploads",
-        json={
-            "bucket": "my-multipart-bucket",
-            "prefix": "my-key-multi",
-        },
+        json={"bucket": "my-reaper-bucket", "prefix": ""},
+    )
+    assert len(resp.json()) == 1
+
+    # uploads younger than the abort age are kept
+    stats = await reap_stale_uploads(timedelta(hours=1))
+    assert stats.uploads_reaped == 0
+
+    stats = await reap_stale_uploads(timedelta(0))
+    assert stats.uploads_reaped == 1
+    assert stats.parts_deleted == 3  # one logical part and one part per locator
+    assert stats.aborts_queued == 2
+
+    resp = client.post(
+        "/list_multipart_uploads",
+        json={"bucket": "my-reaper-bucket", "prefix": ""},
     )
+    assert resp.json() == []
+
+    # the proxy aborts the physical uploads
+    resp = client.post("/list_multipart_aborts", json={})
     resp.raise_for_status()
-    resp_data = resp.json()
-    assert resp_data == [
-        {
-            "bucket": "my-multipart-bucket",
-            "key": "my-key-multipart",
-            "upload_id": multipart_upload_id,
-        }
+    aborts = [
+        abort for abort in resp.json()["aborts"] if abort["key"] == "my-abandoned-key"
     ]
-
-    # Simulate UploadPart. We get the logical id, and upload the part to the actual location.
+    assert sorted(abort["multipart_upload_id"] for abort in aborts) == sorted(
+        f"{locator['tag']}-{multipart_upload_id}" for locator in locators
+    )
+    monkeypatch.setattr("operations.utils.db.IN_CHUNK_SIZE", 1)
+    client.patch(
+        "/complete_multipart_aborts", json={"ids": [abort["id"] for abort in aborts]}
+    ).raise_for_status()
+    monkeypatch.undo()
+    resp = client.post("/list_multipart_aborts", json={})
+    assert resp.json()["aborts"] == []
+
+    # uploads without a creation time are not taken for stale
     resp = client.post(
-        "/continue_upload",
+        "/start_upload",
         json={
-            "bucket": "my-multipart-bucket",
-            "key": "my-key-multipart",
+            "bucket": "my-reaper-bucket",
+            "key": "my-key",
             "client_from_region": "aws:us-west-1",
-            "multipart_upload_id": multipart_upload_id,
+            "is_multipart": True,
+            "policy": "push",
         },
     )
     resp.raise_for_status()
-    resp_data = resp.json()
-    for locator in resp_data:
-        assert (
-            locator["multipart_upload_id"] == locator["tag"] + "-" + multipart_upload_id
+    multipart_upload_id = resp.json()["multipart_upload_id"]
+    async with async_session() as db:
+        await db.execute(
+            update(DBLogicalObject)
+            .where(DBLogicalObject.multipart_upload_id == multipart_upload_id)
+            .values(created_ts=None)
         )
-
-        client.patch(
-            "/append_part",
-            json={
-                "id": locator["id"],
-                "part_number": 1,
-                "etag": "123",
-                "size": 100,
-            },
-        ).raise_for_status()
-
-    # Simulate ListParts
+        await db.commit()
+    stats = await reap_stale_uploads(timedelta(0))
+    assert stats.uploads_reaped == 0
+    client.post(
+        "/start_delete_objects",
+        json={
+            "bucket": "my-reaper-bucket",
+            "object_identifiers": {"my-key": []},
+            "multipart_upload_ids": [multipart_upload_id],
+        },
+    ).raise_for_status()
+
+    # a new version does not inherit the upload id of a multipart one, so it is not
+    # reaped as an upload while it is pending
+    client.post(
+        "/put_bucket_versioning",
+        json={"bucket": "my-reaper-bucket", "versioning": True},
+    ).raise_for_status()
     resp = client.post(
-        "/list_parts",
+        "/start_upload",
         json={
-            "bucket": "my-multipart-bucket",
-            "key": "my-key-multipart",
-            "upload_id": multipart_upload_id,
+            "bucket": "my-reaper-bucket",
+            "key": "my-completed-key",
+            "client_from_region": "aws:us-west-1",
+            "is_multipart": True,
+            "policy": "push",
         },
     )
     resp.raise_for_status()
-    assert resp.json() == [
-        {
-            "part_number": 1,
-            "etag": "123",
-            "size": 100,
-        }
-    ]
-
-    # Simulate CompleteMultipartUpload. We want to "sealed" it.
-    for locator in resp_data:
+    multipart_upload_id = resp.json()["multipart_upload_id"]
+    ids = [locator["id"] for locator in resp.json()["locators"]]
+    for id in ids:
         client.patch(
-            "/complete_upload",
-            json={
-                "id": locator["id"],
-                "size": 100,
-                "etag": "123",
-                "last_modified": "2020-01-01T00:00:00.000Z",
-            },
+            "/set_multipart_id",
+            json={"id": id, "multipart_upload_id": f"{id}-{multipart_upload_id}"},
         ).raise_for_status()
+    client.patch(
+        "/append_parts_batch",
+        json={
+            "parts": [
+                {"id": id, "part_number": 1, "etag": "123", "size": 100} for id in ids
+            ]
+        },
+    ).raise_for_status()
+    client.patch(
+        "/complete_multipart",
+        json={
+            "bucket": "my-reaper-bucket",
+            "key": "my-completed-key",
+            "multipart_upload_id": multipart_upload_id,
+            "parts": [{"part_number": 1, "etag": "123"}],
+        },
+    ).raise_for_status()
 
-    # Now we should be able to locate it.
     resp = client.post(
-        "/locate_object",
+        "/start_upload",
         json={
-            "bucket": "my-multipart-bucket",
-            "key": "my-key-multipart",
+            "bucket": "my-reaper-bucket",
+            "key": "my-completed-key",
             "client_from_region": "aws:us-west-1",
+            "is_multipart": False,
+            "policy": "push",
         },
     )
     resp.raise_for_status()
-    resp_data = resp.json()
-    assert resp_data["region"] == "us-west-1"
+    assert resp.json()["multipart_upload_id"] is None
+    stats = await reap_stale_uploads(timedelta(0))
+    assert stats.uploads_reaped == 0
+
+
+def test_add_missing_columns_backfills_defaults(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/upgrade.db")
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn)
+        conn.execute(
+            insert(DBLogicalObject).values(bucket="bucket", key="key", status="ready")
+        )
+        # the database of a release before created_ts
+        conn.execute(text("DROP INDEX ix_logical_objects_status_created_ts"))
+        conn.execute(text("ALTER TABLE logical_objects DROP COLUMN created_ts"))
+
+    before = datetime.utcnow()
+    with engine.begin() as conn:
+        add_missing_columns(conn)
+        created_ts = conn.scalar(select(DBLogicalObject.created_ts))
+    assert created_ts >= before
+
+
+def test_locate_object_uses_indexes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/indexes.db")
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn)
+        # the database of a release before the locate indexes
+        conn.execute(text("DROP INDEX ix_logical_objects_bucket_key_id_desc"))
+        conn.execute(
+            text("DROP INDEX ix_physical_object_locators_object_id_tag_status")
+        )
+
+    with engine.begin() as conn:
+        create_missing_indexes(conn)
+        stmt = (
+            locate_stmt("bucket")
+            .where(DBLogicalObject.key == "key")
+            .order_by(DBLogicalObject.id.desc(), *locator_preference("aws:us-west-1"))
+            .limit(1)
+        )
+        plan = " ".join(
+            row.detail
+            for row in conn.execute(
+                text(
+                    "EXPLAIN QUERY PLAN "
+                    + str(
+                        stmt.compile(
+                            dialect=engine.dialect,
+                            compile_kwargs={"literal_binds": True},
+                        )
+                    )
+                )
+            )
+        )
+    assert (
+        "SEARCH logical_objects USING INDEX ix_logical_objects_bucket_key_id_desc"
+        in plan
+    )
+    assert (
+        "SEARCH physical_object_locators USING INDEX "
+        "ix_physical_object_locators_object_id_tag_status" in plan
+    )
 
 
 @pytest.mark.asyncio
@@ -921,7 +2759,14 @@ async def test_metadata_clean_up(client):
     resp.raise_for_status()
 
     # set minutes to 0 just to prevent stalling and set testing to True. Will bypass initial wait
-    await rm_lock_on_timeout(0, test=True)
+    stats = await rm_lock_on_timeout(0, test=True)
+    assert stats.locks_released >= 1
+    assert stats.objects_flipped >= 1
+    assert stats.objects_scanned >= stats.objects_flipped
+
+    resp = client.get("/lock_sweep_stats")
+    resp.raise_for_status()
+    assert resp.json()["objects_flipped"] == stats.objects_flipped
 
     resp = client.post(
         "/locate_object_status",
@@ -935,6 +2780,24 @@ async def test_metadata_clean_up(client):
     for locator in resp.json():
         assert locator["status"] == "ready"
 
+    # timed-out locks are released in batches until none is left
+    resp = client.post(
+        "/start_upload",
+        json={
+            "bucket": "temp-object-bucket",
+            "key": "my-other-key",
+            "client_from_region": "aws:us-west-1",
+            "is_multipart": False,
+            "policy": "push",
+        },
+    )
+    resp.raise_for_status()
+    assert len(resp.json()["locators"]) == 2
+    stats = await sweep_locks(0, batch_size=1)
+    assert stats.locks_released == 2
+    stats = await sweep_locks(0, batch_size=1)
+    assert stats.locks_released == 0
+
 
 def test_record_metrics(client):
     # Check list metrics for empty statistics table
@@ -1017,3 +2880,165 @@ def test_record_metrics(client):
             "object_size": 5000,
         },
     ]
+
+    # the proxy sends RFC 3339 timestamps, they are stored in UTC
+    for latency in [0.1, 0.2, 0.3]:
+        client.post(
+            "/record_metrics",
+            json={
+                "requested_region": "aws:us-west-1",
+                "client_region": "us-east-1",
+                "operation": "read",
+                "latency": latency,
+                "timestamp": "2003-06-16T02:00:30+02:00",
+                "object_size": 100,
+            },
+        ).raise_for_status()
+
+    resp = client.post(
+        "/list_metrics",
+        json={
+            "client_region": "us-east-1",
+            "start_time": "2003-06-16 00:00:00",
+            "end_time": "2003-06-17 00:00:00",
+        },
+    )
+    resp.raise_for_status()
+    assert [metric["timestamp"] for metric in resp.json()["metrics"]] == [
+        "2003-06-16 00:00:00",
+        "2003-06-16 00:00:30",
+        "2003-06-16 00:00:30",
+        "2003-06-16 00:00:30",
+    ]
+
+    resp = client.post(
+        "/list_metrics",
+        json={
+            "client_region": "us-east-1",
+            "start_time": "2003-06-16 00:00:00",
+            "rollup": True,
+        },
+    )
+    resp.raise_for_status()
+    resp_data = resp.json()
+    assert resp_data["metrics"] == []
+    assert resp_data["count"] == 1
+    rollup = resp_data["rollups"][0]
+    assert rollup["minute"] == "2003-06-16 00:00:00"
+    assert rollup["count"] == 4
+    assert rollup["latency_sum"] == pytest.approx(1000.6)
+    assert rollup["object_size_sum"] == 1300
+    assert rollup["latency_p50"] == pytest.approx(0.2, rel=0.02)
+    assert rollup["latency_p99"] == pytest.approx(1000, rel=0.02)
+
+
+def test_record_metrics_batch(client):
+    resp = client.post(
+        "/record_metrics_batch",
+        json={
+            "metrics": [
+                {
+                    "requested_region": "aws:us-west-1",
+                    "client_region": "eu-west-1",
+                    "operation": operation,
+                    "latency": 0.5,
+                    "timestamp": f"2010-01-01 00:0{i}:00",
+                    "object_size": 10,
+                }
+                for i, operation in enumerate(["read", "write", "read"])
+            ]
+        },
+    )
+    resp.raise_for_status()
+
+    resp = client.post("/list_metrics", json={"client_region": "eu-west-1"})
+    resp.raise_for_status()
+    assert [metric["timestamp"] for metric in resp.json()["metrics"]] == [
+        "2010-01-01 00:00:00",
+        "2010-01-01 00:01:00",
+        "2010-01-01 00:02:00",
+    ]
+
+    # one invalid item rejects the whole batch
+    resp = client.post(
+        "/record_metrics_batch",
+        json={
+            "metrics": [
+                {
+                    "requested_region": "aws:us-west-1",
+                    "client_region": "eu-west-1",
+                    "operation": operation,
+                    "latency": 0.5,
+                    "timestamp": "2010-01-01 00:05:00",
+                    "object_size": 10,
+                }
+                for operation in ["read", "invalid operation"]
+            ]
+        },
+    )
+    assert resp.status_code == 422
+
+    resp = client.post("/list_metrics", json={"client_region": "eu-west-1"})
+    assert resp.json()["count"] == 3
+
+
+def test_failed_metrics_flush_keeps_rows(client, monkeypatch):
+    async def fail(db):
+        raise RuntimeError("database is unavailable")
+
+    metric = {
+        "requested_region": "aws:us-west-1",
+        "client_region": "ap-south-1",
+        "operation": "read",
+        "latency": 0.5,
+        "timestamp": "2011-01-01 00:00:00",
+        "object_size": 10,
+    }
+    with monkeypatch.context() as m:
+        m.setattr("operations.utils.statistics.begin_write", fail)
+        m.setattr("operations.utils.statistics.STATISTICS_BUFFER_MAX_ROWS", 3)
+        # the metrics are buffered, so the proxy is not told to retry them
+        client.post(
+            "/record_metrics_batch", json={"metrics": [metric, metric]}
+        ).raise_for_status()
+        # fills the buffer, flushed inline
+        client.post("/record_metrics", json=metric).raise_for_status()
+
+    # the next flush writes every row once
+    resp = client.post("/list_metrics", json={"client_region": "ap-south-1"})
+    resp.raise_for_status()
+    assert resp.json()["count"] == 3
+
+
+@pytest.mark.asyncio
+async def test_prometheus_metrics(client):
+    client.get("/healthz").raise_for_status()
+    client.post(
+        "/locate_object",
+        json={
+            "bucket": "no-such-bucket",
+            "key": "my-key",
+            "client_from_region": "aws:us-west-1",
+        },
+    )
+    await rm_lock_on_timeout(0, test=True)
+
+    resp = client.get("/metrics")
+    resp.raise_for_status()
+    body = resp.text
+    assert 'skystore_requests_total{method="GET",route="/healthz",status="200"}' in body
+    assert (
+        'skystore_requests_total{method="POST",route="/locate_object",status="404"}'
+        in body
+    )
+    assert (
+        'skystore_request_duration_seconds_count{method="GET",route="/healthz"}' in body
+    )
+    assert (
+        'skystore_requests_in_flight{method="POST",route="/locate_object"} 0.0' in body
+    )
+    # the bucket lookup of locate_object hits the database
+    assert 'skystore_db_queries_per_request_count{route="/locate_object"}' in body
+    assert 'skystore_db_queries_per_request_sum{route="/locate_object"} 0.0' not in body
+    assert "skystore_lock_sweeps_total" in body
+    assert "skystore_sqlite_lock_wait_seconds_count" in body
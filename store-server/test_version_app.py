@@ -1,6 +1,12 @@
 import pytest
+from datetime import datetime, timedelta
 from starlette.testclient import TestClient
 from app import app, rm_lock_on_timeout
+from operations.object_operations import OBJECT_VERSIONS_ORDER, object_versions_stmt
+from operations.schemas.object_schemas import DBLogicalObject
+from operations.utils.conf import Base, Status
+from operations.utils.lifecycle import run_lifecycle
+from sqlalchemy import create_engine, insert
 import subprocess as sp
 import threading
 
@@ -1436,4 +1442,293 @@ def test_copy_objects(client):
         },
     )
     assert len(resp.json()) == 2
-    
+
+
+@pytest.mark.asyncio
+async def test_lifecycle_rules(client):
+    """Test that the lifecycle rules expire noncurrent versions and lone delete markers"""
+    resp = client.post(
+        "/start_create_bucket",
+        json={
+            "bucket": "my-lifecycle-bucket",
+            "client_from_region": "aws:us-west-1",
+        },
+    )
+    resp.raise_for_status()
+    warmup_region = next(
+        physical_bucket["tag"]
+        for physical_bucket in resp.json()["locators"]
+        if physical_bucket["tag"] != "aws:us-west-1"
+    )
+    for physical_bucket in resp.json()["locators"]:
+        client.patch(
+            "/complete_create_bucket",
+            json={
+                "id": physical_bucket["id"],
+                "creation_date": "2020-01-01T00:00:00",
+            },
+        ).raise_for_status()
+    client.post(
+        "/put_bucket_versioning",
+        json={"bucket": "my-lifecycle-bucket", "versioning": True},
+    ).raise_for_status()
+
+    for i in range(4):
+        concurrent_upload(client, "my-lifecycle-bucket", "my-key", "aws:us-west-1", i)
+
+    resp = client.post("/get_bucket_lifecycle", json={"bucket": "my-lifecycle-bucket"})
+    assert resp.status_code == 404
+
+    # keep the current version and one noncurrent version
+    client.post(
+        "/put_bucket_lifecycle",
+        json={
+            "bucket": "my-lifecycle-bucket",
+            "rule": {"newer_noncurrent_versions": 1},
+        },
+    ).raise_for_status()
+    resp = client.post("/get_bucket_lifecycle", json={"bucket": "my-lifecycle-bucket"})
+    assert resp.json()["newer_noncurrent_versions"] == 1
+
+    # the oldest version is being copied to another region, so it is left alone until the
+    # copy is done
+    resp = client.post(
+        "/list_objects_versioning", json={"bucket": "my-lifecycle-bucket"}
+    )
+    oldest_version = min(obj["version_id"] for obj in resp.json())
+    resp = client.post(
+        "/start_warmup",
+        json={
+            "bucket": "my-lifecycle-bucket",
+            "key": "my-key",
+            "client_from_region": "aws:us-west-1",
+            "version_id": oldest_version,
+            "warmup_regions": [warmup_region],
+        },
+    )
+    resp.raise_for_status()
+    (warmup_locator,) = resp.json()["dst_locators"]
+
+    stats = await run_lifecycle()
+    assert stats.versions_expired == 1
+    client.patch(
+        "/complete_upload",
+        json={
+            "id": warmup_locator["id"],
+            "size": 100,
+            "etag": "100",
+            "last_modified": "2020-01-01T00:00:00",
+        },
+    ).raise_for_status()
+    stats = await run_lifecycle()
+    assert stats.versions_expired == 1
+    resp = client.post(
+        "/list_objects_versioning", json={"bucket": "my-lifecycle-bucket"}
+    )
+    assert len(resp.json()) == 2
+
+    # the proxy deletes the physical copies and reports them back
+    resp = client.post(
+        "/list_lifecycle_deletions", json={"bucket": "my-lifecycle-bucket"}
+    )
+    resp.raise_for_status()
+    ids = [locator["id"] for locator in resp.json()["locators"]]
+    assert len(ids) == 3  # the oldest version has a second copy
+    client.patch(
+        "/complete_delete_objects",
+        json={"ids": ids, "op_type": ["delete"] * len(ids)},
+    ).raise_for_status()
+    resp = client.post(
+        "/list_lifecycle_deletions", json={"bucket": "my-lifecycle-bucket"}
+    )
+    assert resp.json()["locators"] == []
+
+    # delete the key, then expire everything that is noncurrent for a month
+    resp = client.post(
+        "/start_delete_objects",
+        json={
+            "bucket": "my-lifecycle-bucket",
+            "object_identifiers": {"my-key": []},
+        },
+    )
+    resp.raise_for_status()
+    ids = [locator["id"] for locator in resp.json()["locators"]["my-key"]]
+    client.patch(
+        "/complete_delete_objects",
+        json={"ids": ids, "op_type": ["add"] * len(ids)},
+    ).raise_for_status()
+    client.post(
+        "/put_bucket_lifecycle",
+        json={
+            "bucket": "my-lifecycle-bucket",
+            "rule": {"noncurrent_days": 30, "expired_object_delete_marker": True},
+        },
+    ).raise_for_status()
+
+    # the older version is noncurrent since the newer one was written in 2020, the newer one
+    # only since the deletion
+    stats = await run_lifecycle()
+    assert stats.versions_expired == 1
+    assert stats.delete_markers_expired == 0
+    stats = await run_lifecycle()
+    assert stats.versions_expired == 0
+
+    month_later = datetime.utcnow() + timedelta(days=31)
+    stats = await run_lifecycle(now=month_later)
+    assert stats.versions_expired == 1
+    assert stats.delete_markers_expired == 0
+    # the delete marker is the only version left, so the next pass expires it, and the proxy
+    # deletes its physical copies like those of any expired version
+    stats = await run_lifecycle(now=month_later)
+    assert stats.delete_markers_expired == 1
+    resp = client.post(
+        "/list_objects_versioning", json={"bucket": "my-lifecycle-bucket"}
+    )
+    assert resp.json() == []
+
+    resp = client.post(
+        "/list_lifecycle_deletions", json={"bucket": "my-lifecycle-bucket"}
+    )
+    ids = [locator["id"] for locator in resp.json()["locators"]]
+    assert len(ids) == 3  # two versions and the delete marker
+    client.patch(
+        "/complete_delete_objects",
+        json={"ids": ids, "op_type": ["delete"] * len(ids)},
+    ).raise_for_status()
+    resp = client.post(
+        "/list_lifecycle_deletions", json={"bucket": "my-lifecycle-bucket"}
+    )
+    assert resp.json()["locators"] == []
+
+
+def test_object_versions_scan_stops_at_limit(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/versions.db")
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn)
+        # many keys with one version, and one key with many versions
+        conn.execute(
+            insert(DBLogicalObject),
+            [
+                dict(bucket="many-keys", key=f"key-{i:05d}", status=Status.ready)
+                for i in range(5000)
+            ]
+            + [dict(bucket="many-versions", key="key", status=Status.ready)] * 5000,
+        )
+
+    def vm_steps(stmt) -> int:
+        """Number of SQLite virtual machine instructions the statement runs."""
+        steps = 0
+
+        def count():
+            nonlocal steps
+            steps += 1
+
+        connection = engine.raw_connection()
+        try:
+            connection.driver_connection.set_progress_handler(count, 1)
+            sql = str(
+                stmt.compile(
+                    dialect=engine.dialect, compile_kwargs={"literal_binds": True}
+                )
+            )
+            connection.driver_connection.execute(sql).fetchall()
+        finally:
+            connection.close()
+        return steps
+
+    for bucket in ["many-keys", "many-versions"]:
+        stmt = object_versions_stmt(bucket).order_by(*OBJECT_VERSIONS_ORDER)
+        full_scan = vm_steps(stmt)
+        assert vm_steps(stmt.limit(11)) < full_scan / 100
+
+
+def test_list_object_versions(client):
+    """Test that list_object_versions pages through versions and delete markers"""
+    resp = client.post(
+        "/start_create_bucket",
+        json={
+            "bucket": "my-versions-bucket",
+            "client_from_region": "aws:us-west-1",
+        },
+    )
+    resp.raise_for_status()
+    for physical_bucket in resp.json()["locators"]:
+        client.patch(
+            "/complete_create_bucket",
+            json={
+                "id": physical_bucket["id"],
+                "creation_date": "2020-01-01T00:00:00",
+            },
+        ).raise_for_status()
+    client.post(
+        "/put_bucket_versioning",
+        json={"bucket": "my-versions-bucket", "versioning": True},
+    ).raise_for_status()
+
+    for i in range(3):
+        concurrent_upload(client, "my-versions-bucket", "a", "aws:us-west-1", i)
+    concurrent_upload(client, "my-versions-bucket", "b", "aws:us-west-1", 0)
+    concurrent_upload(client, "my-versions-bucket", "c", "aws:us-west-1", 0)
+
+    # delete b, leaving a delete marker as its latest version
+    resp = client.post(
+        "/start_delete_objects",
+        json={"bucket": "my-versions-bucket", "object_identifiers": {"b": []}},
+    )
+    resp.raise_for_status()
+    ids = [locator["id"] for locator in resp.json()["locators"]["b"]]
+    client.patch(
+        "/complete_delete_objects",
+        json={"ids": ids, "op_type": ["add"] * len(ids)},
+    ).raise_for_status()
+
+    def list_versions(**kwargs):
+        resp = client.post(
+            "/list_object_versions", json={"bucket": "my-versions-bucket", **kwargs}
+        )
+        resp.raise_for_status()
+        return resp.json()
+
+    listing = list_versions()
+    assert not listing["is_truncated"]
+    versions = listing["versions"]
+    assert [(v["key"], v["is_latest"], v["delete_marker"]) for v in versions] == [
+        ("a", True, False),
+        ("a", False, False),
+        ("a", False, False),
+        ("b", True, True),
+        ("b", False, False),
+        ("c", True, False),
+    ]
+    assert versions[0]["version_id"] > versions[1]["version_id"]
+    assert versions[3]["size"] is None and versions[4]["size"] is not None
+
+    # paging with the markers returns the same versions, even across a key
+    paged, markers = [], {}
+    while True:
+        listing = list_versions(max_keys=2, **markers)
+        paged.extend(listing["versions"])
+        if not listing["is_truncated"]:
+            break
+        markers = {
+            "key_marker": listing["next_key_marker"],
+            "version_id_marker": listing["next_version_id_marker"],
+        }
+    assert paged == versions
+
+    # a key marker alone skips every version of the key
+    listing = list_versions(key_marker="a")
+    assert [v["key"] for v in listing["versions"]] == ["b", "b", "c"]
+    listing = list_versions(prefix="b")
+    assert [v["version_id"] for v in listing["versions"]] == [
+        versions[3]["version_id"],
+        versions[4]["version_id"],
+    ]
+
+    resp = client.post(
+        "/list_object_versions",
+        json={"bucket": "my-versions-bucket", "version_id_marker": 1},
+    )
+    assert resp.status_code == 400
+    resp = client.post("/list_object_versions", json={"bucket": "missing-bucket"})
+    assert resp.status_code == 404